@@ -0,0 +1,22 @@
+"""計測ヘルパー（timeit の autorange と同じ考え方で、1回の計測が min_time 以上になるよう回数を決める）"""
+import time
+from typing import Callable, Dict
+
+
+def measure(fn: Callable[[], object], *, min_time: float = 0.2, repeat: int = 5) -> Dict[str, float]:
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        dt = time.perf_counter() - t0
+        if dt >= min_time / repeat or number >= 1 << 20:
+            break
+        number *= 2
+    best = dt / number
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / number)
+    return {"per_call_us": best * 1e6, "calls_per_s": 1.0 / best if best > 0 else float("inf"), "number": number}
@@ -0,0 +1,34 @@
+"""CLI のコールドスタート（新しいインタプリタで hanafuda を起動して終了するまで）"""
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+# `hanafuda` のエントリポイントと同じ main() を、同じインタプリタで直接起動する（pyenv などのシムの時間を含めない）
+CLI = [sys.executable, "-m", "holo_hanafuda.cli"]
+# --help は引数の解析で終わる。match-policy info はゲームの起動確認の無いオフラインのコマンドで、同梱の表を読む
+COMMANDS = {
+    "cli_help": CLI + ["--help"],
+    "cli_offline": CLI + ["match-policy", "info"],
+}
+
+
+def _best_ms(argv: List[str], n: int) -> float:
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        subprocess.run(argv, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1e3
+
+
+def run(quick: bool = False) -> Dict[str, dict]:
+    n = 3 if quick else 10
+    base = _best_ms([sys.executable, "-c", "pass"], n)
+    out = {}
+    imp = _best_ms([sys.executable, "-c", "import holo_hanafuda.cli"], n)
+    out["cli_cold_start"] = {"wall_ms": imp, "interpreter_ms": base, "import_ms": imp - base}
+    for name, argv in COMMANDS.items():
+        wall = _best_ms(argv, n)
+        out[name] = {"wall_ms": wall, "interpreter_ms": base, "startup_ms": wall - base}
+    return out
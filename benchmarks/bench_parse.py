@@ -0,0 +1,32 @@
+"""parse_card / GameState.from_json のスループット"""
+import random
+from typing import Dict
+
+from holo_hanafuda.cards import ALL_CARDS, parse_card
+from holo_hanafuda.state import GameState
+
+from _timing import measure
+
+# 正規形のトークンに加えて、同義語での表記（内部で正規化される側）も混ぜる
+_SYNONYMS = ["1:hikari", "3:tan-red", "8:tane", "9:tan-blue", "11:bright-rain", "10:tane-deer", "12:kasu"]
+
+
+def run(quick: bool = False) -> Dict[str, dict]:
+    rng = random.Random(1234)
+    tokens = [c.key() for c in ALL_CARDS] + _SYNONYMS
+    states = []
+    for _ in range(32 if quick else 256):
+        deck = [c.key() for c in rng.sample(ALL_CARDS, len(ALL_CARDS))]
+        states.append({
+            "hand": deck[:8], "field": deck[8:16],
+            "captured_self": deck[16:16 + rng.randint(0, 12)],
+            "captured_opp": deck[30:30 + rng.randint(0, 12)],
+            "config": {"variant": "holo"},
+        })
+    t_it = iter(range(1 << 62))
+    s_it = iter(range(1 << 62))
+    min_time = 0.1 if quick else 0.5
+    return {
+        "parse_card": measure(lambda: parse_card(tokens[next(t_it) % len(tokens)]), min_time=min_time),
+        "GameState.from_json": measure(lambda: GameState.from_json(states[next(s_it) % len(states)]), min_time=min_time),
+    }
@@ -0,0 +1,20 @@
+"""evaluate_yaku / yaku_points のスループット"""
+import random
+from typing import Dict
+
+from holo_hanafuda.cards import ALL_CARDS
+from holo_hanafuda.koikoi_rules import evaluate_yaku, yaku_points
+
+from _timing import measure
+
+
+def run(quick: bool = False) -> Dict[str, dict]:
+    rng = random.Random(1234)
+    sets = [rng.sample(ALL_CARDS, rng.randint(0, 24)) for _ in range(64 if quick else 512)]
+    res = {}
+    for name, fn in (("evaluate_yaku", evaluate_yaku), ("yaku_points", yaku_points)):
+        it = iter(range(1 << 62))
+        def call(fn=fn, it=it):
+            fn(sets[next(it) % len(sets)], variant="holo")
+        res[name] = measure(call, min_time=0.1 if quick else 0.5)
+    return res
@@ -0,0 +1,31 @@
+"""suggest_best_moves の手札枚数別レイテンシ"""
+import random
+from typing import Dict
+
+from holo_hanafuda.cards import ALL_CARDS
+from holo_hanafuda.koikoi_strategy import suggest_best_moves
+
+from _timing import measure
+
+
+def _positions(rng: random.Random, hand_size: int, n: int):
+    res = []
+    for _ in range(n):
+        deck = rng.sample(ALL_CARDS, len(ALL_CARDS))
+        hand, field = deck[:hand_size], deck[hand_size:hand_size + 8]
+        cap_self = deck[16:16 + rng.randint(0, 12)]
+        cap_opp = deck[30:30 + rng.randint(0, 12)]
+        res.append((hand, field, cap_self, cap_opp))
+    return res
+
+
+def run(quick: bool = False) -> Dict[str, dict]:
+    rng = random.Random(1234)
+    res = {}
+    for hand_size in (1, 2, 4, 6, 8):
+        positions = _positions(rng, hand_size, 32 if quick else 256)
+        it = iter(range(1 << 62))
+        def call(positions=positions, it=it):
+            suggest_best_moves(*positions[next(it) % len(positions)])
+        res[f"suggest_best_moves[hand={hand_size}]"] = measure(call, min_time=0.1 if quick else 0.5)
+    return res
@@ -0,0 +1,44 @@
+"""match_templates: assets/source/holo_cards_grid.png を拡大縮小した画面での照合時間"""
+from pathlib import Path
+from typing import Dict
+
+import holo_hanafuda
+
+from _timing import measure
+
+ASSETS = Path(holo_hanafuda.__file__).resolve().parent / "assets"
+SCENE_SCALES = (0.75, 1.0, 1.25)
+
+
+def run(quick: bool = False) -> Dict[str, dict]:
+    try:
+        import cv2
+        from holo_hanafuda.vision import load_templates, load_signatures, match_templates, calibrate_templates
+    except ImportError as e:  # OpenCV / mss が無い環境
+        return {"skipped": {"reason": str(e)}}
+    src = cv2.imread(str(ASSETS / "source" / "holo_cards_grid.png"))
+    tmps = load_templates()
+    sigs = load_signatures()
+    if src is None or not tmps:
+        return {"skipped": {"reason": "assets not found"}}
+    res = {}
+    for s in SCENE_SCALES[1:2] if quick else SCENE_SCALES:
+        scene = cv2.resize(src, None, fx=s, fy=s, interpolation=cv2.INTER_AREA if s < 1 else cv2.INTER_CUBIC)
+        m = measure(lambda: match_templates(scene, tmps), min_time=0.0, repeat=1 if quick else 3)
+        m["detections"] = len(match_templates(scene, tmps))
+        res[f"match_templates[scene={s},scales=3]"] = m
+        _, cal = calibrate_templates(scene, tmps)
+        m = measure(lambda: match_templates(scene, cal, scales=(1.0,)), min_time=0.0, repeat=1 if quick else 3)
+        m["detections"] = len(match_templates(scene, cal, scales=(1.0,)))
+        res[f"match_templates[scene={s},calibrated]"] = m
+        m = measure(lambda: match_templates(scene, cal, scales=(1.0,), signatures=sigs), min_time=0.0,
+                    repeat=1 if quick else 3)
+        m["detections"] = len(match_templates(scene, cal, scales=(1.0,), signatures=sigs))
+        res[f"match_templates[scene={s},calibrated,cascade]"] = m
+        for kw, name in (({}, "calibrated,fft"), ({"signatures": sigs}, "calibrated,cascade,fft")):
+            match_templates(scene, cal, scales=(1.0,), backend="fft", **kw)  # テンプレのスペクトルを作っておく
+            m = measure(lambda: match_templates(scene, cal, scales=(1.0,), backend="fft", **kw), min_time=0.0,
+                        repeat=1 if quick else 3)
+            m["detections"] = len(match_templates(scene, cal, scales=(1.0,), backend="fft", **kw))
+            res[f"match_templates[scene={s},{name}]"] = m
+    return res
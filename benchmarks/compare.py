@@ -0,0 +1,44 @@
+"""2つのベンチ結果 JSON を比べ、しきい値以上に遅くなった項目を表示する（あれば終了コード 1）"""
+import argparse
+import json
+import sys
+
+# 小さいほど良い指標
+_LOWER_IS_BETTER = ("per_call_us", "wall_ms", "import_ms", "startup_ms")
+
+
+def _flatten(doc):
+    for suite, items in doc["results"].items():
+        for name, metrics in items.items():
+            for key in _LOWER_IS_BETTER:
+                if key in metrics:
+                    yield f"{suite}/{name}", key, metrics[key]
+                    break
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("old")
+    ap.add_argument("new")
+    ap.add_argument("--threshold", type=float, default=0.10, help="回帰とみなす悪化率（既定 10%%）")
+    args = ap.parse_args(argv)
+
+    old = {(n, k): v for n, k, v in _flatten(json.load(open(args.old, encoding="utf-8")))}
+    new = {(n, k): v for n, k, v in _flatten(json.load(open(args.new, encoding="utf-8")))}
+    regressions = 0
+    for (name, key), v_new in sorted(new.items()):
+        v_old = old.get((name, key))
+        if v_old is None or v_old <= 0:
+            print(f"  {name}: {v_new:.2f} {key} (new)")
+            continue
+        ratio = v_new / v_old
+        mark = ""
+        if ratio > 1 + args.threshold:
+            mark = "  << REGRESSION"
+            regressions += 1
+        print(f"  {name}: {v_old:.2f} -> {v_new:.2f} {key} (x{ratio:.2f}){mark}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+ベンチマーク一式を実行して JSON に書き出す（オフライン・固定シード・合成データ）。
+
+    python benchmarks/run.py --out bench.json           # 全部
+    python benchmarks/run.py --quick --only rules parse # 一部だけ短時間で
+    python benchmarks/compare.py old.json new.json      # 版間の比較
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from importlib import import_module, metadata
+
+SUITES = ["rules", "strategy", "parse", "vision", "cli"]
+
+
+def _version():
+    try:
+        return metadata.version("holo-hanafuda-assistant")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="holo-hanafuda-assistant benchmarks")
+    ap.add_argument("--out", default="bench.json", help="結果 JSON の出力先")
+    ap.add_argument("--quick", action="store_true", help="計測時間を短くする（CI の動作確認用）")
+    ap.add_argument("--only", nargs="*", choices=SUITES, help="実行するスイート")
+    args = ap.parse_args(argv)
+
+    results = {}
+    for name in args.only or SUITES:
+        t0 = time.perf_counter()
+        results[name] = import_module(f"bench_{name}").run(quick=args.quick)
+        print(f"[{name}] {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+        for k, v in results[name].items():
+            print(f"  {k}: {v}", file=sys.stderr)
+
+    doc = {
+        "meta": {
+            "version": _version(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+    print(f"[done] {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,15 @@ from .cards import Card, parse_card, ALL_CARDS
 from .state import GameState
 from .koikoi_rules import evaluate_yaku, yaku_points, list_yaku_progress
 from .koikoi_strategy import suggest_best_moves, suggest_highest_yaku_line
-from .oicho_kabu import kabu_value
+from .yaku_planner import YakuPlan, plan_yaku
+from .match_policy import MatchPolicy, RiskProfile, match_profile
+from .oicho_kabu import kabu_value, kabu_strength
 __all__ = [
     "Card","parse_card","ALL_CARDS",
     "GameState",
     "evaluate_yaku","yaku_points","list_yaku_progress",
     "suggest_best_moves","suggest_highest_yaku_line",
-    "kabu_value"
+    "YakuPlan","plan_yaku",
+    "MatchPolicy","RiskProfile","match_profile",
+    "kabu_value","kabu_strength"
 ]
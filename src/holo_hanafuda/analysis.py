@@ -0,0 +1,248 @@
+from __future__ import annotations
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from .cards import Card, mask_to_cards, parse_card, zone_masks
+from .evaluator import evaluator_id
+from .koikoi_rules import evaluate_yaku, yaku_points
+from .koikoi_strategy import Move, suggest_best_moves
+from .match_policy import PROFILE_BY_NAME, RiskProfile, match_profile
+from .profiling import timed
+from .state import GameState
+from .symmetry import IDENTITY, Perm, canonicalize, invert, permute_card
+from .threat import threat_map, top_threats
+from .yaku_planner import YakuPlan, plan_yaku
+
+"""
+局面解析（最善手候補・ヒント・成立役）とその結果キャッシュ
+
+- 同じ局面（札の並び順は問わない）の解析を使い回す。キーは各ゾーンの札マスク（cards.zone_masks で互いに素）+ variant
+  を symmetry.canonicalize で正規化したもの（カスのスロット違い・対称な月の局面は1つの結果を共有し、
+  札を写して返す。holo には対称な月が無い）
+- 役の狙い筋（yaku_planner）も同じキーで保持し、写すときは足りない札も写す
+- 試合の方針（match_policy, GameState.config の "match" / "risk"）もキーに含める。方針は大役を狙う重みで
+  着手の順位を変え、役ができたときに こいこい するかの助言（Analysis.koikoi）になる
+- 解析は正規化した札の並び（cards.py のビット順）で行うので、結果は入力の順序に依存しない
+- PositionCache は上限つき LRU（スレッドセーフ）。path を渡すと sqlite に書き出し、再起動後も使える
+- 解析ロジックを変えたら ANALYSIS_VERSION を上げる（古い永続キャッシュは破棄される）。同梱の評価器の重みが
+  変わったときも破棄する（cache_version）
+"""
+
+ANALYSIS_VERSION = 9
+DEFAULT_CACHE_PATH = Path.home() / ".holo_hanafuda" / "analysis.sqlite"
+
+
+
+def cache_version() -> str:
+    """永続キャッシュの版: 解析ロジックの版 + 評価器の重みの識別子（Move.value は重みにも依存する）"""
+    return f"{ANALYSIS_VERSION}:{evaluator_id()}"
+
+
+PositionKey = Tuple[int, int, int, int, str, str]   # 札マスク×4, variant, 方針名（無ければ ""）
+
+
+HINT_LIMIT = 5
+
+
+@dataclass
+class Analysis:
+    moves: List[Move]
+    plans: List[YakuPlan]   # 役の狙い筋（yaku_planner, 期待点の高い順）
+    yaku: Dict[str, int]
+    total: int
+    threats: List[Tuple[Card, float]] = field(default_factory=list)  # 場札・手札の 相手に取られる危険度
+    risk: str = ""          # 試合の方針（match_policy.PROFILES の名前, 無ければ ""）
+    koikoi: bool | None = None  # この手番で役ができたら こいこい するか（方針が無い・この手番で役ができなければ None）
+
+    @property
+    def profile(self) -> RiskProfile | None:
+        return PROFILE_BY_NAME.get(self.risk)
+
+    @property
+    def hints(self) -> List[str]:
+        """完成しうる狙い筋の表示用の文字列（上位 HINT_LIMIT 件）"""
+        return [p.format() for p in self.plans if p.feasible][:HINT_LIMIT]
+
+    def to_json(self) -> dict:
+        return {
+            "moves": [[m.play.key(), m.capture_with.key() if m.capture_with else None, m.score_delta, m.note,
+                       m.expected] for m in self.moves],
+            "plans": [p.to_json() for p in self.plans],
+            "yaku": dict(self.yaku),
+            "total": self.total,
+            "threats": [[c.key(), d] for c, d in self.threats],
+            "risk": self.risk,
+            "koikoi": self.koikoi,
+        }
+
+    @staticmethod
+    def from_json(data: dict) -> "Analysis":
+        moves = [Move(play=parse_card(p), capture_with=parse_card(t) if t else None, score_delta=d, note=n, expected=e)
+                 for p, t, d, n, e in data["moves"]]
+        return Analysis(moves=moves, plans=[YakuPlan.from_json(p) for p in data["plans"]], yaku=dict(data["yaku"]), total=data["total"],
+                        threats=[(parse_card(c), d) for c, d in data["threats"]],
+                        risk=data["risk"], koikoi=data["koikoi"])
+
+    def permuted(self, perm: Perm) -> "Analysis":
+        """着手・狙い筋の札を perm で写したコピー（役の点は対称な月に依存しない）"""
+        moves = [Move(play=permute_card(m.play, perm),
+                      capture_with=permute_card(m.capture_with, perm) if m.capture_with else None,
+                      score_delta=m.score_delta, note=m.note, expected=m.expected) for m in self.moves]
+        threats = [(permute_card(c, perm), d) for c, d in self.threats]
+        plans = [replace(p, missing={k: sorted(permute_card(c, perm) for c in v) for k, v in p.missing.items()})
+                 for p in self.plans]
+        return Analysis(moves=moves, plans=plans, yaku=self.yaku, total=self.total, threats=threats,
+                        risk=self.risk, koikoi=self.koikoi)
+
+
+def position_key(gs: GameState) -> Tuple[PositionKey, Perm]:
+    """正規化した局面キーと、元の札 -> 正規化後の札 の置換"""
+    variant = gs.config.get("variant", "holo")
+    masks = zone_masks((gs.hand, gs.field, gs.captured_self, gs.captured_opp))
+    canon, perm = canonicalize(masks, variant)
+    profile = match_profile(gs.config)
+    return canon + (variant, profile.name if profile else ""), perm
+
+
+def _key_str(key: PositionKey) -> str:
+    return "%x.%x.%x.%x.%s.%s" % key
+
+
+@timed("analyze_position")
+def analyze_key(key: PositionKey) -> Analysis:
+    """キャッシュを通さない解析（GUI/CLI の表示内容と同じ）"""
+    hand, field_, cap_self, cap_opp = (mask_to_cards(m) for m in key[:4])
+    variant, profile = key[4], PROFILE_BY_NAME.get(key[5])
+    moves = suggest_best_moves(hand, field_, cap_self, cap_opp, variant=variant,
+                               pursuit=profile.pursuit if profile else 0.0)
+    plans = plan_yaku(hand, field_, cap_self, cap_opp, variant=variant)
+    yaku = evaluate_yaku(cap_self, variant=variant, initial_hand=hand)
+    total = yaku_points(cap_self, variant=variant, initial_hand=hand)
+    threats = top_threats(threat_map(hand, field_, cap_self, cap_opp, variant=variant), field_ + hand)
+    # 役ができるのは札を出した後なので、残りの手札は1枚少ない。役点は、この手番で取れる札で増える点
+    # （出して取る手の score_delta と、この手番で完成しうる狙い筋の増加）の最大を目安にする。
+    # この手番で役ができない局面では助言しない（None）
+    koikoi = None
+    gains = [m.score_delta for m in moves if m.score_delta > 0] + \
+        [p.gain for p in plans if p.feasible and p.turns <= 1]
+    if profile is not None and gains:
+        koikoi = profile.koikoi(total + max(gains), len(hand) - 1)
+    return Analysis(moves=moves, plans=plans, yaku=yaku, total=total, threats=threats,
+                    risk=key[5], koikoi=koikoi)
+
+
+# ───────────────────────────────────────────────────────────
+# キャッシュ
+# ───────────────────────────────────────────────────────────
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    disk_hits: int = 0   # メモリには無く sqlite から読めた数（hits に含む）
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        n = self.hits + self.misses
+        return self.hits / n if n else 0.0
+
+
+class PositionCache:
+    """局面キー -> Analysis の LRU（maxsize 件）。path があれば sqlite にも書き込む"""
+
+    def __init__(self, maxsize: int = 4096, path: str | Path | None = None):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[PositionKey, Analysis]" = OrderedDict()
+        self._stats = CacheStats()
+        self._db: sqlite3.Connection | None = None
+        if path is not None:
+            self._open_db(Path(path))
+
+    def _open_db(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(path), check_same_thread=False)
+        db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        db.execute("CREATE TABLE IF NOT EXISTS analysis (key TEXT PRIMARY KEY, value TEXT)")
+        version = cache_version()
+        row = db.execute("SELECT v FROM meta WHERE k = 'version'").fetchone()
+        if row is None or row[0] != version:
+            db.execute("DELETE FROM analysis")
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        db.commit()
+        self._db = db
+
+    def get(self, key: PositionKey) -> Analysis | None:
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                self._mem.move_to_end(key)
+                self._stats.hits += 1
+                return hit
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM analysis WHERE key = ?", (_key_str(key),)).fetchone()
+                if row is not None:
+                    hit = Analysis.from_json(json.loads(row[0]))
+                    self._remember(key, hit)
+                    self._stats.hits += 1
+                    self._stats.disk_hits += 1
+                    return hit
+            self._stats.misses += 1
+            return None
+
+    def put(self, key: PositionKey, value: Analysis) -> None:
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO analysis VALUES (?, ?)",
+                                 (_key_str(key), json.dumps(value.to_json(), ensure_ascii=False)))
+                self._db.commit()
+
+    def _remember(self, key: PositionKey, value: Analysis) -> None:
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.maxsize:
+            self._mem.popitem(last=False)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._stats.hits, self._stats.misses, self._stats.disk_hits, len(self._mem))
+
+    def clear(self) -> None:
+        """メモリ上の内容と統計を消す（sqlite はそのまま）"""
+        with self._lock:
+            self._mem.clear()
+            self._stats = CacheStats()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def open_cache(path: str | Path | None = DEFAULT_CACHE_PATH, maxsize: int = 4096) -> PositionCache:
+    """永続キャッシュを開く。ファイルが使えなければメモリのみのキャッシュにする"""
+    if path is not None:
+        try:
+            return PositionCache(maxsize, path)
+        except (OSError, sqlite3.Error):
+            pass
+    return PositionCache(maxsize)
+
+
+def analyze(gs: GameState, cache: PositionCache | None = None) -> Analysis:
+    """局面を解析する（cache があれば引き、無ければ計算して登録）"""
+    key, perm = position_key(gs)
+    result = cache.get(key) if cache is not None else None
+    if result is None:
+        result = analyze_key(key)
+        if cache is not None:
+            cache.put(key, result)
+    return result if perm == IDENTITY else result.permuted(invert(perm))
@@ -0,0 +1,279 @@
+from __future__ import annotations
+import math
+import random
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from .cards import CARD_SLOTS, Card
+from .gamelog import RECORD_DTYPE, GameLogWriter, variant_id
+from .koikoi_engine import Position, best_card, deal, legal_plays, play_turn
+from .koikoi_strategy import suggest_best_moves
+
+"""
+自己対局アリーナ: 2つの戦略を N 局（シード固定）対戦させて強さを比べる。
+
+- 偶数局は A が親、奇数局は B が親（先手の有利を打ち消す）
+- プロセスプールで局を分散し、結果を1局1行のログに逐次書き出す
+- 勝率（Wilson 区間）と A から見た平均得点（正規近似の 95% 区間）を報告する
+
+ログ（テキスト）の1行: seed <TAB> Aの席 <TAB> 勝者の席(2=流局) <TAB> 点 <TAB> 手数 <TAB> 着手列
+  着手列は "出した札.取った場札.めくり札の取り先" を空白区切り（-1 = 選択なし）
+ログのパスが .hhlog で終わる場合は gamelog のバイナリ形式（1手番1レコード）で書く。
+"""
+
+BINARY_LOG_SUFFIX = ".hhlog"
+
+
+# ───────────────────────────────────────────────────────────
+# 戦略
+# ───────────────────────────────────────────────────────────
+
+class Strategy(ABC):
+    """既定の振る舞い（めくり札・効果は優先度の高い札、役ができたら即あがり）。choose_play だけ実装する"""
+    name = "base"
+
+    def __init__(self, seed: int = 0):
+        self.rng = random.Random(seed)
+
+    @abstractmethod
+    def choose_play(self, pos: Position, player: int) -> Tuple[int, int]:
+        ...
+
+    def choose_draw(self, pos: Position, player: int, drawn: int, matches: int) -> int:
+        return best_card(matches)
+
+    def koikoi(self, pos: Position, player: int, points: int) -> bool:
+        return False
+
+    def choose_effect(self, pos: Position, player: int, role_id: str) -> int:
+        return -1
+
+
+class RandomStrategy(Strategy):
+    name = "random"
+
+    def choose_play(self, pos: Position, player: int) -> Tuple[int, int]:
+        return self.rng.choice(legal_plays(pos, player))
+
+
+def _slot_in(card: Card, mask: int) -> int:
+    """mask の中で card に当たるビット位置"""
+    for i in CARD_SLOTS[card.key()]:
+        if mask >> i & 1:
+            return i
+    raise KeyError(card.key())
+
+
+class GreedyStrategy(Strategy):
+    """suggest_best_moves の1位をそのまま指す（pursuit は大役を狙う重み）"""
+    name = "greedy"
+    pursuit = 0.0
+
+    def choose_play(self, pos: Position, player: int) -> Tuple[int, int]:
+        gs = pos.to_state(player)
+        moves = suggest_best_moves(gs.hand, gs.field, gs.captured_self, gs.captured_opp, variant=pos.variant,
+                                   pursuit=self.pursuit)
+        if not moves:
+            return legal_plays(pos, player)[0]
+        m = moves[0]
+        card = _slot_in(m.play, pos.hands[player])
+        target = _slot_in(m.capture_with, pos.field) if m.capture_with else -1
+        return card, target
+
+
+STRATEGIES: Dict[str, Callable[[int], Strategy]] = {
+    "random": RandomStrategy,
+    "greedy": GreedyStrategy,
+}
+
+
+def register_strategy(name: str, factory: Callable[[int], Strategy]) -> None:
+    """
+    名前で選べる戦略を追加する。factory はワーカープロセスにそのまま渡すので pickle できること
+    （クラス・モジュールの関数・functools.partial。lambda は不可）
+    """
+    STRATEGIES[name] = factory
+
+
+# ───────────────────────────────────────────────────────────
+# 対局
+# ───────────────────────────────────────────────────────────
+
+@dataclass
+class GameRecord:
+    seed: int
+    a_seat: int
+    winner: int      # 勝者の席（2 = 流局）
+    score: int
+    plies: int
+    moves: List[Tuple[int, int, int]] = field(default_factory=list)
+    rows: np.ndarray | None = None  # gamelog.RECORD_DTYPE（record=True のとき）
+
+    @property
+    def a_points(self) -> int:
+        """A から見た得点（勝ち +, 負け -）"""
+        if self.winner == 2:
+            return 0
+        return self.score if self.winner == self.a_seat else -self.score
+
+    def to_line(self) -> str:
+        mv = " ".join(f"{c}.{t}.{d}" for c, t, d in self.moves)
+        return f"{self.seed}\t{self.a_seat}\t{self.winner}\t{self.score}\t{self.plies}\t{mv}"
+
+
+def play_game(a: Strategy, b: Strategy, seed: int, *, variant: str = "holo", a_seat: int = 0,
+              record: bool = False) -> GameRecord:
+    players = (a, b) if a_seat == 0 else (b, a)
+    pos = deal(seed, variant=variant, dealer=0)
+    moves: List[Tuple[int, int, int]] = []
+    rows: List[tuple] = []
+    vid = variant_id(variant) if record else -1
+    draw_choice = [-1]
+
+    def choose_draw(pos, p, drawn, m):
+        draw_choice[0] = players[p].choose_draw(pos, p, drawn, m)
+        return draw_choice[0]
+
+    def decide_koikoi(pos, p, pts):
+        return players[p].koikoi(pos, p, pts)
+
+    def choose_effect(pos, p, rid):
+        return players[p].choose_effect(pos, p, rid)
+
+    while not pos.over:
+        p = pos.turn
+        card, target = players[p].choose_play(pos, p)
+        draw_choice[0] = -1
+        if record:
+            before = (seed, pos.ply, p, vid, pos.hands[0], pos.hands[1], pos.field,
+                      pos.captured[0], pos.captured[1])
+            points = (pos.points[0], pos.points[1])
+        play_turn(pos, card, target, choose_draw=choose_draw,
+                  decide_koikoi=decide_koikoi, choose_effect=choose_effect)
+        moves.append((card, target, draw_choice[0]))
+        if record:
+            rows.append(before + (card, target, pos.last_drawn, draw_choice[0]) + points + (-1, 0))
+    arr = None
+    if record:
+        arr = np.array(rows, dtype=RECORD_DTYPE)
+        arr["winner"] = pos.winner
+        arr["final_score"] = pos.score
+    return GameRecord(seed=seed, a_seat=a_seat, winner=pos.winner, score=pos.score, plies=pos.ply,
+                      moves=moves, rows=arr)
+
+
+def _play_chunk(args) -> List[GameRecord]:
+    # 戦略は名前ではなく factory で受け取る（spawn / forkserver のワーカーには実行時の登録が無い）
+    make_a, make_b, seeds, variant, record = args
+    out = []
+    for seed in seeds:
+        a = make_a(seed)
+        b = make_b(seed + 1)
+        out.append(play_game(a, b, seed, variant=variant, a_seat=seed % 2, record=record))
+    return out
+
+
+def iter_games(name_a: str, name_b: str, n: int, *, seed: int = 0, jobs: int = 1,
+               variant: str = "holo", chunk: int = 200, record: bool = False) -> Iterator[GameRecord]:
+    """N 局を（必要ならプロセスプールで）実行し、終わった順ではなくシード順に返す"""
+    for name in (name_a, name_b):
+        if name not in STRATEGIES:
+            raise KeyError(f"Unknown strategy: {name} (available: {', '.join(STRATEGIES)})")
+    tasks = [(STRATEGIES[name_a], STRATEGIES[name_b], range(s, min(s + chunk, seed + n)), variant, record)
+             for s in range(seed, seed + n, chunk)]
+    if jobs <= 1:
+        for t in tasks:
+            yield from _play_chunk(t)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        for recs in ex.map(_play_chunk, tasks):
+            yield from recs
+
+
+# ───────────────────────────────────────────────────────────
+# 集計
+# ───────────────────────────────────────────────────────────
+
+def wilson_interval(k: int, n: int, z: float = 1.96) -> Tuple[float, float]:
+    if n == 0:
+        return (0.0, 1.0)
+    p = k / n
+    d = 1 + z * z / n
+    c = (p + z * z / (2 * n)) / d
+    h = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / d
+    return (c - h, c + h)
+
+
+@dataclass
+class ArenaResult:
+    name_a: str
+    name_b: str
+    games: int = 0
+    wins_a: int = 0
+    wins_b: int = 0
+    draws: int = 0
+    _sum: float = 0.0
+    _sumsq: float = 0.0
+
+    def add(self, rec: GameRecord) -> None:
+        self.games += 1
+        if rec.winner == 2:
+            self.draws += 1
+        elif rec.winner == rec.a_seat:
+            self.wins_a += 1
+        else:
+            self.wins_b += 1
+        x = rec.a_points
+        self._sum += x
+        self._sumsq += x * x
+
+    @property
+    def win_rate_a(self) -> float:
+        return self.wins_a / self.games if self.games else 0.0
+
+    @property
+    def mean_points_a(self) -> float:
+        return self._sum / self.games if self.games else 0.0
+
+    def mean_points_ci(self, z: float = 1.96) -> Tuple[float, float]:
+        n = self.games
+        if n < 2:
+            return (float("-inf"), float("inf"))
+        mean = self._sum / n
+        var = max(0.0, (self._sumsq - n * mean * mean) / (n - 1))
+        h = z * math.sqrt(var / n)
+        return (mean - h, mean + h)
+
+    def summary(self) -> str:
+        lo, hi = wilson_interval(self.wins_a, self.games)
+        mlo, mhi = self.mean_points_ci()
+        return "\n".join([
+            f"{self.name_a} vs {self.name_b}: {self.games} 局",
+            f"  {self.name_a} 勝ち {self.wins_a} / {self.name_b} 勝ち {self.wins_b} / 流局 {self.draws}",
+            f"  {self.name_a} 勝率 {self.win_rate_a:.3f}  (95% CI {lo:.3f} - {hi:.3f})",
+            f"  {self.name_a} 平均得点 {self.mean_points_a:+.3f}  (95% CI {mlo:+.3f} - {mhi:+.3f})",
+        ])
+
+
+def run_arena(name_a: str, name_b: str, n: int, *, seed: int = 0, jobs: int = 1,
+              variant: str = "holo", log_path: str | None = None) -> ArenaResult:
+    res = ArenaResult(name_a, name_b)
+    binary = bool(log_path) and str(log_path).endswith(BINARY_LOG_SUFFIX)
+    log = None
+    if log_path:
+        log = GameLogWriter(log_path) if binary else open(log_path, "w", encoding="utf-8")
+    try:
+        for rec in iter_games(name_a, name_b, n, seed=seed, jobs=jobs, variant=variant, record=binary):
+            res.add(rec)
+            if binary:
+                log.write(rec.rows)
+            elif log:
+                log.write(rec.to_line() + "\n")
+    finally:
+        if log:
+            log.close()
+    return res
@@ -0,0 +1,113 @@
+from __future__ import annotations
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .cards import ALL_CARDS, CARD_SLOTS, Card, cards_to_mask, parse_card
+from .state import GameState
+from .vision import Detection
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # SciPy が無ければ貪欲法で代用
+    linear_sum_assignment = None
+
+"""
+検出結果 → 札の大域的な割り当て（山札の制約つき）
+
+テンプレ照合の検出（位置ごとに1つ, Detection.alternatives に同じ位置の他テンプレのスコア）を
+48枚の物理的な札（cards.py のスロット）に割り当てる。
+- 行列: 検出 × 48 スロットのスコア（テンプレ名を札に直し、同じ札のスロット全部に同じスコア）
+- 制約: 各スロットは1回だけ（= 同じ札が2回出ない, 各月4枚, カスはスロットの数まで）
+        他のゾーンで既に分かっている札のスロットは使えない
+- 目的: (スコア - min_score) の和を最大化。どのスロットにも min_score 以上で当てはまらない検出は捨てる
+SciPy があれば linear_sum_assignment（ハンガリー法）、無ければスコアの高い順に貪欲に割り当てる。
+大域的に整合するので、照合の閾値を下げて1スケールで照合しても重複・月の取り違えが出にくい。
+"""
+
+# 割り当てに使う最低スコア（照合の閾値もこれまで下げられる）
+ASSIGN_MIN_SCORE = 0.75
+ZONES = ("hand", "field", "captured_self", "captured_opp")
+
+_BLOCKED = 1e6
+
+
+def _token_slots(token: str) -> List[int]:
+    try:
+        return CARD_SLOTS[parse_card(token).key()]
+    except (KeyError, ValueError):
+        return []
+
+
+def score_matrix(dets: Sequence[Detection]) -> np.ndarray:
+    """(検出数, 48) のスコア。当てはまらないところは -inf"""
+    scores = np.full((len(dets), len(ALL_CARDS)), -np.inf)
+    for i, d in enumerate(dets):
+        for token, s in [(d.token, d.score), *d.alternatives.items()]:
+            for slot in _token_slots(token):
+                scores[i, slot] = max(scores[i, slot], s)
+    return scores
+
+
+def _solve(weights: np.ndarray) -> List[int]:
+    """weights (n, 48)（正のところだけ割り当て可）→ 検出ごとのスロット（-1 = 割り当てなし）"""
+    n = len(weights)
+    res = [-1] * n
+    if n == 0:
+        return res
+    if linear_sum_assignment is not None:
+        # 列 48 以降は「割り当てなし」用のダミー（コスト 0）
+        cost = np.where(weights > 0, -weights, _BLOCKED)
+        cost = np.concatenate([cost, np.zeros((n, n))], axis=1)
+        rows, cols = linear_sum_assignment(cost)
+        for r, c in zip(rows, cols):
+            if c < weights.shape[1] and weights[r, c] > 0:
+                res[r] = int(c)
+        return res
+    used = set()
+    for flat in np.argsort(-weights, axis=None, kind="stable"):
+        r, c = divmod(int(flat), weights.shape[1])
+        if weights[r, c] <= 0:
+            break
+        if res[r] < 0 and c not in used:
+            res[r] = c
+            used.add(c)
+    return res
+
+
+def assign_cards(dets: Sequence[Detection], *, exclude: int = 0,
+                 min_score: float = ASSIGN_MIN_SCORE) -> List[Tuple[Detection, Card]]:
+    """検出を札に割り当てる。exclude は使えないスロットのマスク。返り値は検出の順（捨てた検出は除く）"""
+    weights = score_matrix(dets) - min_score
+    blocked = [i for i in range(len(ALL_CARDS)) if exclude >> i & 1]
+    weights[:, blocked] = -np.inf
+    slots = _solve(weights)
+    return [(d, ALL_CARDS[s]) for d, s in zip(dets, slots) if s >= 0]
+
+
+def assign_zones(zones: Dict[str, Sequence[Detection]], known: Dict[str, Iterable[Card]] | None = None, *,
+                 min_score: float = ASSIGN_MIN_SCORE) -> Dict[str, List[Card]]:
+    """
+    複数ゾーンの検出をまとめて割り当てる（ゾーンをまたいでも同じ札は1回だけ）。
+    known は検出していないゾーンの既知の札（そのスロットは使わない）
+    """
+    exclude = 0
+    for z, cards in (known or {}).items():
+        if z not in zones:
+            exclude = cards_to_mask(list(cards), strict=False, base=exclude)
+    flat = [(z, d) for z, dets in zones.items() for d in dets]
+    out: Dict[str, List[Card]] = {z: [] for z in zones}
+    assigned = assign_cards([d for _, d in flat], exclude=exclude, min_score=min_score)
+    zone_of = {id(d): z for z, d in flat}
+    for d, card in assigned:
+        out[zone_of[id(d)]].append(card)
+    return out
+
+
+def detections_to_state(zones: Dict[str, Sequence[Detection]], base: GameState | None = None, *,
+                        min_score: float = ASSIGN_MIN_SCORE) -> GameState:
+    """検出したゾーンを割り当て結果で置き換えた GameState（他のゾーン・設定は base のまま）"""
+    base = base or GameState(hand=[], field=[], captured_self=[], captured_opp=[])
+    known = {z: getattr(base, z) for z in ZONES}
+    cards = assign_zones({z: d for z, d in zones.items() if z in ZONES}, known, min_score=min_score)
+    return GameState(**{z: cards.get(z, known[z]) for z in ZONES}, config=dict(base.config))
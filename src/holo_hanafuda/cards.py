@@ -1,5 +1,7 @@
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
 
 @dataclass(frozen=True, order=True)
 class Card:
@@ -63,6 +65,71 @@ def _build_cards() -> List[Card]:
 ALL_CARDS: List[Card] = _build_cards()
 CARD_INDEX = {c.key(): c for c in ALL_CARDS}
 
+# ───────────────────────────────────────────────────────────
+# ビットマスク表現（ALL_CARDS の並び順 = ビット位置、48bit）
+#   同じ札（同月のカス）は連続した複数スロットを持ち、前のスロットから埋める
+# ───────────────────────────────────────────────────────────
+
+FULL_MASK = (1 << len(ALL_CARDS)) - 1
+CARD_SLOTS: Dict[str, List[int]] = {}
+for _i, _c in enumerate(ALL_CARDS):
+    CARD_SLOTS.setdefault(_c.key(), []).append(_i)
+# MONTH_MASK[m]: m月の4枚のビット（index 0 は未使用）
+MONTH_MASK: List[int] = [0] * 13
+for _i, _c in enumerate(ALL_CARDS):
+    MONTH_MASK[_c.month] |= 1 << _i
+
+def cards_to_mask(cards: List[Card], *, strict: bool = True, base: int = 0) -> int:
+    """
+    札リスト → マスク。同じ札が複数あるときは空いているスロットを順に使う。
+    base を渡すと、そのマスクに追加した結果を返す（スロットの重複を避けて足し込む）。
+    strict=False なら実在枚数を超える重複（誤入力・誤検出）は無視する。
+    """
+    mask = base
+    for c in cards:
+        for i in CARD_SLOTS[c.key()]:
+            if not mask >> i & 1:
+                mask |= 1 << i
+                break
+        else:
+            if strict:
+                raise ValueError(f"Too many copies of card: {c.key()}")
+    return mask
+
+def zone_masks(zones: Sequence[Iterable[Card]]) -> List[int]:
+    """
+    ゾーンごとの札リスト → 互いに素なマスク。ゾーンの順に空いているスロットを使うので、
+    同じ札（カスなど）が手札と場に分かれていても別のスロットになる。実在枚数を超える分は無視する。
+    局面のキー・見えていない札の計算はこれを使う（symmetry.canonicalize は互いに素なマスクが前提）
+    """
+    acc = 0
+    out: List[int] = []
+    for cards in zones:
+        mask = cards_to_mask(list(cards), strict=False, base=acc)
+        out.append(mask & ~acc)
+        acc = mask
+    return out
+
+# 札マスクの配列（uint64）用
+MASK_DTYPE = np.uint64
+_POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def popcount(masks: np.ndarray) -> np.ndarray:
+    """uint64 マスク配列の各要素の立っているビット数"""
+    m = np.asarray(masks, dtype=MASK_DTYPE)
+    if hasattr(np, "bitwise_count"):  # NumPy 2.0+
+        return np.bitwise_count(m).astype(np.int64)
+    return _POP8[np.ascontiguousarray(m).view(np.uint8).reshape(m.shape + (8,))].sum(axis=-1, dtype=np.int64)
+
+def mask_to_cards(mask: int) -> List[Card]:
+    """マスク → 札リスト（ALL_CARDS の順）"""
+    res: List[Card] = []
+    while mask:
+        low = mask & -mask
+        res.append(ALL_CARDS[low.bit_length() - 1])
+        mask ^= low
+    return res
+
 def parse_card(token: str) -> Card:
     """Parse '<month>:<kind[-tag]>' into Card (for external JSON)."""
     token = token.strip()
@@ -1,12 +1,16 @@
 import json
 import argparse
 import sys
+from collections import Counter
 import psutil
+from pathlib import Path
 
 from .state import GameState
-from .koikoi_rules import evaluate_yaku, yaku_points
-from .koikoi_strategy import suggest_best_moves, suggest_highest_yaku_line
+from .analysis import DEFAULT_CACHE_PATH, analyze, open_cache
+from .evaluator import DEFAULT_L2
 from .oicho_kabu import kabu_value
+from .rule_variants import variant_names
+from . import profiling
 
 
 def ゲーム起動確認():
@@ -21,39 +25,203 @@ def ゲーム起動確認():
     sys.exit(1)
 
 
-def cmd_suggest(path: str):
+def _analyze_file(path: str, cache_path):
     data = json.load(open(path, "r", encoding="utf-8"))
-    gs = GameState.from_json(data)
-    moves = suggest_best_moves(gs.hand, gs.field, gs.captured_self, gs.captured_opp)
-    for i, m in enumerate(moves, 1):
+    cache = open_cache(cache_path)
+    try:
+        return analyze(GameState.from_json(data), cache)
+    finally:
+        cache.close()
+
+
+def cmd_suggest(path: str, cache_path=DEFAULT_CACHE_PATH, book_path=None, explicit_book=False):
+    if book_path and not Path(book_path).exists():
+        # 既定の表は同梱していないので黙って飛ばす。明示した --book が無いのは指定の誤り
+        if explicit_book:
+            print(f"警告: 記録局面の表がありません: {book_path}（表を引かずに解析します）", file=sys.stderr)
+        book_path = None
+    if book_path:
+        from .opening_book import OpeningBook
+        gs = GameState.from_json(json.load(open(path, "r", encoding="utf-8")))
+        hit = OpeningBook.load(book_path).lookup(gs)
+        if hit is not None:
+            cap = f" +{hit.capture_with.key()}" if hit.capture_with else ""
+            print(f"[記録局面] {hit.play.key()}{cap}  平均得点={hit.value:+.2f}（候補ごとに {hit.samples} 局の読み）")
+    res = _analyze_file(path, cache_path)
+    for i, m in enumerate(res.moves, 1):
         cap = f" +{m.capture_with.key()}" if m.capture_with else ""
-        print(f"[{i}] {m.play.key()}{cap}  Δscore={m.score_delta}  {m.note}")
-    print("\n最高役ライン:", *suggest_highest_yaku_line(gs.hand, gs.field, gs.captured_self), sep="\n - ")
+        print(f"[{i}] {m.play.key()}{cap}  Δscore={m.score_delta}  期待値={m.expected:+.2f}  {m.note}")
+    if res.threats:
+        print("\n相手に取られる危険（取られた場合の役点の増加 × 相手が同月札を持つ/めくる確率）:")
+        for c, d in res.threats:
+            print(f" - {c.key()}: {d:.2f}")
+    print("\n役の狙い筋（期待点の高い順）:", *res.hints, sep="\n - ")
+    if res.profile is not None:
+        print(f"\n試合の方針: {res.profile.describe()}")
+        if res.koikoi is not None:
+            print("役ができたら: " + ("こいこい" if res.koikoi else "あがる"))
 
 
-def cmd_eval_yaku(path: str):
-    data = json.load(open(path, "r", encoding="utf-8"))
-    gs = GameState.from_json(data)
-    y = evaluate_yaku(gs.captured_self, variant="holo", initial_hand=gs.hand)
-    total = yaku_points(gs.captured_self, variant="holo", initial_hand=gs.hand)
-    if not y:
+def cmd_eval_yaku(path: str, cache_path=DEFAULT_CACHE_PATH):
+    res = _analyze_file(path, cache_path)
+    if not res.yaku:
         print("役は未成立")
     else:
-        for k, v in y.items():
+        for k, v in res.yaku.items():
             print(f"{k}: {v}")
-        print(f"合計: {total} 点")
+        print(f"合計: {res.total} 点")
 
 
-def cmd_kabu(nums):
-    months = [int(x) for x in nums]
+def cmd_kabu(nums, advise: bool = False, seen=()):
+    months = list(nums)
     print(f"おいちょかぶ値: {kabu_value(months)}")
+    if advise:
+        from .oicho_kabu_odds import advise as kabu_advise
+        action, p = kabu_advise(months, list(seen))
+        print(f"勝率（止める）: {p['stand']:.3f}")
+        print(f"勝率（引く）  : {p['draw']:.3f}")
+        print("推奨: " + ("もう1枚引く" if action == "draw" else "止める"))
 
 
-def main(argv=None):
-    # 最初にゲームの起動確認
-    ゲーム起動確認()
+def cmd_arena(args):
+    import os
+    import time
+    from .arena import run_arena
+    from . import match_policy  # noqa: F401  方針つきの greedy-* を登録
+    jobs = args.jobs or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    res = run_arena(args.a, args.b, args.games, seed=args.seed, jobs=jobs,
+                    variant=args.variant, log_path=args.log)
+    dt = time.perf_counter() - t0
+    print(res.summary())
+    print(f"  {dt:.1f} 秒（{res.games / dt * 60:.0f} 局/分, jobs={jobs}）")
+
+
+def cmd_log(args):
+    from .gamelog import json_to_log, log_to_json, read_log
+    if args.log_cmd == "pack":
+        n = json_to_log(args.inputs, args.out)
+        print(f"{n} レコードを {args.out} に書き出しました")
+    elif args.log_cmd == "unpack":
+        json.dump(log_to_json(args.log), sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    elif args.log_cmd == "info":
+        rows = read_log(args.log)
+        games = len(set(rows["game"].tolist())) if len(rows) else 0
+        print(f"{len(rows)} レコード / {games} 局 / {rows.dtype.itemsize} バイト/レコード")
+
+
+def cmd_train_eval(args):
+    from .evaluator import DEFAULT_WEIGHTS, train_from_logs
+    ev, info = train_from_logs(args.logs, l2=args.l2)
+    out = args.out or DEFAULT_WEIGHTS
+    ev.save(out)
+    print(f"{info['rows']} 局面で学習: RMSE {info['rmse']:.3f}（定数予測 {info['baseline_rmse']:.3f}）")
+    print(f"重み: {out}")
+
+
+def cmd_book(args):
+    import os
+    from .opening_book import DEFAULT_BOOK, OpeningBook, build_book, opening_positions
+    if args.book_cmd == "build":
+        keys = list(opening_positions(args.logs, plies=args.plies))
+        jobs = args.jobs or os.cpu_count() or 1
+        print(f"{len(keys)} 局面を読みます（候補ごとに {args.samples} 局, jobs={jobs}）")
+        book = build_book(keys, samples=args.samples, jobs=jobs, seed=args.seed)
+        out = args.out or DEFAULT_BOOK
+        book.save(out)
+        print(f"記録局面の表: {out}（{len(book)} 件）")
+    elif args.book_cmd == "info":
+        book = OpeningBook.load(args.path or DEFAULT_BOOK)
+        print(f"{len(book)} 件 / 容量 {len(book.table)}")
+
+
+def cmd_match_policy(args):
+    import os
+    from .match_policy import DEFAULT_POLICY, MatchPolicy, estimate_outcomes
+    if args.mp_cmd == "build":
+        jobs = args.jobs or os.cpu_count() or 1
+        print(f"方針ごとに {args.games} 局の自己対局（jobs={jobs}）")
+        counts = estimate_outcomes(args.games, variant=args.variant, seed=args.seed, jobs=jobs)
+        policy = MatchPolicy.build(counts, rounds=args.rounds, variant=args.variant)
+        out = args.out or DEFAULT_POLICY
+        policy.save(out)
+        print(f"方針表: {out}")
+    else:
+        policy = MatchPolicy.load(args.path or DEFAULT_POLICY)
+    print(f"{policy.rounds} 局・{policy.variant}（s=慎重 n=普通 b=強気）")
+    se = policy.stderr_points()
+    for (name, (dealer, child)), n in zip(policy.mean_points().items(), policy.games()):
+        sd, sc = se[name]
+        print(f"  {name}: 1局の平均得点 親 {dealer:+.2f}±{sd:.2f} / 子 {child:+.2f}±{sc:.2f}"
+              f"（{n[0]} / {n[1]} 局, ± は標準誤差）")
+    for dealer in (True, False):
+        print("自分が親:" if dealer else "相手が親:")
+        print(*policy.format_table(dealer), sep="\n")
+
+
+def cmd_review(args):
+    import os
+    from .review import ReviewCheckpoint, find_logs, game_reports, iter_report_lines, run_review
+    logs = find_logs(args.paths)
+    if not logs:
+        print("対局ログ（.hhlog）が見つかりません", file=sys.stderr)
+        sys.exit(1)
+    ckpt_path = args.checkpoint
+    if ckpt_path is None:
+        first = Path(args.paths[0])
+        ckpt_path = first / "review.sqlite" if first.is_dir() else first.with_suffix(".review.sqlite")
+    jobs = args.jobs or os.cpu_count() or 1
+
+    def progress(done, total):
+        print(f"\r{done}/{total} 局面", end="", file=sys.stderr, flush=True)
+
+    with ReviewCheckpoint(ckpt_path) as ckpt:
+        n = run_review(logs, ckpt, jobs=jobs, progress=progress)
+        if n:
+            print(file=sys.stderr)
+        reports = game_reports(ckpt, logs)
+    for line in iter_report_lines(reports, top=args.top):
+        print(line)
+    print(f"{len(logs)} ログ / {len(reports)} 局（今回解析 {n} 局面, チェックポイント: {ckpt_path}）")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump([r.to_json(args.top) for r in reports], f, ensure_ascii=False, indent=2)
 
+
+def _month(text: str) -> int:
+    """kabu の月（1〜12）"""
+    try:
+        m = int(text)
+    except ValueError:
+        m = 0
+    if not 1 <= m <= 12:
+        raise argparse.ArgumentTypeError(f"月は 1〜12 で指定してください: {text}")
+    return m
+
+
+def _check_kabu_args(p: argparse.ArgumentParser, args) -> None:
+    if args.advise and len(args.months) != 2:
+        p.error("kabu --advise には手札の月を2つ指定してください")
+    counts = Counter(args.months + args.seen)
+    over = sorted(m for m, n in counts.items() if n > 4)
+    if over:
+        p.error("同じ月の札は4枚までです（手札 + --seen）: " + " ".join(map(str, over)))
+
+
+# ゲームの起動を必要としない（オフラインで完結する）サブコマンド
+OFFLINE_COMMANDS = {"arena", "log", "train-eval", "book", "review", "match-policy"}
+
+
+def main(argv=None):
     p = argparse.ArgumentParser(prog="hanafuda", description="Holo Hanafuda Assistant CLI")
+    p.add_argument("--profile", action="store_true", help="段階別の処理時間を表示（標準エラー出力）")
+    p.add_argument("--profile-out", metavar="PATH", help="cProfile の結果を pstats 形式で保存（--profile を含む）")
+    p.add_argument("--cache", metavar="PATH", default=str(DEFAULT_CACHE_PATH),
+                   help="解析キャッシュ（sqlite）の場所（suggest / eval-yaku）")
+    p.add_argument("--no-cache", action="store_true", help="解析キャッシュを保存しない")
+    p.add_argument("--book", metavar="PATH", help="suggest で先に引く記録局面の表（既定: assets/opening_book.hhbook があれば）")
+    p.add_argument("--no-book", action="store_true", help="記録局面の表を使わない")
     sub = p.add_subparsers(dest="cmd", required=True)
 
     s1 = sub.add_parser("suggest", help="最善手候補の表示")
@@ -63,15 +231,115 @@ def main(argv=None):
     s2.add_argument("state_json")
 
     s3 = sub.add_parser("kabu", help="おいちょかぶの値（例: kabu 12 8 3）")
-    s3.add_argument("months", nargs="+")
+    s3.add_argument("months", nargs="+", type=_month)
+    s3.add_argument("--advise", action="store_true", help="2枚の手札に対して 引く/止める を勝率から推奨")
+    s3.add_argument("--seen", nargs="*", type=_month, default=[], help="既に見えている札の月（山から除外）")
+
+    s4 = sub.add_parser("arena", help="戦略同士の自己対局で強さを比較")
+    s4.add_argument("--a", default="greedy", help="戦略A（random / greedy / greedy-safe / greedy-normal / greedy-bold）")
+    s4.add_argument("--b", default="random", help="戦略B")
+    s4.add_argument("-n", "--games", type=int, default=1000, help="対局数")
+    s4.add_argument("--seed", type=int, default=0, help="最初の局のシード（局 i は seed+i）")
+    s4.add_argument("--jobs", type=int, default=0, help="並列プロセス数（0 = CPU数）")
+    s4.add_argument("--variant", default="holo", choices=variant_names(), help="ルール（rule_variants）")
+    s4.add_argument("--log", help="ログの出力先（.hhlog ならバイナリ、それ以外は1局1行のテキスト）")
+
+    s5 = sub.add_parser("log", help="バイナリ対局ログ（.hhlog）と状態 JSON の変換")
+    s5_sub = s5.add_subparsers(dest="log_cmd", required=True)
+    s5a = s5_sub.add_parser("pack", help="状態 JSON 群 → .hhlog")
+    s5a.add_argument("inputs", nargs="+")
+    s5a.add_argument("-o", "--out", required=True)
+    s5b = s5_sub.add_parser("unpack", help=".hhlog → 状態 JSON のリスト（標準出力）")
+    s5b.add_argument("log")
+    s5c = s5_sub.add_parser("info", help="レコード数などの概要")
+    s5c.add_argument("log")
+
+    s6 = sub.add_parser("train-eval", help="対局ログ（.hhlog）から局面評価器を学習")
+    s6.add_argument("logs", nargs="+")
+    s6.add_argument("-o", "--out", help="重みの保存先（既定: 同梱の assets/eval_linear.npz）")
+    s6.add_argument("--l2", type=float, default=DEFAULT_L2, help="リッジ回帰の正則化の強さ")
+
+    s7 = sub.add_parser("book", help="記録局面の表（対局ログの序盤の局面をオフラインで読んだ最善手）")
+    s7_sub = s7.add_subparsers(dest="book_cmd", required=True)
+    s7a = s7_sub.add_parser("build", help="対局ログ（.hhlog）の序盤の局面を読んで記録局面の表を作る")
+    s7a.add_argument("logs", nargs="+")
+    s7a.add_argument("-o", "--out", help="保存先（既定: 同梱の assets/opening_book.hhbook）")
+    s7a.add_argument("--plies", type=int, default=2, help="各局の最初の何手番を対象にするか")
+    s7a.add_argument("--samples", type=int, default=64, help="候補手ごとの打ち切り対局数")
+    s7a.add_argument("--jobs", type=int, default=0, help="並列プロセス数（0 = CPU数）")
+    s7a.add_argument("--seed", type=int, default=0)
+    s7b = s7_sub.add_parser("info", help="件数などの概要")
+    s7b.add_argument("path", nargs="?")
+
+    s8 = sub.add_parser("review", help="対局ログの各手番を最善手と比べて振り返る（中断しても再開できる）")
+    s8.add_argument("paths", nargs="+", help=".hhlog ファイルかディレクトリ（再帰的に *.hhlog）")
+    s8.add_argument("--checkpoint", help="途中結果の保存先（既定: ディレクトリ内の review.sqlite）")
+    s8.add_argument("--jobs", type=int, default=0, help="並列プロセス数（0 = CPU数）")
+    s8.add_argument("--top", type=int, default=3, help="局ごとに表示する損失の大きい手の数")
+    s8.add_argument("-o", "--out", help="局ごとのレポートを JSON で保存")
+
+    s9 = sub.add_parser("match-policy", help="試合全体（点差・残り局数・親）を見た方針の表")
+    s9_sub = s9.add_subparsers(dest="mp_cmd", required=True)
+    s9a = s9_sub.add_parser("build", help="自己対局で1局の得点分布を数え、動的計画法で表を作る")
+    s9a.add_argument("-n", "--games", type=int, default=3000, help="方針ごとの対局数")
+    s9a.add_argument("--rounds", type=int, default=12, help="1試合の局数")
+    s9a.add_argument("--seed", type=int, default=0)
+    s9a.add_argument("--jobs", type=int, default=0, help="並列プロセス数（0 = CPU数）")
+    s9a.add_argument("--variant", default="holo", choices=variant_names(), help="ルール（rule_variants）")
+    s9a.add_argument("-o", "--out", help="保存先（既定: 同梱の assets/match_policy.npz）")
+    s9b = s9_sub.add_parser("info", help="方針ごとの平均得点と表")
+    s9b.add_argument("path", nargs="?")
 
     args = p.parse_args(argv)
+    if args.cmd == "kabu":
+        _check_kabu_args(p, args)
+    # ゲームの起動確認（オフラインのコマンドは不要）
+    if args.cmd not in OFFLINE_COMMANDS:
+        ゲーム起動確認()
+    if not (args.profile or args.profile_out):
+        return _run(args)
+
+    profiling.enable()
+    prof = None
+    if args.profile_out:
+        import cProfile
+        prof = cProfile.Profile()
+        prof.enable()
+    try:
+        with profiling.stage("total"):
+            _run(args)
+    finally:
+        if prof is not None:
+            prof.disable()
+            prof.dump_stats(args.profile_out)
+        print("\n=== profile ===", file=sys.stderr)
+        print(profiling.format_stats(), file=sys.stderr)
+        if prof is not None:
+            print(f"pstats: {args.profile_out}", file=sys.stderr)
+
+
+def _run(args):
+    cache_path = None if args.no_cache else args.cache
     if args.cmd == "suggest":
-        cmd_suggest(args.state_json)
+        from .opening_book import DEFAULT_BOOK
+        cmd_suggest(args.state_json, cache_path, None if args.no_book else (args.book or DEFAULT_BOOK),
+                    explicit_book=args.book is not None)
     elif args.cmd == "eval-yaku":
-        cmd_eval_yaku(args.state_json)
+        cmd_eval_yaku(args.state_json, cache_path)
     elif args.cmd == "kabu":
-        cmd_kabu(args.months)
+        cmd_kabu(args.months, advise=args.advise, seen=args.seen)
+    elif args.cmd == "arena":
+        cmd_arena(args)
+    elif args.cmd == "log":
+        cmd_log(args)
+    elif args.cmd == "train-eval":
+        cmd_train_eval(args)
+    elif args.cmd == "book":
+        cmd_book(args)
+    elif args.cmd == "review":
+        cmd_review(args)
+    elif args.cmd == "match-policy":
+        cmd_match_policy(args)
 
 
 if __name__ == "__main__":
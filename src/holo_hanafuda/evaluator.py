@@ -0,0 +1,150 @@
+from __future__ import annotations
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from .cards import ALL_CARDS, MONTH_MASK
+from .gamelog import read_log, unpack_masks
+
+"""
+局面評価器（札マスクの線形モデル, 推論は NumPy の行列積のみ）
+
+- 特徴: 手札を1枚出した直後（山からめくる前）の局面を、出した側から見た
+  手札・場札・自分の取り札・相手の取り札 の各 48bit（計 192 次元）。suggest_best_moves が候補手ごとに
+  評価するのと同じ局面（ログの着手前の盤面に、記録された着手を適用して作る）
+- 目的変数: その局の結果を出した側から見た得点（勝ち +点, 負け -点, 流局 0）
+- 学習: 対局ログ（gamelog の .hhlog）からリッジ回帰。X^T X をチャンクごとに足し込むので
+  ログがメモリに載らない大きさでも学習できる
+- 重みは assets/eval_linear.npz。無ければ default_evaluator() は None（呼び出し側は従来の優先度で代用）
+
+探索の葉の評価・着手の並べ替えに使う想定（多数の局面を1回の行列積で評価する）。
+"""
+
+DEFAULT_WEIGHTS = Path(__file__).parent / "assets" / "eval_linear.npz"
+N_FEATURES = 4 * 48
+DEFAULT_L2 = 10.0   # リッジ回帰の正則化の強さ（train_from_logs と train-eval --l2 の既定）
+
+
+def features(hand, field, cap_self, cap_opp) -> np.ndarray:
+    """u8 マスク列（同じ長さ N）→ (N, 192) の float32 特徴"""
+    zones = [np.atleast_1d(np.asarray(z, dtype=np.uint64)) for z in (hand, field, cap_self, cap_opp)]
+    return np.concatenate([unpack_masks(z) for z in zones], axis=1).astype(np.float32)
+
+
+class LinearEvaluator:
+    def __init__(self, weights: np.ndarray, bias: float):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = float(bias)
+        if self.weights.shape != (N_FEATURES,):
+            raise ValueError(f"Unexpected weight shape: {self.weights.shape}")
+
+    def evaluate(self, hand, field, cap_self, cap_opp) -> np.ndarray:
+        """局面（手番側視点）の評価値をまとめて計算する。マスクはスカラでも配列でもよい"""
+        return features(hand, field, cap_self, cap_opp) @ self.weights + self.bias
+
+    def save(self, path: str | Path) -> None:
+        np.savez(path, weights=self.weights, bias=np.float32(self.bias))
+
+    @staticmethod
+    def load(path: str | Path) -> "LinearEvaluator":
+        with np.load(path) as z:
+            return LinearEvaluator(z["weights"], float(z["bias"]))
+
+
+@lru_cache(maxsize=1)
+def default_evaluator() -> LinearEvaluator | None:
+    """同梱の重み（無ければ None）"""
+    if not DEFAULT_WEIGHTS.exists():
+        return None
+    return LinearEvaluator.load(DEFAULT_WEIGHTS)
+
+
+def evaluator_id() -> str:
+    """同梱の重みの識別子（ファイルの sha1 の先頭 12 桁, 無ければ "none"）。解析結果のキャッシュのキーに使う"""
+    if not DEFAULT_WEIGHTS.exists():
+        return "none"
+    return hashlib.sha1(DEFAULT_WEIGHTS.read_bytes()).hexdigest()[:12]
+
+
+# ───────────────────────────────────────────────────────────
+# 学習
+# ───────────────────────────────────────────────────────────
+
+_CARD_MONTH_MASK = np.array([MONTH_MASK[c.month] for c in ALL_CARDS], dtype=np.uint64)
+_ONE = np.uint64(1)
+
+
+def _after_play(hand, field, cap, play, target):
+    """
+    着手（出した札, 取り先）を適用した (手札, 場札, 取り札)。配列でまとめて計算する。
+    場の同月札が 0枚なら場に出す / 1枚・3枚ならその全部を取る / 2枚なら取り先（無ければ番号の小さい方）。
+    2期生のロックはログに無いので考えない（suggest_best_moves も同じ。ロック中の手番は 0.1% 程度）
+    """
+    hand, field, cap = (np.asarray(x, dtype=np.uint64) for x in (hand, field, cap))
+    play, target = np.asarray(play, dtype=np.int64), np.asarray(target, dtype=np.int64)
+    bit = _ONE << play.astype(np.uint64)
+    same = field & _CARD_MONTH_MASK[play]
+    n = unpack_masks(same).sum(axis=1)
+    chosen = _ONE << np.maximum(target, 0).astype(np.uint64)
+    low = same & (~same + _ONE)
+    taken = np.where(n == 2, np.where((target >= 0) & (same & chosen != 0), chosen, low), same)
+    return (hand & ~bit,
+            np.where(n == 0, field | bit, field & ~taken),
+            np.where(n == 0, cap, cap | taken | bit))
+
+
+def log_examples(rows: np.ndarray):
+    """
+    ログのレコード → 着手直後の (手札, 場札, 自分の取り札, 相手の取り札, 目的変数)（出した側から見る）。
+    結果不明の行・着手の無い行は除く
+    """
+    rows = rows[(rows["winner"] >= 0) & (rows["play"] >= 0)]
+    p1 = rows["turn"] == 1
+    hand = np.where(p1, rows["hand1"], rows["hand0"])
+    cap_self = np.where(p1, rows["captured1"], rows["captured0"])
+    cap_opp = np.where(p1, rows["captured0"], rows["captured1"])
+    hand, field, cap_self = _after_play(hand, rows["field"], cap_self, rows["play"], rows["target"])
+    score = rows["final_score"].astype(np.float64)
+    y = np.where(rows["winner"] == 2, 0.0, np.where(rows["winner"] == rows["turn"], score, -score))
+    return hand, field, cap_self, cap_opp, y
+
+
+def train_from_logs(paths: Sequence[str | Path] | Iterable[str | Path], *, l2: float = DEFAULT_L2,
+                    chunk: int = 200_000) -> tuple[LinearEvaluator, dict]:
+    """リッジ回帰で学習する。(評価器, {"rows", "rmse", "baseline_rmse"}) を返す"""
+    d = N_FEATURES + 1
+    xtx = np.zeros((d, d))
+    xty = np.zeros(d)
+    yty = 0.0
+    ysum = 0.0
+    n = 0
+    for path in paths:
+        log = read_log(path)
+        for s in range(0, len(log), chunk):
+            hand, field, cap_self, cap_opp, y = log_examples(np.asarray(log[s:s + chunk]))
+            if len(y) == 0:
+                continue
+            x = np.empty((len(y), d))
+            x[:, :-1] = features(hand, field, cap_self, cap_opp)
+            x[:, -1] = 1.0
+            xtx += x.T @ x
+            xty += x.T @ y
+            yty += float(y @ y)
+            ysum += float(y.sum())
+            n += len(y)
+    if n == 0:
+        raise ValueError("No finished games in the given logs")
+    reg = np.full(d, l2)
+    reg[-1] = 0.0  # 切片は正則化しない
+    w = np.linalg.solve(xtx + np.diag(reg), xty)
+    sse = yty - 2 * w @ xty + w @ xtx @ w
+    mean = ysum / n
+    info = {
+        "rows": n,
+        "rmse": float(np.sqrt(max(sse, 0.0) / n)),
+        "baseline_rmse": float(np.sqrt(max(yty / n - mean * mean, 0.0))),
+    }
+    return LinearEvaluator(w[:-1], w[-1]), info
@@ -0,0 +1,245 @@
+from __future__ import annotations
+import multiprocessing as mp
+import sys
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Iterator, Tuple
+
+import numpy as np
+
+"""
+キャプチャ用プロセスと解析側で画面フレームを共有するリングバッファ（multiprocessing.shared_memory）
+
+- 共有メモリの先頭に int64 のヘッダ [最新の seq, 終了フラグ, スロットごとの seq × slots]、続けて
+  slots 枚分の BGR フレーム（uint8, shape = (h, w, 3)）を置く
+- 書き手は seq 番目のフレームをスロット seq % slots に書く。書いている間はそのスロットの seq を -1 にし、
+  書き終えてから seq を入れて最新の seq を進める
+- 読み手は NumPy のビュー（コピーなし）と seq を受け取る。ビューはスロットが上書きされるまで有効なので、
+  使い終わったら valid(seq) で確かめ、False なら結果を捨てて読み直す（slots 枚分の余裕がある）
+- 別プロセスへは RingSpec（名前・形状・スロット数）だけを渡し、FrameRing.attach で開く。フレームを
+  pickle しないので、1440p・10fps でも1フレームあたりのコピーは キャプチャ → 共有メモリ の1回だけ
+"""
+
+HEADER_FIELDS = 2   # 最新の seq, 終了フラグ
+DEFAULT_SLOTS = 4
+
+
+@dataclass(frozen=True)
+class RingSpec:
+    name: str
+    shape: Tuple[int, int, int]   # (h, w, 3)
+    slots: int = DEFAULT_SLOTS
+
+
+def _attach_shm(name: str) -> shared_memory.SharedMemory:
+    """
+    既存の共有メモリを開く。3.13 以降は開いた側では resource_tracker に登録しない。
+    それより前は登録されるが、読み手は作成側から multiprocessing で起動した子プロセス
+    （resource_tracker を共有する）を前提にしているので、消されるのは作成側の unlink 時だけ
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+class FrameRing:
+    """共有メモリ上のフレームのリング。create で作った側（owner）が unlink する"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, spec: RingSpec, owner: bool):
+        self._shm = shm
+        self.spec = spec
+        self.owner = owner
+        n = HEADER_FIELDS + spec.slots
+        self._header = np.ndarray((n,), dtype=np.int64, buffer=shm.buf)
+        self._frames = np.ndarray((spec.slots,) + tuple(spec.shape), dtype=np.uint8, buffer=shm.buf,
+                                  offset=n * 8)
+        self._slot_seq = self._header[HEADER_FIELDS:]
+
+    @staticmethod
+    def create(shape: Tuple[int, int, int], slots: int = DEFAULT_SLOTS, name: str | None = None) -> "FrameRing":
+        shape = tuple(int(v) for v in shape)
+        size = (HEADER_FIELDS + slots) * 8 + slots * int(np.prod(shape))
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        ring = FrameRing(shm, RingSpec(shm.name, shape, slots), owner=True)
+        ring._header[:] = 0
+        ring._slot_seq[:] = -1
+        return ring
+
+    @staticmethod
+    def attach(spec: RingSpec) -> "FrameRing":
+        return FrameRing(_attach_shm(spec.name), spec, owner=False)
+
+    # --- 書き手 ---
+
+    def begin_write(self) -> Tuple[int, np.ndarray]:
+        """次の seq と書き込み先スロットのビュー。書き終えたら commit(seq)"""
+        seq = int(self._header[0]) + 1
+        self._slot_seq[seq % self.spec.slots] = -1
+        return seq, self._frames[seq % self.spec.slots]
+
+    def commit(self, seq: int) -> None:
+        self._slot_seq[seq % self.spec.slots] = seq
+        self._header[0] = seq
+
+    def write(self, frame: np.ndarray) -> int:
+        """frame をコピーして書き込み、その seq を返す"""
+        seq, slot = self.begin_write()
+        np.copyto(slot, frame)
+        self.commit(seq)
+        return seq
+
+    def close_writer(self) -> None:
+        """読み手に終了を知らせる（frames() が止まる）"""
+        self._header[1] = 1
+
+    # --- 読み手 ---
+
+    @property
+    def seq(self) -> int:
+        """最新の seq（まだ1枚も無ければ 0）"""
+        return int(self._header[0])
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._header[1])
+
+    def valid(self, seq: int) -> bool:
+        """seq のフレームがまだ上書きされていないか"""
+        return seq > 0 and int(self._slot_seq[seq % self.spec.slots]) == seq
+
+    def read(self, seq: int) -> np.ndarray | None:
+        """seq のフレームのビュー（上書き済み・書き込み中なら None）"""
+        return self._frames[seq % self.spec.slots] if self.valid(seq) else None
+
+    def latest(self) -> Tuple[int, np.ndarray] | None:
+        seq = self.seq
+        view = self.read(seq)
+        return None if view is None else (seq, view)
+
+    def wait(self, after: int, timeout: float | None = None, poll: float = 0.002) -> Tuple[int, np.ndarray] | None:
+        """seq > after のフレームが来るまで待って最新のものを返す（timeout・終了で None）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.seq > after:
+                hit = self.latest()
+                if hit is not None:
+                    return hit
+            if self.closed or (deadline is not None and time.monotonic() >= deadline):
+                return None
+            time.sleep(poll)
+
+    def frames(self, timeout: float | None = None) -> Iterator[Tuple[int, np.ndarray]]:
+        """新しいフレームを順に (seq, ビュー) で返す。処理が遅ければ間のフレームは飛ばす"""
+        last = 0
+        while True:
+            hit = self.wait(last, timeout)
+            if hit is None:
+                return
+            last = hit[0]
+            yield hit
+
+    def close(self) -> None:
+        # ビューを手放してから閉じる（残っていると BufferError）
+        self._header = self._frames = self._slot_seq = None
+        self._shm.close()
+        if self.owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self) -> "FrameRing":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# ───────────────────────────────────────────────────────────
+# キャプチャ用プロセス
+# ───────────────────────────────────────────────────────────
+
+def capture_loop(spec: RingSpec, region: Tuple[int, int, int, int], interval, stop) -> None:
+    """
+    region=(left, top, w, h) を interval 秒ごとにキャプチャしてリングに書く（別プロセスで実行）。
+    interval は共有の mp.Value("d")（実行中に親から変えられる）
+    """
+    import mss
+    left, top, w, h = region
+    mon = {"left": left, "top": top, "width": w, "height": h}
+    ring = FrameRing.attach(spec)
+    try:
+        with mss.mss() as sct:
+            while not stop.is_set():
+                started = time.perf_counter()
+                raw = sct.grab(mon)
+                seq, slot = ring.begin_write()
+                np.copyto(slot, np.asarray(raw)[..., :3])  # BGRA -> BGR を共有メモリへ直接
+                ring.commit(seq)
+                stop.wait(max(0.0, interval.value - (time.perf_counter() - started)))
+    finally:
+        ring.close_writer()
+        ring.close()
+
+
+class CaptureProcess:
+    """
+    画面領域をキャプチャし続ける子プロセスと、そのフレームリング。
+    解析側は self.ring（同じプロセス）か FrameRing.attach(self.spec)（別プロセス）で読む。
+    """
+
+    def __init__(self, region: Tuple[int, int, int, int], *, fps: float = 10.0, slots: int = DEFAULT_SLOTS):
+        self.region = tuple(region)
+        self._interval = mp.Value("d", 1.0 / fps, lock=False)
+        _, _, w, h = self.region
+        self.ring = FrameRing.create((h, w, 3), slots)
+        self._stop = mp.Event()
+        self._proc: mp.Process | None = None
+
+    @property
+    def spec(self) -> RingSpec:
+        return self.ring.spec
+
+    @property
+    def interval(self) -> float:
+        return self._interval.value
+
+    @property
+    def fps(self) -> float:
+        return 1.0 / self._interval.value
+
+    def set_fps(self, fps: float) -> None:
+        """キャプチャの頻度を変える（実行中でも次のフレームから効く）"""
+        self._interval.value = 1.0 / fps
+
+    @property
+    def running(self) -> bool:
+        return self._proc is not None and self._proc.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._proc = mp.Process(target=capture_loop, args=(self.spec, self.region, self._interval, self._stop),
+                                name="FrameCapture", daemon=True)
+        self._proc.start()
+
+    def stop(self, timeout: float | None = 2.0) -> None:
+        self._stop.set()
+        if self._proc is not None:
+            self._proc.join(timeout)
+            if self._proc.is_alive():
+                self._proc.terminate()
+            self._proc = None
+
+    def close(self) -> None:
+        self.stop()
+        self.ring.close()
+
+    def __enter__(self) -> "CaptureProcess":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,162 @@
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Iterable, List
+
+import numpy as np
+
+from .cards import mask_to_cards, zone_masks
+from .rule_variants import variant_names
+from .state import GameState
+
+"""
+対局ログのバイナリ形式（固定長レコード, NumPy structured dtype）
+
+ファイル = 16 バイトのヘッダ（MAGIC 8B + レコード長 u4 + 予約 u4）+ RECORD_DTYPE の配列。
+1行 = 1手番: 着手前の盤面（札マスク）・手番・着手・その時点の役点・対局の結果。
+読み込みは np.memmap でそのままバッチ処理に渡せる（1レコードずつのパースは不要）。
+
+札マスクは cards.py のビット順（ALL_CARDS の並び, 48bit）。unpack_masks で (N, 48) の 0/1 に展開できる。
+"""
+
+MAGIC = b"HHFLOG\x00\x01"
+HEADER_SIZE = 16
+VARIANTS = variant_names()   # variant 列の番号（rule_variants.VARIANT_RULES の並び）
+
+RECORD_DTYPE = np.dtype([
+    ("game", "<u4"),          # 局番号（アリーナではシード）
+    ("ply", "<u2"),           # 何手目か（0 始まり）
+    ("turn", "u1"),           # 手番の席 0/1
+    ("variant", "u1"),        # VARIANTS の番号
+    ("hand0", "<u8"), ("hand1", "<u8"), ("field", "<u8"),
+    ("captured0", "<u8"), ("captured1", "<u8"),
+    ("play", "i1"),           # 出した札（ビット位置, -1 = なし）
+    ("target", "i1"),         # 取った場札（-1 = 選択なし）
+    ("drawn", "i1"),          # 山からめくった札（-1 = なし）
+    ("draw_target", "i1"),    # めくり札の取り先（-1 = 選択なし）
+    ("points0", "<i2"), ("points1", "<i2"),  # 着手前の役点
+    ("winner", "i1"),         # 対局の勝者の席（2 = 流局, -1 = 不明）
+    ("final_score", "<i2"),   # 勝者の得点
+])
+
+
+def variant_id(name: str) -> int:
+    """variant 名 → variant 列の番号。未知の名前は記録できない（読み込むと別のルールになってしまう）"""
+    if name not in VARIANTS:
+        raise KeyError(f"Unknown variant: {name} (available: {', '.join(VARIANTS)})")
+    return VARIANTS.index(name)
+
+
+def empty_rows(n: int) -> np.ndarray:
+    rows = np.zeros(n, dtype=RECORD_DTYPE)
+    for k in ("play", "target", "drawn", "draw_target", "winner"):
+        rows[k] = -1
+    return rows
+
+
+# ───────────────────────────────────────────────────────────
+# 書き込み / 読み込み
+# ───────────────────────────────────────────────────────────
+
+class GameLogWriter:
+    """レコードを追記するライター（既存ファイルへの追記も可）"""
+
+    def __init__(self, path: str | Path, append: bool = False):
+        self.path = Path(path)
+        exists = append and self.path.exists() and self.path.stat().st_size >= HEADER_SIZE
+        if exists:
+            _check_header(self.path)
+        self._f = open(self.path, "ab" if exists else "wb")
+        if not exists:
+            self._f.write(MAGIC + np.array([RECORD_DTYPE.itemsize, 0], dtype="<u4").tobytes())
+        self.count = 0
+
+    def write(self, rows: np.ndarray) -> None:
+        rows = np.ascontiguousarray(rows, dtype=RECORD_DTYPE)
+        self._f.write(rows.tobytes())
+        self.count += len(rows)
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _check_header(path: Path) -> None:
+    with open(path, "rb") as f:
+        head = f.read(HEADER_SIZE)
+    if len(head) < HEADER_SIZE or head[:8] != MAGIC:
+        raise ValueError(f"Not a game log: {path}")
+    size = int(np.frombuffer(head[8:12], dtype="<u4")[0])
+    if size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"Record size mismatch in {path}: {size} != {RECORD_DTYPE.itemsize}")
+
+
+def read_log(path: str | Path) -> np.ndarray:
+    """ログ全体を memmap（読み取り専用）で返す"""
+    path = Path(path)
+    _check_header(path)
+    n = (path.stat().st_size - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if n == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE, shape=(n,))
+
+
+def unpack_masks(masks: np.ndarray) -> np.ndarray:
+    """u8 の札マスク列 (N,) → (N, 48) の uint8 (0/1)"""
+    m = np.ascontiguousarray(masks, dtype="<u8")
+    return np.unpackbits(m.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")[:, :48]
+
+
+def pack_masks(bits: np.ndarray) -> np.ndarray:
+    """unpack_masks の逆"""
+    b = np.zeros((len(bits), 64), dtype=np.uint8)
+    b[:, :48] = bits
+    return np.packbits(b, axis=1, bitorder="little").view("<u8").ravel()
+
+
+# ───────────────────────────────────────────────────────────
+# JSON（GameState）との変換
+# ───────────────────────────────────────────────────────────
+
+def state_to_row(gs: GameState, *, game: int = 0, ply: int = 0) -> np.ndarray:
+    """GameState（自分 = 席0）を1レコードに。相手手札は不明なので 0"""
+    row = empty_rows(1)
+    row["game"] = game
+    row["ply"] = ply
+    row["variant"] = variant_id(gs.config.get("variant", "holo"))
+    hand, field, cap_self, cap_opp = zone_masks((gs.hand, gs.field, gs.captured_self, gs.captured_opp))
+    row["hand0"], row["field"], row["captured0"], row["captured1"] = hand, field, cap_self, cap_opp
+    return row
+
+
+def row_to_state(row) -> GameState:
+    """1レコード → 手番プレイヤー視点の GameState"""
+    p = int(row["turn"])
+    return GameState(
+        hand=mask_to_cards(int(row[f"hand{p}"])),
+        field=mask_to_cards(int(row["field"])),
+        captured_self=mask_to_cards(int(row[f"captured{p}"])),
+        captured_opp=mask_to_cards(int(row[f"captured{1 - p}"])),
+        config={"variant": VARIANTS[int(row["variant"])]},
+    )
+
+
+def json_to_log(json_paths: Iterable[str | Path], out: str | Path) -> int:
+    """状態 JSON（examples/*.json 形式）をまとめて1つのログへ。書いたレコード数を返す"""
+    with GameLogWriter(out) as w:
+        for i, p in enumerate(json_paths):
+            data = json.load(open(p, "r", encoding="utf-8"))
+            w.write(state_to_row(GameState.from_json(data), game=i))
+        return w.count
+
+
+def log_to_json(path: str | Path, indices: Iterable[int] | None = None) -> List[dict]:
+    """ログのレコードを状態 JSON（GameState.to_json）のリストへ"""
+    rows = read_log(path)
+    idx = range(len(rows)) if indices is None else indices
+    return [row_to_state(rows[i]).to_json() for i in idx]
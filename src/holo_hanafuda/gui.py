@@ -1,19 +1,22 @@
 import sys
 import json
+import time
 import psutil
 from PySide6.QtGui import QPainter, QPen, QColor, QMouseEvent
 from PySide6.QtCore import QRect
-from typing import List
-from PySide6.QtCore import Qt
+from typing import Dict, List, Tuple
+from PySide6.QtCore import Qt, QObject, QTimer, Signal
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QComboBox, QListWidget, QListWidgetItem, QTextEdit, QMessageBox, QGroupBox
+    QComboBox, QListWidget, QListWidgetItem, QTextEdit, QMessageBox, QGroupBox, QCheckBox, QSpinBox
 )
-from .vision import load_templates, grab_screen, match_templates
-from .cards import ALL_CARDS
+from .vision import load_templates, load_signatures, grab_screen, match_templates, calibrate_templates, FrameScheduler, LiveDetector, LiveFrame
+from .card_assignment import ASSIGN_MIN_SCORE, assign_cards, assign_zones
+from .cards import ALL_CARDS, cards_to_mask
 from .state import GameState
-from .koikoi_strategy import suggest_best_moves, suggest_highest_yaku_line
-from .koikoi_rules import evaluate_yaku, yaku_points
+from .analysis import analyze, open_cache
+from .match_policy import MATCH_ROUNDS
+from . import profiling
 
 # ------------------------------
 # ユーティリティ
@@ -39,6 +42,16 @@ def build_tag_options():
 
 TAG_OPTIONS = build_tag_options()
 
+# ライブモード: 検出結果が変化してから解析するまでの待ち時間（ミリ秒）
+LIVE_DEBOUNCE_MS = 400
+# ライブモードで領域を指定する順番（ゾーン名, 表示名）
+LIVE_ZONES = [
+    ("hand", "手札"),
+    ("field", "場札"),
+    ("captured_self", "自分の取札"),
+    ("captured_opp", "相手の取札"),
+]
+
 def token_from_selection(month: str, kind: str, tag: str) -> str:
     """<month>:<kind[-tag]> 形式のトークン文字列を作る"""
     return f"{month}:{kind}" + (f"-{tag}" if tag else "")
@@ -51,6 +64,24 @@ def ensure_game_running_or_quit(parent: QWidget | None = None):
     QMessageBox.critical(parent, "エラー", "HolosHanafuda.exe が起動していません。\nゲームを起動してから再実行してください。")
     sys.exit(1)
 
+def pick_region() -> Tuple[int, int, int, int] | None:
+    """RegionPicker を表示し、ドラッグで選んだ (left, top, w, h) を返す（キャンセル時 None）"""
+    picker = RegionPicker()
+    picker.show()
+    picker.raise_()
+    picker.activateWindow()
+    app = QApplication.instance()
+    while picker.isVisible():
+        app.processEvents()
+    r = picker.result_rect
+    if r and r.width() > 10 and r.height() > 10:
+        return (r.left(), r.top(), r.width(), r.height())
+    return None
+
+class _LiveBridge(QObject):
+    """検出スレッド → GUI スレッドへ LiveFrame を渡すためのシグナル"""
+    frame = Signal(object)
+
 # ------------------------------
 # メインウィンドウ
 # ------------------------------
@@ -61,6 +92,7 @@ class HanafudaGUI(QWidget):
         self.setWindowTitle("HolosHanafuda アシスタント")
 
         ensure_game_running_or_quit(self)
+        self._cache = open_cache()
 
         root = QVBoxLayout(self)
 
@@ -130,6 +162,52 @@ class HanafudaGUI(QWidget):
         self.btn_read_hand.clicked.connect(lambda: self._read_from_screen(self.lst_hand["list"]))
         self.btn_read_field.clicked.connect(lambda: self._read_from_screen(self.lst_field["list"]))
 
+        # --- 試合の状況（match_policy の方針を選ぶ） ---
+        match = QHBoxLayout()
+        self.chk_match = QCheckBox("試合の状況を使う")
+        self.spn_diff = QSpinBox()
+        self.spn_diff.setRange(-999, 999)
+        self.spn_rounds = QSpinBox()
+        self.spn_rounds.setRange(1, MATCH_ROUNDS)
+        self.spn_rounds.setValue(MATCH_ROUNDS)
+        self.chk_dealer = QCheckBox("自分が親")
+        match.addWidget(self.chk_match)
+        match.addWidget(QLabel("点差（自分-相手）"))
+        match.addWidget(self.spn_diff)
+        match.addWidget(QLabel("残り局数"))
+        match.addWidget(self.spn_rounds)
+        match.addWidget(self.chk_dealer)
+        match.addStretch()
+        root.addLayout(match)
+
+        # --- ライブモード ---
+        live = QHBoxLayout()
+        self.btn_live_regions = QPushButton("ライブ領域を設定")
+        self.btn_live = QPushButton("ライブ解析 開始")
+        self.btn_live.setCheckable(True)
+        self.lbl_timings = QLabel("capture: - ms / match: - ms / analyze: - ms")
+        live.addWidget(self.btn_live_regions)
+        live.addWidget(self.btn_live)
+        live.addWidget(self.lbl_timings)
+        live.addStretch()
+        root.addLayout(live)
+
+        self._live_regions: Dict[str, Tuple[int, int, int, int]] = {}
+        self._live_detector: LiveDetector | None = None
+        self._live_bridge = _LiveBridge()
+        self._live_bridge.frame.connect(self._on_live_frame)
+        self._live_pending: LiveFrame | None = None
+        self._live_pending_key: tuple | None = None
+        self._live_analyzed_key: tuple | None = None
+        self._live_timings = {"capture": None, "match": None, "analyze": None}
+        self._live_schedule = None
+        self._live_debounce = QTimer(self)
+        self._live_debounce.setSingleShot(True)
+        self._live_debounce.timeout.connect(self._apply_live_frame)
+
+        self.btn_live_regions.clicked.connect(self._pick_live_regions)
+        self.btn_live.toggled.connect(self._toggle_live)
+
 
         # --- 結果表示 ---
         root.addWidget(QLabel("解析結果"))
@@ -137,6 +215,28 @@ class HanafudaGUI(QWidget):
         self.result.setReadOnly(True)
         root.addWidget(self.result, 1)
 
+        # --- 計測（処理時間の統計） ---
+        stats_box = QGroupBox("処理時間の統計")
+        stats_layout = QVBoxLayout()
+        stats_box.setLayout(stats_layout)
+        stats_ops = QHBoxLayout()
+        self.chk_profile = QCheckBox("計測する")
+        self.btn_stats_reset = QPushButton("統計をリセット")
+        stats_ops.addWidget(self.chk_profile)
+        stats_ops.addWidget(self.btn_stats_reset)
+        stats_ops.addStretch()
+        stats_layout.addLayout(stats_ops)
+        self.stats = QTextEdit()
+        self.stats.setReadOnly(True)
+        self.stats.setLineWrapMode(QTextEdit.NoWrap)
+        self.stats.setStyleSheet("font-family: monospace;")
+        self.stats.setMaximumHeight(140)
+        stats_layout.addWidget(self.stats)
+        root.addWidget(stats_box)
+
+        self.chk_profile.toggled.connect(self._toggle_profile)
+        self.btn_stats_reset.clicked.connect(self._reset_stats)
+
         # --- シグナル接続 ---
         self.btn_add_hand.clicked.connect(lambda: self._add_to(self.lst_hand["list"]))
         self.btn_add_field.clicked.connect(lambda: self._add_to(self.lst_field["list"]))
@@ -196,20 +296,25 @@ class HanafudaGUI(QWidget):
             "field": items(self.lst_field["list"]),
             "captured_self": items(self.lst_self["list"]),
             "captured_opp": items(self.lst_opp["list"]),
-            "config": {"variant": "holo"}
+            "config": self._config(),
         }
 
+    def _config(self) -> dict:
+        config = {"variant": "holo"}
+        if self.chk_match.isChecked():
+            config["match"] = {"score_diff": self.spn_diff.value(), "rounds_left": self.spn_rounds.value(),
+                               "dealer": self.chk_dealer.isChecked()}
+        return config
+
     def _analyze(self):
+        started = time.perf_counter()
         try:
             data = self._collect_state()
             gs = GameState.from_json(data)
 
-            moves = suggest_best_moves(gs.hand, gs.field, gs.captured_self, gs.captured_opp)
-            hints = suggest_highest_yaku_line(gs.hand, gs.field, gs.captured_self)
-
-            # 役判定（CLIと同じロジック）
-            yaku = evaluate_yaku(gs.captured_self, variant="holo", initial_hand=gs.hand)
-            total = yaku_points(gs.captured_self, variant="holo", initial_hand=gs.hand)
+            # 最善手・ヒント・役判定（CLIと同じロジック, 同じ局面は解析キャッシュから）
+            res = analyze(gs, self._cache)
+            moves, hints, yaku, total = res.moves, res.hints, res.yaku, res.total
 
             lines: List[str] = []
             lines.append("=== 最善手候補 ===")
@@ -218,15 +323,26 @@ class HanafudaGUI(QWidget):
             else:
                 for i, m in enumerate(moves, 1):
                     cap = f" +{m.capture_with.key()}" if m.capture_with else ""
-                    lines.append(f"[{i}] {m.play.key()}{cap}  Δscore={m.score_delta}  {m.note}")
+                    lines.append(f"[{i}] {m.play.key()}{cap}  Δscore={m.score_delta}  期待値={m.expected:+.2f}  {m.note}")
+
+            if res.threats:
+                lines.append("\n=== 相手に取られる危険 ===")
+                for c, d in res.threats:
+                    lines.append(f"- {c.key()}: {d:.2f}")
 
-            lines.append("\n=== 最高役を狙うヒント ===")
+            lines.append("\n=== 役の狙い筋（期待点の高い順）===")
             if not hints:
                 lines.append("(なし)")
             else:
                 for h in hints:
                     lines.append(f"- {h}")
 
+            if res.profile is not None:
+                lines.append("\n=== 試合の方針 ===")
+                lines.append(res.profile.describe())
+                if res.koikoi is not None:
+                    lines.append("役ができたら: " + ("こいこい" if res.koikoi else "あがる"))
+
             lines.append("\n=== 現在の成立役 ===")
             if not yaku:
                 lines.append("役は未成立")
@@ -240,11 +356,140 @@ class HanafudaGUI(QWidget):
             lines.append(json.dumps(data, ensure_ascii=False, indent=2))
 
             self.result.setPlainText("\n".join(lines))
+            self._live_timings["analyze"] = (time.perf_counter() - started) * 1000.0
+            if profiling.is_enabled():
+                profiling.record("analyze", self._live_timings["analyze"] / 1000.0)
+            self._refresh_stats()
 
         except Exception as e:
             QMessageBox.critical(self, "エラー", f"解析中にエラーが発生しました:\n{e}")
             raise
 
+    # --- 計測 ---
+
+    def _toggle_profile(self, on: bool):
+        profiling.enable(on)
+        self._refresh_stats()
+
+    def _reset_stats(self):
+        profiling.reset()
+        self._cache.clear()
+        self._refresh_stats()
+
+    def _refresh_stats(self):
+        cs = self._cache.stats()
+        lines = [f"解析キャッシュ: hit {cs.hits} / miss {cs.misses}（うちディスク {cs.disk_hits}）"
+                 f"  hit率 {cs.hit_rate:.0%}  {cs.size} 件"]
+        if profiling.is_enabled():
+            lines += ["", profiling.format_stats()]
+        self.stats.setPlainText("\n".join(lines))
+
+    # --- ライブモード ---
+
+    def _pick_live_regions(self):
+        regions: Dict[str, Tuple[int, int, int, int]] = {}
+        for zone, label in LIVE_ZONES:
+            ans = QMessageBox.question(
+                self, "ライブ領域", f"「{label}」の領域をドラッグで指定しますか？（いいえ=このゾーンは手入力のまま）"
+            )
+            if ans != QMessageBox.Yes:
+                continue
+            region = pick_region()
+            if region is not None:
+                regions[zone] = region
+        self._live_regions = regions
+        if self._live_detector is not None:
+            self._live_detector.regions = dict(regions)
+            if self._live_detector.scheduler is not None:
+                self._live_detector.scheduler.forget()
+
+    def _toggle_live(self, on: bool):
+        if not on:
+            self._stop_live()
+            return
+        if not self._live_regions:
+            QMessageBox.warning(self, "ライブ解析", "先に「ライブ領域を設定」で読み取る領域を指定してください。")
+            self.btn_live.setChecked(False)
+            return
+        tmps = load_templates()
+        if not tmps:
+            QMessageBox.warning(self, "テンプレ未準備", "assets/templates/*.png が見つかりません。")
+            self.btn_live.setChecked(False)
+            return
+        self._live_analyzed_key = None
+        # 検出は札の割り当て（assign_zones）で整合させるので、閾値を下げて1スケールで照合する。
+        # 間隔・照合の細かさはスケジューラが CPU 予算内で決める（画面が変わらなければ 1fps で待機）
+        self._live_detector = LiveDetector(self._live_regions, tmps, threshold=ASSIGN_MIN_SCORE,
+                                           scheduler=FrameScheduler())
+        self._live_detector.subscribe(self._live_bridge.frame.emit)
+        self._live_detector.start()
+        self.btn_live.setText("ライブ解析 停止")
+
+    def _stop_live(self):
+        if self._live_detector is not None:
+            self._live_detector.stop()
+            self._live_detector = None
+        self._live_debounce.stop()
+        self._live_pending = None
+        self._live_pending_key = None
+        self.btn_live.setText("ライブ解析 開始")
+
+    def _live_tokens(self, frame: LiveFrame) -> Dict[str, List[str]]:
+        """検出結果を札に割り当てたトークン（同じ札は1回だけ, 手入力のゾーンの札は除く）"""
+        known = GameState.from_json(self._collect_state())
+        cards = assign_zones(frame.zones, {z: getattr(known, z) for z in ("hand", "field", "captured_self", "captured_opp")})
+        return {z: [c.key() for c in cs] for z, cs in cards.items()}
+
+    def _live_state(self, frame: LiveFrame) -> GameState:
+        """現在のリストに検出結果を上書きした GameState（未設定ゾーンは手入力のまま）"""
+        data = self._collect_state()
+        data.update(self._live_tokens(frame))
+        return GameState.from_json(data)
+
+    def _on_live_frame(self, frame: LiveFrame):
+        self._live_timings["capture"] = frame.timings.get("capture")
+        self._live_timings["match"] = frame.timings.get("match")
+        self._live_schedule = frame.schedule
+        self._show_live_timings()
+        self._refresh_stats()
+        try:
+            key = self._live_state(frame).key()
+        except (KeyError, ValueError):
+            return  # 読み取り途中の不正なトークンは無視
+        if key == self._live_pending_key:
+            return  # 同じ局面 → タイマーはそのまま（安定待ち）
+        self._live_pending = frame
+        self._live_pending_key = key
+        self._live_debounce.start(LIVE_DEBOUNCE_MS)
+
+    def _apply_live_frame(self):
+        frame, key = self._live_pending, self._live_pending_key
+        if frame is None or key == self._live_analyzed_key:
+            return
+        lists = {"hand": self.lst_hand, "field": self.lst_field,
+                 "captured_self": self.lst_self, "captured_opp": self.lst_opp}
+        for zone, tokens in self._live_tokens(frame).items():
+            lst = lists[zone]["list"]
+            lst.clear()
+            for t in tokens:
+                lst.addItem(QListWidgetItem(t))
+        self._analyze()
+        self._live_analyzed_key = key
+        self._show_live_timings()
+
+    def _show_live_timings(self):
+        def fmt(v): return "-" if v is None else f"{v:.1f}"
+        t = self._live_timings
+        text = f"capture: {fmt(t['capture'])} ms / match: {fmt(t['match'])} ms / analyze: {fmt(t['analyze'])} ms"
+        sc = self._live_schedule
+        if sc is not None:
+            text += f"  [{sc.mode} {sc.fps:.1f}fps 照合 {sc.match_fps:.1f}fps 段{sc.level} 予算 {sc.budget_use:.0%}]"
+        self.lbl_timings.setText(text)
+
+    def closeEvent(self, e):
+        self._stop_live()
+        super().closeEvent(e)
+
     # --- 画面からのカード読み取り ---
 
     def _read_from_screen(self, target_list: QListWidget):
@@ -253,15 +498,18 @@ class HanafudaGUI(QWidget):
             QMessageBox.warning(self, "テンプレ未準備", "assets/templates/*.png が見つかりません。")
             return
         scene = grab_screen(None)  # 全画面キャプチャ
-        dets = match_templates(scene, tmps, threshold=0.88)
-        if not dets:
+        _, tmps = calibrate_templates(scene, tmps)  # 画面上の札サイズに合わせて1スケールで照合
+        dets = match_templates(scene, tmps, threshold=ASSIGN_MIN_SCORE, scales=(1.0,), signatures=load_signatures())
+        # 札に割り当てる（同じ札の重複・既に入力済みの札を除く）
+        gs = GameState.from_json(self._collect_state())
+        exclude = cards_to_mask(gs.hand + gs.field + gs.captured_self + gs.captured_opp, strict=False)
+        assigned = assign_cards(dets, exclude=exclude)
+        if not assigned:
             QMessageBox.information(self, "結果", "一致する札は見つかりませんでした。")
             return
-        added = 0
-        for d in dets:
-            target_list.addItem(QListWidgetItem(d.token))
-            added += 1
-        QMessageBox.information(self, "結果", f"{added} 枚の札を追加しました。")
+        for _, card in assigned:
+            target_list.addItem(QListWidgetItem(card.key()))
+        QMessageBox.information(self, "結果", f"{len(assigned)} 枚の札を追加しました。")
 
 class RegionPicker(QWidget):
     """画面全体を覆い、ドラッグで矩形選択して QRect(left, top, w, h) を返す簡易ピッカー"""
@@ -329,7 +577,7 @@ class RegionPicker(QWidget):
             return  # キャンセル
 
         scene = grab_screen(region)
-        dets = match_templates(scene, tmps, threshold=0.88, scales=(1.0, 0.9, 1.1))
+        dets = match_templates(scene, tmps, threshold=0.88, scales=(1.0, 0.9, 1.1), signatures=load_signatures())
 
         if not dets:
             QMessageBox.information(self, "結果", "一致する札は見つかりませんでした。")
@@ -2,7 +2,9 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import List, Dict, Tuple
 
-from .cards import Card, parse_card
+import numpy as np
+
+from .cards import Card, parse_card, CARD_SLOTS, MASK_DTYPE, cards_to_mask, popcount
 
 # ───────────────────────────────────────────────────────────
 # 役仕様
@@ -19,6 +21,7 @@ class HoloRole:
 # ここでは「検出ロジック」と「説明文」を実装。
 # 実際のカード操作（どの札を選ぶ/捨てる等）は、GUI側で選択UIを用意してから適用する想定。
 # ※トークン表記は '<month>:<kind[-tag]>'。cards.py に合わせて記述します。
+# ※同じトークンを複数回書くと、その枚数が必要（例: カス2枚 → "1:kasu" を2回）。
 
 HOLO_ROLES: List[HoloRole] = [
     # 0 期生（例：1月セット想定）※必要札は適宜更新してください
@@ -95,21 +98,105 @@ HOLO_ROLES: List[HoloRole] = [
     ),
 ]
 
+# ホロ役の効果の価値（点換算の目安）。相手の危険度の計算（threat）で役点に加算する
+# （自分の着手の評価は koikoi_strategy.role_effect_value で効果を実際に適用して求める）
+HOLO_ROLE_VALUE = {
+    "gen0": 2,    # 場札を1枚手札へ
+    "gen1": 1,    # 相手手札公開
+    "gen2": 2,    # 場札ロック（2ターン）
+    "gen3": 3,    # 相手の手番スキップ（実質1手番多い）
+    "gen4": 1,    # 山から1枚ドロー
+    "gen5": 2,    # 相手に1枚捨てさせる
+    "holoX": 1,   # 場の再配置
+    "gamers": 1,  # 手札交換
+    "regloss": 2, # 相手手札1枚を無効化
+}
+
 # ───────────────────────────────────────────────────────────
 # 検出
 # ───────────────────────────────────────────────────────────
 
-def _have_tokens(captured: List[Card], required: Tuple[str,...]) -> bool:
-    """required の全トークンを captured が満たすか（AND）"""
-    captured_keys = {f"{c.month}:{c.kind}{('-'+c.tag) if c.tag else ''}" for c in captured}
-    # カスが複数必要など、将来の拡張のために回数も見たい場合はカウント方式に変更する
-    return all(r in captured_keys for r in required)
+@dataclass(frozen=True)
+class _CompiledRole:
+    role: HoloRole
+    mask: int                           # 1枚しかない札の必要ビット
+    counts: Tuple[Tuple[int, int], ...] # (同じ札のスロットのビット, 必要枚数)  ※カスなど
+    tokens: Tuple[Tuple[int, str, int], ...] # missing 表示用: (スロットのビット, トークン, 必要枚数)
+
+def _compile(role: HoloRole) -> _CompiledRole:
+    need: Dict[str, int] = {}
+    for r in role.requires:
+        key = parse_card(r).key()
+        need[key] = need.get(key, 0) + 1
+    mask = 0
+    counts: List[Tuple[int, int]] = []
+    tokens: List[Tuple[int, str, int]] = []
+    for key, n in need.items():
+        slots = CARD_SLOTS[key]
+        if n > len(slots):
+            raise ValueError(f"{role.id}: {key} は {len(slots)} 枚しかありません")
+        slot_bits = 0
+        for i in slots:
+            slot_bits |= 1 << i
+        if len(slots) == 1:
+            mask |= slot_bits
+        else:
+            counts.append((slot_bits, n))
+        tokens.append((slot_bits, key, n))
+    return _CompiledRole(role=role, mask=mask, counts=tuple(counts), tokens=tuple(tokens))
+
+# 役定義は読み込み時に1回だけマスクへ変換する
+_COMPILED: List[_CompiledRole] = [_compile(r) for r in HOLO_ROLES]
+
+def _role_ok(cr: _CompiledRole, mask: int) -> bool:
+    if mask & cr.mask != cr.mask:
+        return False
+    for bits, n in cr.counts:
+        if (mask & bits).bit_count() < n:
+            return False
+    return True
+
+def detect_holo_roles_mask(mask: int) -> List[HoloRole]:
+    """取り札マスク（cards.cards_to_mask）から成立しているホロ役を列挙"""
+    return [cr.role for cr in _COMPILED if _role_ok(cr, mask)]
 
 def detect_holo_roles(captured: List[Card]) -> List[HoloRole]:
     """取り札から成立しているホロ役を列挙"""
-    res: List[HoloRole] = []
-    for role in HOLO_ROLES:
-        if _have_tokens(captured, role.requires):
-            res.append(role)
+    return detect_holo_roles_mask(cards_to_mask(captured, strict=False))
+
+def detect_holo_roles_batch(masks) -> np.ndarray:
+    """取り札マスク配列 (N,) → 成立しているホロ役 (N, len(HOLO_ROLES)) の bool"""
+    m = np.asarray(masks, dtype=MASK_DTYPE)
+    out = np.empty(m.shape + (len(_COMPILED),), dtype=bool)
+    for j, cr in enumerate(_COMPILED):
+        ok = (m & MASK_DTYPE(cr.mask)) == MASK_DTYPE(cr.mask)
+        for bits, n in cr.counts:
+            ok &= popcount(m & MASK_DTYPE(bits)) >= n
+        out[..., j] = ok
+    return out
+
+def role_missing_counts(mask: int) -> Dict[str, int]:
+    """役ID → 成立までに足りない札の枚数（探索中の評価用。0 なら成立済み）"""
+    res: Dict[str, int] = {}
+    for cr in _COMPILED:
+        missing = (cr.mask & ~mask).bit_count()
+        for bits, n in cr.counts:
+            missing += max(0, n - (mask & bits).bit_count())
+        res[cr.role.id] = missing
+    return res
+
+def missing_for_roles_mask(mask: int) -> Dict[str, List[str]]:
+    """役ID → まだ足りない札のトークン（必要枚数ぶん繰り返す）"""
+    res: Dict[str, List[str]] = {}
+    for cr in _COMPILED:
+        missing: List[str] = []
+        for bits, key, n in cr.tokens:
+            missing += [key] * max(0, n - (mask & bits).bit_count())
+        res[cr.role.id] = missing
     return res
+
+def missing_for_roles(captured: List[Card]) -> Dict[str, List[str]]:
+    """取り札から、役ごとにまだ足りない札を返す（成立済みの役は空リスト）"""
+    return missing_for_roles_mask(cards_to_mask(captured, strict=False))
+
 # ───────────────────────────────────────────────────────────
\ No newline at end of file
@@ -0,0 +1,389 @@
+from __future__ import annotations
+import random
+from typing import Callable, List, Tuple
+
+from .cards import ALL_CARDS, Card, MONTH_MASK, mask_to_cards, zone_masks
+from .holo_roles import HOLO_ROLES, detect_holo_roles_mask
+from .koikoi_rules import yaku_points_mask
+from .state import GameState
+
+"""
+こいこい対局エンジン（自己対局・探索用）
+
+- 盤面はすべて int のビットマスク（cards.py の ALL_CARDS 順）で持つ
+- 着手・ホロ役効果は Position をその場で書き換え、元に戻すための undo 記録（int のタプル）を返す
+  → 探索では apply → 評価 → undo を繰り返す。Card オブジェクトやリストは作らない
+    （例外: holoX は山札の並びが変わるので、山の残り部分だけ記録に含める）
+- 1手番 = 手札から1枚出す（場の同月札を取る）→ 山から1枚めくる（同様に取る）
+  * 場の同月札が 1枚: それを取る / 2枚: どちらかを選ぶ / 3枚: 全部取る（総取り）
+- 役が増えたら こいこい / あがり を選ぶ。あがりの点は、相手がこいこい中なら2倍
+- ホロ役（variant="holo"）は取り札で成立した時点で1回だけ効果が発動する
+"""
+
+HAND_SIZE = 8
+FIELD_SIZE = 8
+
+# 既定の札の優先度（選択肢がある効果や、場の2枚から選ぶときの既定値）
+KIND_PRIORITY = {"bright": 3, "animal": 2, "ribbon": 1, "kasu": 0}
+_PRIORITY = [KIND_PRIORITY[c.kind] for c in ALL_CARDS]
+_ROLE_INDEX = {r.id: i for i, r in enumerate(HOLO_ROLES)}
+_HOLOX = _ROLE_INDEX["holoX"]
+
+# 効果の継続ターン数
+LOCK_TURNS = 2
+REVEAL_TURNS = 2
+
+
+def bits(mask: int):
+    """マスクの立っているビット位置を列挙"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def best_card(mask: int) -> int:
+    """優先度の最も高い札のビット位置（なければ -1）"""
+    best, best_p = -1, -1
+    for i in bits(mask):
+        if _PRIORITY[i] > best_p:
+            best, best_p = i, _PRIORITY[i]
+    return best
+
+
+class Position:
+    __slots__ = (
+        "hands", "field", "captured", "deck", "deck_pos", "turn", "ply", "variant",
+        "points", "koikoi", "winner", "score",
+        "lock_mask", "lock_turns", "skip", "reveal", "dead_mask", "roles_done", "rng",
+        "last_drawn",
+    )
+
+    def __init__(self, hands, field, captured, deck, *, turn=0, variant="holo", rng=None):
+        self.hands: List[int] = list(hands)
+        self.field: int = field
+        self.captured: List[int] = list(captured)
+        self.deck: List[int] = list(deck)  # 山札（ビット位置）。deck[deck_pos] が次にめくる札
+        self.deck_pos: int = 0
+        self.turn: int = turn
+        self.ply: int = 0
+        self.variant: str = variant
+        self.points: List[int] = [0, 0]     # 直近に確定した役点（役が増えたかの判定用）
+        self.koikoi: List[int] = [0, 0]     # こいこい宣言回数
+        self.winner: int = -1               # -1: 続行中 / 0,1: あがり / 2: 流局
+        self.score: int = 0
+        # ホロ役効果の状態
+        self.lock_mask: int = 0             # 2期生: 取れない場札
+        self.lock_turns: int = 0
+        self.skip: int = 0                  # 3期生: 1 なら次の相手番を飛ばす
+        self.reveal: List[int] = [0, 0]     # 1期生: 相手手札が見える残りターン
+        self.dead_mask: int = 0             # ReGLOSS: 役に数えない札
+        self.roles_done: List[int] = [0, 0] # 発動済みのホロ役（HOLO_ROLES の index のビット）
+        self.rng = rng if rng is not None else random.Random()
+        self.last_drawn: int = -1           # 直前の手番で山からめくった札（記録用。undo の対象外）
+
+    @property
+    def over(self) -> bool:
+        return self.winner != -1
+
+    def to_state(self, player: int) -> GameState:
+        """player 視点の GameState（相手手札・山札は含まない）"""
+        return GameState(
+            hand=mask_to_cards(self.hands[player]),
+            field=mask_to_cards(self.field),
+            captured_self=mask_to_cards(self.captured[player]),
+            captured_opp=mask_to_cards(self.captured[1 - player]),
+            config={"variant": self.variant},
+        )
+
+
+def deal(rng: random.Random | int | None = None, *, variant: str = "holo", dealer: int = 0) -> Position:
+    """48枚をシャッフルして 手札8枚×2・場8枚・残りを山に配る"""
+    if not isinstance(rng, random.Random):
+        rng = random.Random(rng)
+    order = list(range(len(ALL_CARDS)))
+    rng.shuffle(order)
+    hand0 = hand1 = field = 0
+    for i in order[:HAND_SIZE]:
+        hand0 |= 1 << i
+    for i in order[HAND_SIZE:2 * HAND_SIZE]:
+        hand1 |= 1 << i
+    for i in order[2 * HAND_SIZE:2 * HAND_SIZE + FIELD_SIZE]:
+        field |= 1 << i
+    return Position((hand0, hand1), field, (0, 0), order[2 * HAND_SIZE + FIELD_SIZE:],
+                    turn=dealer, variant=variant, rng=rng)
+
+
+def from_state(gs: GameState, deck: List[Card] | None = None, *, rng=None) -> Position:
+    """GameState（自分=player 0）から Position を作る。相手手札は不明なので空"""
+    hand, field, cap_self, cap_opp, rest = zone_masks((gs.hand, gs.field, gs.captured_self, gs.captured_opp,
+                                                       deck or []))
+    d = list(bits(rest))
+    pos = Position((hand, 0), field, (cap_self, cap_opp), d,
+                   variant=gs.config.get("variant", "holo"), rng=rng)
+    pos.points = [yaku_points_mask(cap_self, pos.variant), yaku_points_mask(cap_opp, pos.variant)]
+    return pos
+
+
+# ───────────────────────────────────────────────────────────
+# undo（盤面の int をそのまま記録する）
+# ───────────────────────────────────────────────────────────
+
+def snapshot(pos: Position, deck: bool = False) -> tuple:
+    return (
+        pos.hands[0], pos.hands[1], pos.field, pos.captured[0], pos.captured[1],
+        pos.deck_pos, pos.turn, pos.ply, pos.points[0], pos.points[1],
+        pos.koikoi[0], pos.koikoi[1], pos.winner, pos.score,
+        pos.lock_mask, pos.lock_turns, pos.skip, pos.reveal[0], pos.reveal[1],
+        pos.dead_mask, pos.roles_done[0], pos.roles_done[1],
+        pos.deck[pos.deck_pos:] if deck else None,
+    )
+
+
+def undo(pos: Position, rec: tuple) -> None:
+    (pos.hands[0], pos.hands[1], pos.field, pos.captured[0], pos.captured[1],
+     pos.deck_pos, pos.turn, pos.ply, pos.points[0], pos.points[1],
+     pos.koikoi[0], pos.koikoi[1], pos.winner, pos.score,
+     pos.lock_mask, pos.lock_turns, pos.skip, pos.reveal[0], pos.reveal[1],
+     pos.dead_mask, pos.roles_done[0], pos.roles_done[1], rest) = rec
+    if rest is not None:
+        pos.deck[pos.deck_pos:] = rest
+
+
+# ───────────────────────────────────────────────────────────
+# 札の取り
+# ───────────────────────────────────────────────────────────
+
+def matches(pos: Position, card: int) -> int:
+    """card と同月で、取れる（ロックされていない）場札のマスク"""
+    return pos.field & MONTH_MASK[ALL_CARDS[card].month] & ~pos.lock_mask
+
+
+def legal_plays(pos: Position, player: int | None = None) -> List[Tuple[int, int]]:
+    """(出す札, 取る場札 or -1) の一覧。場の同月札が 2枚のときだけ取る札を選べる"""
+    p = pos.turn if player is None else player
+    res: List[Tuple[int, int]] = []
+    for c in bits(pos.hands[p]):
+        m = matches(pos, c)
+        if m.bit_count() == 2:
+            res.extend((c, t) for t in bits(m))
+        else:
+            res.append((c, -1))
+    return res
+
+
+def _take(pos: Position, player: int, card: int, target: int) -> int:
+    """card を場に出して取る。取った札のマスク（取りなしなら 0）を返す"""
+    bit = 1 << card
+    m = matches(pos, card)
+    n = m.bit_count()
+    if n == 0:
+        pos.field |= bit
+        pos.dead_mask &= ~bit  # ReGLOSS: 捨て札になったら解除
+        return 0
+    if n == 2:
+        taken = 1 << (target if target >= 0 and m >> target & 1 else best_card(m))
+    else:
+        taken = m  # 1枚 / 3枚（総取り）
+    pos.field &= ~taken
+    taken |= bit
+    pos.captured[player] |= taken
+    return taken
+
+
+def _scoring_mask(pos: Position, player: int) -> int:
+    return pos.captured[player] & ~pos.dead_mask
+
+
+# ───────────────────────────────────────────────────────────
+# ホロ役の効果
+# ───────────────────────────────────────────────────────────
+
+def default_effect_choice(pos: Position, player: int, role_id: str) -> int:
+    """効果の対象札の既定選択（優先度が最も高い札）"""
+    opp = 1 - player
+    if role_id in ("gen0", "gen2"):
+        return best_card(pos.field & ~pos.lock_mask)
+    if role_id in ("gen5", "regloss"):
+        return best_card(pos.hands[opp] & ~pos.dead_mask)
+    return -1
+
+
+def apply_role_effect(pos: Position, player: int, role_id: str, choice: int = -1) -> tuple:
+    """
+    ホロ役の効果を盤面に適用し、undo 記録を返す。choice は対象札のビット位置（-1 なら既定選択）。
+      gen0: 場札1枚を手札へ / gen1: 相手手札公開（2ターン）/ gen2: 場札1枚をロック（2ターン）
+      gen3: 相手の次の手番を飛ばす / gen4: 山から1枚手札へ / gen5: 相手手札1枚を場へ捨てさせる
+      holoX: 場札を山に戻してシャッフルし、同じ枚数を並べ直す / gamers: 手札を交換
+      regloss: 相手手札1枚を役に数えない札にする
+    """
+    rec = snapshot(pos, deck=(role_id == "holoX"))
+    opp = 1 - player
+    if choice < 0:
+        choice = default_effect_choice(pos, player, role_id)
+    if role_id == "gen0":
+        if choice >= 0 and pos.field >> choice & 1:
+            pos.field &= ~(1 << choice)
+            pos.hands[player] |= 1 << choice
+    elif role_id == "gen1":
+        pos.reveal[player] = REVEAL_TURNS
+    elif role_id == "gen2":
+        if choice >= 0 and pos.field >> choice & 1:
+            pos.lock_mask = 1 << choice
+            pos.lock_turns = LOCK_TURNS
+    elif role_id == "gen3":
+        pos.skip = 1
+    elif role_id == "gen4":
+        if pos.deck_pos < len(pos.deck):
+            pos.hands[player] |= 1 << pos.deck[pos.deck_pos]
+            pos.deck_pos += 1
+    elif role_id == "gen5":
+        if choice >= 0 and pos.hands[opp] >> choice & 1:
+            pos.hands[opp] &= ~(1 << choice)
+            pos.field |= 1 << choice
+            pos.dead_mask &= ~(1 << choice)
+    elif role_id == "holoX":
+        n = pos.field.bit_count()
+        rest = pos.deck[pos.deck_pos:] + list(bits(pos.field))
+        pos.rng.shuffle(rest)
+        pos.deck[pos.deck_pos:] = rest
+        pos.field = 0
+        for i in range(min(n, len(rest))):
+            pos.field |= 1 << pos.deck[pos.deck_pos]
+            pos.deck_pos += 1
+        pos.lock_mask = 0
+        pos.lock_turns = 0
+    elif role_id == "gamers":
+        pos.hands[0], pos.hands[1] = pos.hands[1], pos.hands[0]
+    elif role_id == "regloss":
+        if choice >= 0 and pos.hands[opp] >> choice & 1:
+            pos.dead_mask |= 1 << choice
+    else:
+        raise KeyError(f"Unknown holo role: {role_id}")
+    pos.roles_done[player] |= 1 << _ROLE_INDEX[role_id]
+    return rec
+
+
+def new_roles(pos: Position, player: int) -> List[str]:
+    """取り札で成立済みだが、まだ効果を発動していないホロ役"""
+    if pos.variant != "holo":
+        return []
+    done = pos.roles_done[player]
+    return [r.id for r in detect_holo_roles_mask(pos.captured[player])
+            if not done >> _ROLE_INDEX[r.id] & 1]
+
+
+# ───────────────────────────────────────────────────────────
+# 手番
+# ───────────────────────────────────────────────────────────
+
+ChooseDraw = Callable[[Position, int, int, int], int]      # (pos, player, drawn, matches) -> target
+DecideKoikoi = Callable[[Position, int, int], bool]         # (pos, player, points) -> True=こいこい
+ChooseEffect = Callable[[Position, int, str], int]          # (pos, player, role_id) -> 対象札
+
+
+def _after_capture(pos: Position, player: int, choose_effect: ChooseEffect | None) -> None:
+    for rid in new_roles(pos, player):
+        choice = choose_effect(pos, player, rid) if choose_effect else -1
+        apply_role_effect(pos, player, rid, choice)
+
+
+def play_turn(
+    pos: Position,
+    card: int,
+    target: int = -1,
+    *,
+    choose_draw: ChooseDraw | None = None,
+    decide_koikoi: DecideKoikoi | None = None,
+    choose_effect: ChooseEffect | None = None,
+) -> tuple:
+    """
+    手番のプレイヤーが card を出し（target は場に2枚あるときの取り先）、山から1枚めくる。
+    役が増えたら decide_koikoi（既定: あがり）で続行/終了を決める。undo 記録を返す。
+    """
+    p = pos.turn
+    pos.last_drawn = -1
+    # 山札の並びを変えるのは holoX だけなので、発動し得るときだけ山の残りを記録する
+    rec = snapshot(pos, deck=pos.variant == "holo" and not pos.roles_done[p] >> _HOLOX & 1)
+    pos.hands[p] &= ~(1 << card)
+    if _take(pos, p, card, target):
+        _after_capture(pos, p, choose_effect)
+
+    if pos.deck_pos < len(pos.deck):
+        drawn = pos.deck[pos.deck_pos]
+        pos.deck_pos += 1
+        pos.last_drawn = drawn
+        m = matches(pos, drawn)
+        t = -1
+        if m.bit_count() == 2:
+            t = choose_draw(pos, p, drawn, m) if choose_draw else best_card(m)
+        if _take(pos, p, drawn, t):
+            _after_capture(pos, p, choose_effect)
+
+    pts = yaku_points_mask(_scoring_mask(pos, p), pos.variant)
+    if pts > pos.points[p]:
+        pos.points[p] = pts
+        if decide_koikoi is not None and decide_koikoi(pos, p, pts) and pos.hands[p]:
+            pos.koikoi[p] += 1
+        else:
+            pos.winner = p
+            pos.score = pts * (2 if pos.koikoi[1 - p] else 1)
+            pos.ply += 1
+            return rec
+
+    pos.ply += 1
+    if pos.lock_turns:
+        pos.lock_turns -= 1
+        if not pos.lock_turns:
+            pos.lock_mask = 0
+    if pos.reveal[p]:
+        pos.reveal[p] -= 1
+    if pos.skip:
+        pos.skip = 0            # 3期生: もう一度自分の手番
+    else:
+        pos.turn = 1 - p
+    if not pos.hands[pos.turn]:
+        if pos.hands[1 - pos.turn]:
+            pos.turn = 1 - pos.turn
+        else:
+            pos.winner = 2      # 流局
+            pos.score = 0
+    return rec
+
+
+# ───────────────────────────────────────────────────────────
+# 打ち切り対局（読み・ホロ役の効果の評価に使う）
+# ───────────────────────────────────────────────────────────
+
+def rollout_play(pos: Position, player: int) -> Tuple[int, int]:
+    """打ち切り用の軽い方策: 役点の伸びが最大の取り → 取る札の優先度 → 出す札は優先度の低い順"""
+    cap = pos.captured[player]
+    base = yaku_points_mask(cap, pos.variant)
+    best, best_key = None, None
+    for card, target in legal_plays(pos, player):
+        m = matches(pos, card)
+        taken = 0 if not m else (1 << target if m.bit_count() == 2 else m)
+        if taken:
+            got = taken | 1 << card
+            key = (yaku_points_mask(cap | got, pos.variant) - base, sum(_PRIORITY[i] for i in bits(got)), 0)
+        else:
+            key = (0, -1, -_PRIORITY[card])
+        if best_key is None or key > best_key:
+            best, best_key = (card, target), key
+    return best
+
+
+def playout(pos: Position, me: int) -> int:
+    """rollout_play で局の終わりまで打ち、me から見た得点（負け -, 流局 0）を返す"""
+    if not pos.hands[pos.turn]:
+        # 途中の局面（効果で手札が動いた直後など）で手番側に手札が無ければ、play_turn の終わりと同じ扱い
+        if pos.hands[1 - pos.turn]:
+            pos.turn = 1 - pos.turn
+        else:
+            pos.winner, pos.score = 2, 0
+    while not pos.over:
+        card, target = rollout_play(pos, pos.turn)
+        play_turn(pos, card, target)
+    if pos.winner == 2:
+        return 0
+    return pos.score if pos.winner == me else -pos.score
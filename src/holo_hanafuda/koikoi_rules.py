@@ -1,6 +1,11 @@
 from collections import Counter, defaultdict
+from functools import lru_cache
 from typing import Dict, List
-from .cards import Card
+import numpy as np
+
+from .cards import Card, cards_to_mask
+from .profiling import timed
+from .rule_variants import compile_variant
 
 """
 Hololive 版こいこい 役ロジック（添付画像準拠）
@@ -23,6 +28,9 @@ Hololive 版こいこい 役ロジック（添付画像準拠）
 - 初期手役
   * 手四: 同月4枚が手札にある → 6
   * くっつき: 同月ペア（2枚）が4組以上 → 6
+
+役の定義そのものは rule_variants（variant ごとのデータ → マスク・しきい値の表）にあり、
+ここの関数はどれもコンパイル済みの表を引くだけ（YAKU_POINTS は holo の点数の一覧）
 """
 
 YAKU_POINTS = {
@@ -64,9 +72,6 @@ def _counts(cards: List[Card]) -> Counter:
                 c["ribbon"] += 1
         elif x.kind == "animal":
             c["animal"] += 1
-            # ホロ特例: 9月の動物（盃）はカスとしても数える
-            if x.month == 9 and x.tag == "sake":
-                c["kasu-extra"] += 1
         elif x.kind == "kasu":
             c["kasu"] += 1
         elif x.kind == "bright":
@@ -82,24 +87,12 @@ def _counts(cards: List[Card]) -> Counter:
     return c
 
 
-def _kasu_count_with_holo_rule(captured_counts: Counter) -> int:
-    """ホロ特例込みのカス枚数"""
-    return captured_counts.get("kasu", 0) + captured_counts.get("kasu-extra", 0)
-
-
-def evaluate_initial_hand_yaku(hand: List[Card]) -> Dict[str, int]:
+def evaluate_initial_hand_yaku(hand: List[Card], *, variant: str = "holo") -> Dict[str, int]:
     """配られた手札だけで成立する役"""
-    if not hand:
-        return {}
-    c = _counts(hand)
-    pts: Dict[str, int] = {}
-    if c["any_four_of_month"]:
-        pts["te-yon"] = YAKU_POINTS["te-yon"]
-    if c["by_month_pairs"] >= 4:
-        pts["kuttsuki"] = YAKU_POINTS["kuttsuki"]
-    return pts
+    return compile_variant(variant).evaluate_hand(cards_to_mask(hand, strict=False))
 
 
+@timed("evaluate_yaku")
 def evaluate_yaku(
     captured: List[Card],
     *,
@@ -107,66 +100,12 @@ def evaluate_yaku(
     initial_hand: List[Card] | None = None
 ) -> Dict[str, int]:
     """
-    取り札からの役判定（＋必要なら初期手役も合算）
+    取り札からの役判定（＋必要なら初期手役も合算）。役の定義は rule_variants の variant ごとの表
     """
-    c = _counts(captured)
-    pts: Dict[str, int] = {}
-
-    # --- 光 ---
-    bright = c.get("bright", 0)
-    has_rain = c.get("tag:rain", 0) > 0  # 柳の光
-    if bright >= 5:
-        pts["gokou"] = YAKU_POINTS["gokou"]
-    elif bright == 4:
-        pts["ame-shiko" if has_rain else "shiko"] = YAKU_POINTS["ame-shiko" if has_rain else "shiko"]
-    elif bright == 3 and not has_rain:
-        pts["sanko"] = YAKU_POINTS["sanko"]
-
-    # --- 猪鹿蝶 ---
-    if c.get("tag:boar", 0) and c.get("tag:deer", 0) and c.get("tag:butterfly", 0):
-        pts["inoshikacho"] = YAKU_POINTS["inoshikacho"]
-
-    # --- 花見・月見 ---
-    if c.get("tag:cherry", 0) and c.get("tag:sake", 0):
-        pts["hanami-zake"] = YAKU_POINTS["hanami-zake"]
-    if c.get("tag:moon", 0) and c.get("tag:sake", 0):
-        pts["tsukimi-zake"] = YAKU_POINTS["tsukimi-zake"]
-
-    # --- 赤短・青短・重複 ---
-    def _has_ribbon(month: int, tag: str) -> bool:
-        return any(
-            (x.month == month and x.kind == "ribbon" and x.tag == tag)
-            for x in captured
-        )
-
-    red_ok = all(_has_ribbon(m, "poetry-red") for m in RED_RIBBON_MONTHS)
-    blue_ok = all(_has_ribbon(m, "blue") for m in BLUE_RIBBON_MONTHS)
-
-    if red_ok and blue_ok:
-        pts["akatan-aotan"] = YAKU_POINTS["akatan-aotan"]
-    else:
-        if red_ok:
-            pts["akatan"] = YAKU_POINTS["akatan"]
-        if blue_ok:
-            pts["aotan"] = YAKU_POINTS["aotan"]
-
-    # --- タネ / タン / カス（加点系） ---
-    animal_n = c.get("animal", 0)
-    if animal_n >= 5:
-        pts["tane"] = 1 + (animal_n - 5)
-
-    ribbon_total = c.get("total-ribbon", 0)
-    if ribbon_total >= 5:
-        pts["tan"] = 1 + (ribbon_total - 5)
-
-    kasu_n = _kasu_count_with_holo_rule(c) if variant == "holo" else c.get("kasu", 0)
-    if kasu_n >= 10:
-        pts["kasu"] = 1 + (kasu_n - 10)
-
-    # --- 初期手役（任意） ---
+    rules = compile_variant(variant)
+    pts = rules.evaluate_mask(cards_to_mask(captured, strict=False))
     if initial_hand:
-        pts.update(evaluate_initial_hand_yaku(initial_hand))
-
+        pts.update(rules.evaluate_hand(cards_to_mask(initial_hand, strict=False)))
     return pts
 
 
@@ -180,6 +119,17 @@ def yaku_points(
     return sum(e.values())
 
 
+@lru_cache(maxsize=1 << 16)
+def yaku_points_mask(mask: int, variant: str = "holo") -> int:
+    """取り札マスク（cards.cards_to_mask）版の yaku_points。探索・自己対局用にキャッシュする"""
+    return compile_variant(variant).points_mask(mask)
+
+
+def yaku_points_batch(masks, variant: str = "holo") -> np.ndarray:
+    """取り札マスク配列 → 役点の配列（yaku_points_mask と同じ値, 初期手役は含まない）"""
+    return compile_variant(variant).points_batch(masks)
+
+
 def list_yaku_progress(captured: List[Card], *, variant: str = "holo") -> List[str]:
     """次に狙えるしきい値のヒント（簡易）"""
     c = _counts(captured)
@@ -200,7 +150,7 @@ def list_yaku_progress(captured: List[Card], *, variant: str = "holo") -> List[s
     if ribbon_total < 5:
         hints.append(f"タン {ribbon_total}/5")
 
-    kasu_n = _kasu_count_with_holo_rule(c) if variant == "holo" else c.get("kasu", 0)
+    kasu_n = compile_variant(variant).count_of(cards_to_mask(captured, strict=False), "kasu")
     if kasu_n < 10:
         hints.append(f"カス {kasu_n}/10")
 
@@ -1,7 +1,19 @@
-from typing import List, Tuple, Dict
+import random
+from functools import lru_cache
+from math import inf
+from typing import Callable, List, Tuple, Dict
 from dataclasses import dataclass
-from .cards import Card
-from .koikoi_rules import yaku_points, list_yaku_progress
+
+import numpy as np
+
+from .cards import ALL_CARDS, FULL_MASK, MASK_DTYPE, MONTH_MASK, Card, cards_to_mask, popcount, zone_masks
+from .evaluator import default_evaluator
+from .koikoi_rules import yaku_points, yaku_points_batch, yaku_points_mask
+from .holo_roles import HOLO_ROLES, detect_holo_roles_batch, detect_holo_roles_mask
+from .koikoi_engine import Position, apply_role_effect, bits, playout, snapshot, undo
+from .profiling import timed
+from .threat import card_danger, threat_map_masks
+from .yaku_planner import big_yaku_progress, plan_yaku
 
 @dataclass
 class Move:
@@ -9,44 +21,222 @@ class Move:
     capture_with: Card | None  # optional: the field card matched by month
     score_delta: int
     note: str
+    expected: float = 0.0  # play + draw: expected yaku increase over the whole turn (incl. denial bonus)
+    value: float = 0.0     # ranking key: expected + evaluator's round result after the play (expected alone without weights)
+
+_ROLE_TITLE = {r.id: r.title for r in HOLO_ROLES}
+
+def _new_holo_roles(captured_mask: int, taken: List[Card]) -> List[str]:
+    """taken を取ったときに新しく成立するホロ役の ID"""
+    before = {r.id for r in detect_holo_roles_mask(captured_mask)}
+    after = detect_holo_roles_mask(cards_to_mask(taken, strict=False, base=captured_mask))
+    return [r.id for r in after if r.id not in before]
 
 def _matchable(field: List[Card], month: int) -> List[Card]:
     return [c for c in field if c.month==month]
 
-def _score_if_capture(captured_self: List[Card], taken: List[Card]) -> int:
-    before = yaku_points(captured_self)
-    after = yaku_points(captured_self + taken)
+def _score_if_capture(captured_self: List[Card], taken: List[Card], variant: str = "holo") -> int:
+    before = yaku_points(captured_self, variant=variant)
+    after = yaku_points(captured_self + taken, variant=variant)
     return after - before
 
-def suggest_best_moves(hand: List[Card], field: List[Card], captured_self: List[Card], captured_opp: List[Card]) -> List[Move]:
-    """Greedy one-ply heuristic: prioritize immediate yaku increase, then progress hints, then denial (if two same-month on field)."""
+# めくり札の期待値計算用: ビット位置 -> その月の4枚のマスク
+_BIT_MONTH_MASK = np.array([MONTH_MASK[c.month] for c in ALL_CARDS], dtype=MASK_DTYPE)
+_ROLE_INDEX = {r.id: i for i, r in enumerate(HOLO_ROLES)}
+
+# ホロ役の効果の評価に使う打ち切り対局（効果あり/なしの組）の数: ROLE_SAMPLES 組ずつ足し、
+# 平均の標準誤差が ROLE_TOLERANCE 点以下になるか ROLE_MAX_SAMPLES 組に達したら打ち切る。
+# めくり札で成立する場合は期待値の 1/D の重みにしかならないので ROLE_DRAW_SAMPLES 組だけ
+ROLE_SAMPLES = 32
+ROLE_MAX_SAMPLES = 256
+ROLE_TOLERANCE = 0.25
+ROLE_DRAW_SAMPLES = 8
+
+_EXTRA_DRAW = ("gen3", "gen4")  # 効果で山のめくりが1枚ずれるホロ役
+
+# (候補の番号, 場札, 取り札, ホロ役, 組の数, 標準誤差の目標) -> 効果の価値
+RoleValue = Callable[[int, int, int, str, int, float], float]
+
+@lru_cache(maxsize=4096)
+def role_effect_value(hand: int, field: int, cap_self: int, cap_opp: int, role_id: str,
+                      samples: int = ROLE_SAMPLES, tolerance: float = ROLE_TOLERANCE) -> float:
+    """
+    ホロ役 role_id の効果の価値（点）。局面は役を成立させた取りの直後（cap_self に役の札を含む）で、
+    次は相手の手番。見えていない札を相手手札（手札 + 1 枚）と山に配り、効果を apply_role_effect で
+    適用した場合としない場合を同じ配り・同じ乱数で打ち切り対局（koikoi_engine.playout）して得点の差を平均する。
+    山から1枚余分に引く効果（4期生のドロー, 3期生の追加の手番）は、山の最後の札を先頭に回してから適用し、
+    以後のめくり（どちらがどの札を引くか）を効果なしの側とそろえる。
+    samples 組ずつ打ち、平均の標準誤差が tolerance 点以下になったら止める（inf なら samples 組だけ）。
+    配りの乱数は局面から決まるので、同じ局面なら同じ値になる
+    """
+    unseen = list(bits(FULL_MASK & ~(hand | field | cap_self | cap_opp)))
+    n_opp = min(len(unseen), hand.bit_count() + 1)
+    rng = random.Random(hash((hand, field, cap_self, cap_opp, _ROLE_INDEX[role_id])))
+    # 成立済みのホロ役（この役を含む）は発動済みとして扱い、打ち切りの途中で発動させない
+    done = [sum(1 << _ROLE_INDEX[r.id] for r in detect_holo_roles_mask(m)) for m in (cap_self, cap_opp)]
+    points = [yaku_points_mask(cap_self, "holo"), yaku_points_mask(cap_opp, "holo")]
+    diffs: List[int] = []
+    while len(diffs) < ROLE_MAX_SAMPLES:
+        for _ in range(samples):
+            rng.shuffle(unseen)
+            deck = unseen[n_opp:]
+            pos = Position((hand, sum(1 << i for i in unseen[:n_opp])), field, (cap_self, cap_opp),
+                           deck, turn=1, variant="holo")
+            pos.points, pos.roles_done = list(points), list(done)
+            seed = rng.getrandbits(32)
+            rec = snapshot(pos, deck=True)
+            pos.rng = random.Random(seed)
+            base = playout(pos, 0)
+            undo(pos, rec)
+            pos.rng = random.Random(seed)
+            if role_id in _EXTRA_DRAW and deck:
+                pos.deck[:] = deck[-1:] + deck[:-1]
+            apply_role_effect(pos, 0, role_id)
+            if pos.skip:
+                pos.skip, pos.turn = 0, 0  # 3期生: 相手の手番を飛ばしてもう一度自分の手番
+            diffs.append(playout(pos, 0) - base)
+        if np.std(diffs) / np.sqrt(len(diffs)) <= tolerance:
+            break
+    return float(np.mean(diffs))
+
+def _turn_gain(cap: np.ndarray, field: np.ndarray, base_mask: int, variant: str,
+               role_value: RoleValue | None) -> np.ndarray:
+    """
+    取り札・場札のマスク配列 (K, D) → 手番の開始時からの役点の増加。
+    ホロ役は role_value で、成立した局面（候補 k の手札, その場札・取り札）での効果の価値に換算する
+    """
+    gain = yaku_points_batch(cap, variant) - yaku_points_mask(base_mask, variant)
+    if variant == "holo" and role_value is not None:
+        before = detect_holo_roles_batch(np.array([base_mask], dtype=MASK_DTYPE))[0]
+        fired = detect_holo_roles_batch(cap) & ~before
+        if fired.any():
+            gain = gain.astype(np.float64)
+            for k, j in zip(*np.nonzero(fired.any(axis=-1))):
+                gain[k, j] += sum(role_value(int(k), int(field[k, j]), int(cap[k, j]), HOLO_ROLES[r].id,
+                                             ROLE_DRAW_SAMPLES, inf)
+                                  for r in np.nonzero(fired[k, j])[0])
+    return gain
+
+def expected_draw_gain(field, cap, unseen: int, base_mask: int, *, variant: str = "holo",
+                       role_value: RoleValue | None = None) -> np.ndarray:
+    """
+    手札を出した後の 場札・取り札（候補ごとの配列 (K,)）から、続く山のめくり1枚までの
+    役点の増加の期待値 (K,) を計算する。めくり札は見えていない札から一様に出るとみなし、
+    場の同月札が 1枚なら取る / 2枚なら良い方 / 3枚なら総取り。全候補 × 全めくり札をまとめて計算する。
+    role_value があれば、成立するホロ役の効果の価値も加える
+    """
+    field, cap = (np.asarray(x, dtype=MASK_DTYPE)[:, None] for x in (field, cap))
+    draws = [i for i in range(len(ALL_CARDS)) if unseen >> i & 1]
+    if not draws:
+        return _turn_gain(cap, field, base_mask, variant, role_value)[:, 0]
+    d = np.array([1 << i for i in draws], dtype=MASK_DTYPE)[None, :]
+    same = field & _BIT_MONTH_MASK[draws][None, :]
+    n = popcount(same)
+    # 取る札: 1枚/3枚ならその全部、2枚なら片方ずつ（a/b）
+    low = same & (~same + MASK_DTYPE(1))
+    take_a = np.where(n == 2, low, same)
+    take_b = np.where(n == 2, same ^ low, same)
+    took = n > 0
+    ga = _turn_gain(np.where(took, cap | d | take_a, cap), np.where(took, field & ~take_a, field | d),
+                    base_mask, variant, role_value)
+    gb = _turn_gain(np.where(took, cap | d | take_b, cap), np.where(took, field & ~take_b, field | d),
+                    base_mask, variant, role_value)
+    return np.maximum(ga, gb).mean(axis=1)
+
+@timed("suggest_best_moves")
+def suggest_best_moves(hand: List[Card], field: List[Card], captured_self: List[Card], captured_opp: List[Card], *, variant: str = "holo", limit: int | None = 5, pursuit: float = 0.0) -> List[Move]:
+    """
+    One-turn heuristic: each play (with the sweep rule when three same-month cards are on the field)
+    is followed by the draw from the deck, taken as an expectation over the unseen cards.
+    Ranked by the sum of the expected yaku increase plus a denial bonus (if two same-month on field) and
+    the learned evaluator's estimate of the round result from the position after the play (the evaluator
+    is trained on exactly these post-play positions, see evaluator.log_examples). It is part of the sum,
+    not a tie-break: a better position can outrank a larger score_delta.
+    pursuit > 0 adds pursuit × the progress toward big yaku (yaku_planner.big_yaku_progress) gained
+    by the play, i.e. favours long shots such as gokou over cheap tan (match_policy's risk profiles).
+    In the holo variant a holo role completed during the turn adds the value of its effect, measured by
+    paired engine playouts with and without the effect (role_effect_value).
+    Returns the best `limit` moves (all legal moves when limit is None).
+    """
     moves: List[Move] = []
+    after: List[Tuple[int, int, int, int]] = []  # 着手後の (手札, 場札, 自分の取り札, 相手の取り札)
+    bonus: List[int] = []
+    hand_mask, field_mask, self_mask, opp_mask = zone_masks((hand, field, captured_self, captured_opp))
+    unseen = FULL_MASK & ~(hand_mask | field_mask | self_mask | opp_mask)
+    danger = threat_map_masks(opp_mask, unseen, len(hand), variant)
+    # holo roles completed this turn are worth what their effect changes in paired engine playouts,
+    # measured on the position right after the capture that completes them
+    def role_value(k: int, field_m: int, cap_m: int, role_id: str,
+                   samples: int = ROLE_SAMPLES, tolerance: float = ROLE_TOLERANCE) -> float:
+        return role_effect_value(after[k][0], field_m, cap_m, opp_mask, role_id, samples, tolerance)
     # For each card, consider capture options
-    for h in hand:
+    for i, h in enumerate(hand):
+        rest = hand[:i] + hand[i+1:]
         targets = _matchable(field, h.month)
         if not targets:
             # no capture, just place
-            moves.append(Move(play=h, capture_with=None, score_delta=0, note="場に出す（取りなし）"))
-        else:
-            # if there are two or more same-month on field, capturing denies opponent's sweep
-            denial_bonus = 1 if len(targets)>=2 else 0
-            for t in targets:
-                gain = _score_if_capture(captured_self, [h,t])
+            risk = card_danger(danger, h)
+            note = f"場に出す（取りなし, 相手に取られる危険 {risk:.1f}）" if risk > 0 else "場に出す（取りなし）"
+            moves.append(Move(play=h, capture_with=None, score_delta=0, note=note))
+            after.append(tuple(zone_masks((rest, field + [h], captured_self, captured_opp))))
+            bonus.append(-risk)
+            continue
+        # if there are two or more same-month on field, capturing denies opponent's sweep
+        denial_bonus = 1 if len(targets)>=2 else 0
+        # three on the field: playing the fourth sweeps them all (one option)
+        options = [targets] if len(targets) >= 3 else [[t] for t in targets]
+        for taken in options:
+            t = taken[0]
+            gain = _score_if_capture(captured_self, [h] + taken, variant)
+            if len(taken) >= 3:
+                note = "総取り"
+            else:
                 note = "役が伸びる" if gain>0 else ("相手の取りを防ぐ" if denial_bonus else "標準取り")
-                moves.append(Move(play=h, capture_with=t, score_delta=gain + denial_bonus, note=note))
-    # sort by score_delta then tie-break by simple heuristics (prefer bright/animal/ribbon over kasu when equal)
-    prio = {"bright":3,"animal":2,"ribbon":1,"kasu":0}
-    moves.sort(key=lambda m: (m.score_delta, prio.get(m.play.kind,0)), reverse=True)
-    return moves[:5]
-
-def suggest_highest_yaku_line(hand: List[Card], field: List[Card], captured_self: List[Card]) -> List[str]:
-    """Return hints focusing on the highest potential yaku (very rough)."""
-    hints = list_yaku_progress(captured_self)
-    # If we have 2 brights in hand+captured and matching on field, advise
-    brights_hand = [c for c in hand if c.kind=="bright"]
-    if brights_hand:
-        for b in brights_hand:
-            if any(f.month==b.month for f in field):
-                hints.insert(0, f"光（{b.month}月）を優先して三光/四光/五光を狙う")
-                break
-    return hints[:5]
+            if len(taken) >= 3:
+                rest_field = [f for f in field if f.month != h.month]
+            else:
+                j = field.index(t)
+                rest_field = field[:j] + field[j+1:]
+            # positions after the play are keyed like the analysis (disjoint zone masks, same slots for equal cards)
+            after.append(tuple(zone_masks((rest, rest_field, captured_self + [h] + taken, captured_opp))))
+            if variant == "holo":
+                roles = _new_holo_roles(self_mask, [h] + taken)
+                if roles:
+                    _, field_m, cap_m, _ = after[-1]
+                    gain += int(round(sum(role_value(len(moves), field_m, cap_m, r) for r in roles)))
+                    note = "ホロ役「" + "・".join(_ROLE_TITLE[r] for r in roles) + "」成立"
+            moves.append(Move(play=h, capture_with=t, score_delta=gain + denial_bonus, note=note))
+            # taking a card the opponent is likely to want removes that threat too
+            bonus.append(denial_bonus + sum(card_danger(danger, x) for x in taken))
+    if not moves:
+        return moves
+    # expected value of the whole turn (play + draw), plus the learned evaluator on the position after the play
+    # (without weights: tie-break by simple heuristics, prefer bright/animal/ribbon over kasu when equal)
+    _, fields, caps, _ = zip(*after)
+    gains = expected_draw_gain(fields, caps, unseen, self_mask, variant=variant,
+                               role_value=role_value if variant == "holo" else None)
+    if pursuit:
+        progress = big_yaku_progress((self_mask,) + caps, opp_mask, variant=variant)
+        bonus = [b + pursuit * float(p - progress[0]) for b, p in zip(bonus, progress[1:])]
+    for k, m in enumerate(moves):
+        m.expected = round(float(gains[k]) + bonus[k], 6)
+    ev = default_evaluator()
+    if ev is not None:
+        values = ev.evaluate(*zip(*after)).tolist()
+        for k, m in enumerate(moves):
+            m.value = m.expected + values[k]
+        order = sorted(range(len(moves)), key=lambda k: moves[k].value, reverse=True)
+        moves = [moves[k] for k in order]
+    else:
+        prio = {"bright":3,"animal":2,"ribbon":1,"kasu":0}
+        for m in moves:
+            m.value = m.expected
+        moves.sort(key=lambda m: (m.expected, prio.get(m.play.kind,0)), reverse=True)
+    return moves if limit is None else moves[:limit]
+
+def suggest_highest_yaku_line(hand: List[Card], field: List[Card], captured_self: List[Card],
+                              captured_opp: List[Card] | None = None, *, variant: str = "holo",
+                              limit: int = 5) -> List[str]:
+    """狙い筋（yaku_planner.plan_yaku）のうち完成しうるものを期待点の高い順に、表示用の文字列で"""
+    plans = plan_yaku(hand, field, captured_self, captured_opp or [], variant=variant)
+    return [p.format() for p in plans if p.feasible][:limit]
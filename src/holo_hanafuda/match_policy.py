@@ -0,0 +1,252 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+from .arena import GreedyStrategy, play_game, register_strategy
+from .koikoi_engine import Position
+
+"""
+試合全体（12か月）を見た方針: 点差・残りの局数・親で、こいこいするか・大役を狙うかを変える
+
+- リスクの方針（RiskProfile）: こいこいする条件（今の役点・残りの手札）と大役を狙う重み（pursuit）。
+  慎重（すぐあがる, 今の greedy と同じ）/ 普通 / 強気 の3つ
+- 自己対局（方針 vs greedy）で、方針ごと・親か子かごとに1局の得点（自分から見て ±, 流局 0）の分布を数える
+- 動的計画法: V[残り局数][点差][親] = 試合に勝つ確率。1局ごとに、分布で点差を動かし、勝った側が次の親
+  （流局は親のまま）とし、勝つ確率が最大になる方針を選ぶ。最後は点差 > 0 で勝ち、0 で 1/2
+- 分布は有限の対局数からの推定なので、既定の方針（慎重 = 今の greedy）から切り替えるのは、勝つ確率の差が
+  その標準誤差（対局数 n の分布から求める）の SWITCH_Z 倍と SWITCH_MIN_GAIN を超えるときだけ。
+  表には n と平均得点の標準誤差も保存する
+- 表（MatchPolicy）は npz で保存し（既定: 同梱の assets/match_policy.npz）、引くのは配列の添字だけ（O(1)）
+- GameState.config の "match": {"score_diff": 自分 - 相手, "rounds_left": この局を含む残り局数,
+  "dealer": 自分が親か} から方針を選ぶ。"risk": 方針名 で直接指定もできる。どちらも無ければ None（従来どおり）
+"""
+
+MATCH_ROUNDS = 12
+MAX_DIFF = 60          # 点差はこの範囲に丸める（これより開いていれば勝敗はほぼ決まり）
+MAX_ROUND_POINTS = 30  # 1局の得点はこの範囲に丸める
+SWITCH_Z = 3.0         # 既定の方針から切り替えるのに要る 勝つ確率の差 / その標準誤差（升目ごとに比べるので厳しめ）
+SWITCH_MIN_GAIN = 1e-3 # かつ勝つ確率の差がこれ以上（ほぼ決まった試合の僅差・丸めの差では切り替えない）
+DEFAULT_POLICY = Path(__file__).parent / "assets" / "match_policy.npz"
+
+
+@dataclass(frozen=True)
+class RiskProfile:
+    name: str
+    label: str
+    koikoi_below: int   # 役点がこれ未満なら こいこい（0 = しない）
+    min_hand: int       # ただし残りの手札がこの枚数以上のときだけ
+    pursuit: float      # suggest_best_moves の大役を狙う重み
+
+    def koikoi(self, points: int, hand_left: int) -> bool:
+        """役ができたとき（役点 points, 残りの手札 hand_left 枚）に こいこい するか"""
+        return points < self.koikoi_below and hand_left >= self.min_hand
+
+    def describe(self) -> str:
+        if self.koikoi_below <= 0:
+            return f"{self.label}（役ができたらあがる）"
+        return f"{self.label}（{self.koikoi_below}点未満・手札{self.min_hand}枚以上なら こいこい, 大役の重み {self.pursuit:g}）"
+
+
+PROFILES: Tuple[RiskProfile, ...] = (
+    RiskProfile("safe", "慎重", 0, 0, 0.0),
+    RiskProfile("normal", "普通", 4, 4, 0.5),
+    RiskProfile("bold", "強気", 7, 3, 1.5),
+)
+PROFILE_BY_NAME: Dict[str, RiskProfile] = {p.name: p for p in PROFILES}
+
+
+# ───────────────────────────────────────────────────────────
+# 自己対局で1局の得点分布を数える
+# ───────────────────────────────────────────────────────────
+
+class ProfileStrategy(GreedyStrategy):
+    """方針に沿って指す greedy（大役の重み + こいこいの条件）"""
+
+    def __init__(self, profile: RiskProfile, seed: int = 0):
+        super().__init__(seed)
+        self.profile = profile
+        self.name = f"greedy-{profile.name}"
+        self.pursuit = profile.pursuit
+
+    def koikoi(self, pos: Position, player: int, points: int) -> bool:
+        return self.profile.koikoi(points, pos.hands[player].bit_count())
+
+
+for _p in PROFILES:
+    register_strategy(f"greedy-{_p.name}", partial(ProfileStrategy, _p))
+
+
+def _outcome_chunk(args) -> Tuple[str, np.ndarray]:
+    name, seeds, variant = args
+    profile = PROFILE_BY_NAME[name]
+    counts = np.zeros((2, 2 * MAX_ROUND_POINTS + 1), dtype=np.int64)
+    for seed in seeds:
+        # 席0 が親（deal の dealer=0）。a_seat = 0 なら方針側が親
+        rec = play_game(ProfileStrategy(profile, seed), GreedyStrategy(seed + 1), seed,
+                        variant=variant, a_seat=seed % 2)
+        counts[rec.a_seat, int(np.clip(rec.a_points, -MAX_ROUND_POINTS, MAX_ROUND_POINTS)) + MAX_ROUND_POINTS] += 1
+    return name, counts
+
+
+def estimate_outcomes(games: int, *, variant: str = "holo", seed: int = 0, jobs: int = 1,
+                      chunk: int = 200) -> np.ndarray:
+    """
+    方針ごとに greedy と games 局ずつ（親・子は半分ずつ）対局した得点の度数。
+    返り値 (方針, 親か子か（0 = 自分が親）, 得点 + MAX_ROUND_POINTS)
+    """
+    tasks = [(p.name, range(s, min(s + chunk, seed + games)), variant)
+             for p in PROFILES for s in range(seed, seed + games, chunk)]
+    counts = np.zeros((len(PROFILES), 2, 2 * MAX_ROUND_POINTS + 1), dtype=np.int64)
+    index = {p.name: i for i, p in enumerate(PROFILES)}
+    if jobs <= 1:
+        results: Iterator[Tuple[str, np.ndarray]] = map(_outcome_chunk, tasks)
+        for name, c in results:
+            counts[index[name]] += c
+        return counts
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        for name, c in ex.map(_outcome_chunk, tasks):
+            counts[index[name]] += c
+    return counts
+
+
+# ───────────────────────────────────────────────────────────
+# 動的計画法
+# ───────────────────────────────────────────────────────────
+
+def solve_match(counts: np.ndarray, rounds: int = MATCH_ROUNDS, max_diff: int = MAX_DIFF,
+                z: float = SWITCH_Z) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    得点の度数（estimate_outcomes）→ (勝つ確率 V, 最善の方針の番号)。
+    どちらも (残り局数 0..rounds, 点差 + max_diff, 親（0 = 自分）)。残り 0 局の方針は使わない。
+    方針 0（既定）以外は、方針 0 との勝つ確率の差が標準誤差の z 倍と SWITCH_MIN_GAIN を超えるときだけ選ぶ
+    （1局の分布を n 局の度数から推定した誤差。先の局の V の誤差は含めない）
+    """
+    games = counts.sum(axis=2)
+    probs = counts / np.maximum(games[:, :, None], 1)
+    S = (counts.shape[2] - 1) // 2
+    diffs = np.arange(-max_diff, max_diff + 1)
+    value = np.zeros((rounds + 1, len(diffs), 2))
+    best = np.zeros((rounds + 1, len(diffs), 2), dtype=np.uint8)
+    value[0] = np.where(diffs > 0, 1.0, np.where(diffs == 0, 0.5, 0.0))[:, None]
+    for r in range(1, rounds + 1):
+        prev = value[r - 1]
+        for dealer in (0, 1):
+            acc = np.zeros((len(counts), len(diffs)))
+            acc2 = np.zeros((len(counts), len(diffs)))   # 分散を求めるための 2 乗の期待値
+            for s in range(-S, S + 1):
+                w = probs[:, dealer, s + S]
+                if not w.any():
+                    continue
+                # 勝った側が次の親（流局は親のまま）
+                nxt = 0 if s > 0 else 1 if s < 0 else dealer
+                v = prev[np.clip(diffs + s, -max_diff, max_diff) + max_diff, nxt][None, :]
+                acc += w[:, None] * v
+                acc2 += w[:, None] * v * v
+            var = np.maximum(acc2 - acc * acc, 0.0) / np.maximum(games[:, dealer], 1)[:, None]
+            significant = acc - acc[0] > np.maximum(z * np.sqrt(var + var[0]), SWITCH_MIN_GAIN)
+            significant[0] = True
+            choice = np.where(significant, acc, -np.inf).argmax(axis=0)
+            best[r, :, dealer] = choice
+            value[r, :, dealer] = acc[choice, np.arange(len(diffs))]
+    return value, best
+
+
+class MatchPolicy:
+    """(残り局数, 点差, 親) → 方針 の表"""
+
+    def __init__(self, value: np.ndarray, best: np.ndarray, counts: np.ndarray,
+                 profiles: Sequence[str], variant: str = "holo"):
+        self.value = value
+        self.best = best
+        self.counts = counts
+        self.profiles = tuple(profiles)
+        self.variant = variant
+        self.rounds = value.shape[0] - 1
+        self.max_diff = (value.shape[1] - 1) // 2
+
+    @staticmethod
+    def build(counts: np.ndarray, *, rounds: int = MATCH_ROUNDS, variant: str = "holo",
+              z: float = SWITCH_Z) -> "MatchPolicy":
+        value, best = solve_match(counts, rounds, z=z)
+        return MatchPolicy(value, best, counts, [p.name for p in PROFILES], variant)
+
+    def _index(self, score_diff: int, rounds_left: int, dealer: bool) -> Tuple[int, int, int]:
+        r = min(max(int(rounds_left), 1), self.rounds)
+        d = min(max(int(score_diff), -self.max_diff), self.max_diff) + self.max_diff
+        return r, d, 0 if dealer else 1
+
+    def lookup(self, score_diff: int, rounds_left: int, dealer: bool) -> RiskProfile:
+        """この局で使う方針（配列を引くだけ）"""
+        return PROFILE_BY_NAME[self.profiles[self.best[self._index(score_diff, rounds_left, dealer)]]]
+
+    def win_probability(self, score_diff: int, rounds_left: int, dealer: bool) -> float:
+        return float(self.value[self._index(score_diff, rounds_left, dealer)])
+
+    def games(self) -> np.ndarray:
+        """(方針, 親か子か) ごとの対局数"""
+        return self.counts.sum(axis=2)
+
+    def _point_stats(self) -> Tuple[np.ndarray, np.ndarray]:
+        pts = np.arange(self.counts.shape[2]) - (self.counts.shape[2] - 1) // 2
+        n = np.maximum(self.games(), 1)
+        mean = (self.counts * pts).sum(axis=2) / n
+        var = (self.counts * pts ** 2).sum(axis=2) / n - mean ** 2
+        return mean, np.sqrt(np.maximum(var, 0.0) / n)
+
+    def mean_points(self) -> Dict[str, Tuple[float, float]]:
+        """方針ごとの1局の平均得点（親, 子）"""
+        mean, _ = self._point_stats()
+        return {name: (float(mean[i, 0]), float(mean[i, 1])) for i, name in enumerate(self.profiles)}
+
+    def stderr_points(self) -> Dict[str, Tuple[float, float]]:
+        """mean_points の標準誤差（親, 子）"""
+        _, se = self._point_stats()
+        return {name: (float(se[i, 0]), float(se[i, 1])) for i, name in enumerate(self.profiles)}
+
+    def format_table(self, dealer: bool, diffs: Sequence[int] = range(-20, 21, 5)) -> List[str]:
+        """残り局数 × 点差 の方針（頭文字）の表"""
+        lines = ["残り\\点差" + "".join(f"{d:>5}" for d in diffs)]
+        for r in range(self.rounds, 0, -1):
+            lines.append(f"{r:>8}" + "".join(f"{self.lookup(d, r, dealer).name[0]:>5}" for d in diffs))
+        return lines
+
+    def save(self, path: str | Path) -> None:
+        # games / mean / stderr は counts から求まるが、表の確からしさを npz だけで確かめられるよう一緒に保存する
+        mean, se = self._point_stats()
+        np.savez_compressed(path, value=self.value.astype(np.float32), best=self.best, counts=self.counts,
+                            profiles=np.array(self.profiles), variant=np.array(self.variant),
+                            games=self.games(), mean=mean.astype(np.float32), stderr=se.astype(np.float32))
+
+    @staticmethod
+    def load(path: str | Path) -> "MatchPolicy":
+        with np.load(path) as z:
+            return MatchPolicy(z["value"], z["best"], z["counts"], [str(p) for p in z["profiles"]],
+                               str(z["variant"]))
+
+
+@lru_cache(maxsize=1)
+def default_policy() -> MatchPolicy | None:
+    """同梱の表（無ければ None）"""
+    if not DEFAULT_POLICY.exists():
+        return None
+    return MatchPolicy.load(DEFAULT_POLICY)
+
+
+def match_profile(config: Mapping) -> RiskProfile | None:
+    """GameState.config → この局の方針（"risk" の直接指定 > "match" の表引き。どちらも無ければ None）"""
+    name = config.get("risk")
+    if name in PROFILE_BY_NAME:
+        return PROFILE_BY_NAME[name]
+    match = config.get("match")
+    if not match:
+        return None
+    policy = default_policy()
+    if policy is None:
+        return None
+    return policy.lookup(match.get("score_diff", 0), match.get("rounds_left", MATCH_ROUNDS),
+                         bool(match.get("dealer", False)))
@@ -9,3 +9,22 @@ def _rank(month: int) -> int:
 def kabu_value(months: List[int]) -> int:
     s = sum(_rank(m) for m in months)
     return s % 10
+
+# Special hands (house rules vary; here they beat any plain value, in this order):
+#   shippin = 4 and 1 as the first two cards, kuppin = 9 and 1, arashi = three cards of one month.
+SHIPPIN = 10
+KUPPIN = 11
+ARASHI = 12
+MAX_STRENGTH = ARASHI
+
+def kabu_strength(months: List[int]) -> int:
+    """Hand strength for comparison: 0..9 = plain kabu value, SHIPPIN/KUPPIN/ARASHI above that."""
+    if len(months) == 3 and months[0] == months[1] == months[2]:
+        return ARASHI
+    if len(months) == 2:
+        pair = sorted(months)
+        if pair == [1, 9]:
+            return KUPPIN
+        if pair == [1, 4]:
+            return SHIPPIN
+    return kabu_value(months)
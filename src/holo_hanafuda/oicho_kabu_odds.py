@@ -0,0 +1,137 @@
+"""
+Exact Oicho-Kabu odds over the 48-card deck (4 cards per month).
+
+Model:
+  * The player holds two cards and may draw one more (stand/draw decision).
+  * The dealer's two cards are unseen; the dealer draws a third card when the
+    plain value is <= DEALER_DRAW_MAX (special hands never draw).
+  * Strength comparison uses oicho_kabu.kabu_strength; ties go to the dealer.
+
+Everything is enumerated exactly with sequential draws without replacement, as
+NumPy arrays indexed by month (0-based).  The full-deck tables are built once
+and cached, so stand/draw advice for a fresh deck is a table lookup; with seen
+cards removed the result is computed once per deck composition and memoised.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .oicho_kabu import kabu_strength, MAX_STRENGTH
+
+MONTHS = 12
+CARDS_PER_MONTH = 4
+DEALER_DRAW_MAX = 5
+
+def _build_strength_tables() -> Tuple[np.ndarray, np.ndarray]:
+    s2 = np.zeros((MONTHS, MONTHS), dtype=np.int8)
+    s3 = np.zeros((MONTHS, MONTHS, MONTHS), dtype=np.int8)
+    for a in range(MONTHS):
+        for b in range(MONTHS):
+            s2[a, b] = kabu_strength([a + 1, b + 1])
+            for c in range(MONTHS):
+                s3[a, b, c] = kabu_strength([a + 1, b + 1, c + 1])
+    return s2, s3
+
+# S2[a, b] / S3[a, b, c]: strength of a 2-/3-card hand (0-based months)
+S2, S3 = _build_strength_tables()
+
+def dealer_final_strength(draw_max: int = DEALER_DRAW_MAX) -> np.ndarray:
+    """(12, 12, 12) dealer strength indexed by (d1, d2, d3); d3 is ignored when the dealer stands."""
+    draws = (S2 <= draw_max)[:, :, None]
+    return np.where(draws, S3, S2[:, :, None])
+
+_DEALER_FINAL = dealer_final_strength()
+
+def deck_counts(hand: Iterable[int] = (), seen: Iterable[int] = ()) -> np.ndarray:
+    """Remaining cards per month (index 0 = January) after removing hand and seen months."""
+    counts = np.full(MONTHS, CARDS_PER_MONTH, dtype=np.int64)
+    for m in list(hand) + list(seen):
+        if not 1 <= m <= MONTHS:
+            raise ValueError(f"Invalid month: {m}")
+        counts[m - 1] -= 1
+    if (counts < 0).any():
+        raise ValueError("More than 4 cards of one month")
+    return counts
+
+def joint_draws(counts: np.ndarray, k: int) -> np.ndarray:
+    """Probability of drawing months (m1..mk) in order without replacement, shape (12,)*k."""
+    n = counts.astype(np.float64)
+    total = n.sum()
+    if total < k:
+        raise ValueError("Not enough cards left in the deck")
+    eye = np.eye(MONTHS)
+    w = n / total
+    used = eye  # used[..., m]: how many of month m the prefix already took
+    for step in range(1, k):
+        avail = np.clip(n - used, 0, None)
+        w = w[..., None] * avail / (total - step)
+        used = used[..., None, :] + eye
+    return w
+
+def _win_stand(a: int, b: int, counts: np.ndarray) -> float:
+    w = joint_draws(counts, 3)                       # (d1, d2, d3)
+    return float((w * (S2[a, b] > _DEALER_FINAL)).sum())
+
+def _win_draw(a: int, b: int, counts: np.ndarray) -> float:
+    w = joint_draws(counts, 4)                       # (c, d1, d2, d3)
+    mine = S3[a, b][:, None, None, None]
+    return float((w * (mine > _DEALER_FINAL[None])).sum())
+
+@dataclass(frozen=True)
+class KabuTables:
+    win_stand: np.ndarray   # (12, 12) P(player wins | stand) for a fresh deck
+    win_draw: np.ndarray    # (12, 12) P(player wins | draw one)
+    draw: np.ndarray        # (12, 12) bool: drawing is strictly better
+
+_TABLES: KabuTables | None = None
+
+def full_deck_tables() -> KabuTables:
+    """Stand/draw win probabilities for every 2-card hand from a full deck (built once)."""
+    global _TABLES
+    if _TABLES is None:
+        stand = np.zeros((MONTHS, MONTHS))
+        draw = np.zeros((MONTHS, MONTHS))
+        for a in range(MONTHS):
+            for b in range(a, MONTHS):
+                counts = deck_counts([a + 1, b + 1])
+                stand[a, b] = stand[b, a] = _win_stand(a, b, counts)
+                draw[a, b] = draw[b, a] = _win_draw(a, b, counts)
+        _TABLES = KabuTables(win_stand=stand, win_draw=draw, draw=draw > stand)
+    return _TABLES
+
+@lru_cache(maxsize=4096)
+def _win_probabilities_cached(a: int, b: int, counts: Tuple[int, ...]) -> Tuple[float, float]:
+    c = np.array(counts, dtype=np.int64)
+    return _win_stand(a, b, c), _win_draw(a, b, c)
+
+def win_probabilities(hand: List[int], seen: Iterable[int] = ()) -> Dict[str, float]:
+    """P(player beats the dealer) for standing and for drawing one card, given seen months."""
+    if len(hand) != 2:
+        raise ValueError("Advice needs exactly two cards in hand")
+    a, b = hand[0] - 1, hand[1] - 1
+    seen = list(seen)
+    counts = deck_counts(hand, seen)
+    if not seen:
+        t = full_deck_tables()
+        return {"stand": float(t.win_stand[a, b]), "draw": float(t.win_draw[a, b])}
+    stand, draw = _win_probabilities_cached(a, b, tuple(int(x) for x in counts))
+    return {"stand": stand, "draw": draw}
+
+def final_distribution(hand: List[int], seen: Iterable[int] = (), *, draw: bool = True) -> np.ndarray:
+    """Distribution over final strength 0..MAX_STRENGTH for a 2-card hand, optionally drawing a third."""
+    a, b = hand[0] - 1, hand[1] - 1
+    dist = np.zeros(MAX_STRENGTH + 1)
+    if not draw:
+        dist[S2[a, b]] = 1.0
+        return dist
+    counts = deck_counts(hand, seen)
+    np.add.at(dist, S3[a, b], counts / counts.sum())
+    return dist
+
+def advise(hand: List[int], seen: Iterable[int] = ()) -> Tuple[str, Dict[str, float]]:
+    """'draw' or 'stand' together with both win probabilities."""
+    p = win_probabilities(hand, seen)
+    return ("draw" if p["draw"] > p["stand"] else "stand"), p
@@ -0,0 +1,218 @@
+from __future__ import annotations
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from .cards import ALL_CARDS, FULL_MASK, Card, zone_masks
+from .gamelog import VARIANTS, read_log
+from .koikoi_engine import Position, bits, legal_plays, play_turn, playout
+from .koikoi_rules import yaku_points_mask
+from .state import GameState
+from .symmetry import canonicalize, invert
+
+"""
+記録局面の表（対局ログに現れた局面をオフラインで深く読んだ最善手を、ディスク上のハッシュ表から引く）
+
+- キー: symmetry.canonicalize で正規化した (手札, 場札, 自分の取り札, 相手の取り札) + variant
+  → 同値な局面（カスのスロット違い・対称な月）は1つの項目を共有する。着手は正規化後のビットで保存
+- 読み: 候補手ごとに、見えていない札（相手手札 + 山）を同じ乱数列で並べ替えたサンプルを
+  軽量な方策で終局まで打ち切り、平均得点（手番側から見た値）が最大の手を選ぶ
+- ファイル: 16 バイトのヘッダ（MAGIC 8B + 容量 u4 + 件数 u4）+ BOOK_DTYPE の配列（開番地法, 容量は2の冪）
+  np.memmap で開き、1回の照会は数回のプローブだけ
+- 局面はそのまま一致したときだけ引ける。配札は毎回違い、新しい対局の局面が表に載っていることはまず無いので、
+  一般的な意味の定石（序盤の指針）ではなく、ログの再生・振り返りや検討用の局面集を引き直すためのキャッシュ
+  （opening_positions で .hhlog の序盤の手番を集め、build_book で読む）。当たっても通常の解析は省かない
+"""
+
+DEFAULT_BOOK = Path(__file__).parent / "assets" / "opening_book.hhbook"
+MAGIC = b"HHFBOOK\x01"
+HEADER_SIZE = 16
+
+BOOK_DTYPE = np.dtype([
+    ("hand", "<u8"), ("field", "<u8"), ("captured_self", "<u8"), ("captured_opp", "<u8"),
+    ("variant", "u1"),
+    ("used", "u1"),
+    ("play", "i1"),      # 正規化後のビット位置
+    ("target", "i1"),    # 場に2枚あるときの取り先（-1 = 選択なし）
+    ("value", "<f4"),    # 平均得点（手番側から見た値）
+    ("samples", "<u4"),  # 候補1つあたりのサンプル数
+])
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix(x: int) -> int:
+    """splitmix64 の最終段"""
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & _MASK64
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & _MASK64
+    return x ^ (x >> 31)
+
+
+def _hash(key: Tuple[int, int, int, int, int]) -> int:
+    h = 0
+    for k in key:
+        h = _mix(h ^ k)
+    return h
+
+
+# ───────────────────────────────────────────────────────────
+# 読み（モンテカルロ）
+# ───────────────────────────────────────────────────────────
+
+def search_position(masks: Sequence[int], variant: str = "holo", *, samples: int = 64,
+                    opp_hand_size: int | None = None, seed: int = 0) -> List[Tuple[int, int, float]]:
+    """
+    手番側の (手札, 場札, 自分の取り札, 相手の取り札) から、候補手ごとの平均得点を求める。
+    相手の手札は見えていない札から opp_hand_size 枚（既定: 自分の手札と同じ枚数）。
+    返り値: [(出す札, 取り先, 平均得点)]（良い順）
+    """
+    hand, field, cap_self, cap_opp = masks
+    unseen = list(bits(FULL_MASK & ~(hand | field | cap_self | cap_opp)))
+    n_opp = min(len(unseen), hand.bit_count() if opp_hand_size is None else opp_hand_size)
+    root = Position((hand, 0), field, (cap_self, cap_opp), [], variant=variant)
+    root.points = [yaku_points_mask(cap_self, variant), yaku_points_mask(cap_opp, variant)]
+    plays = legal_plays(root, 0)
+    totals = [0] * len(plays)
+    rng = random.Random(seed)
+    for _ in range(samples):
+        order = unseen[:]
+        rng.shuffle(order)
+        opp = sum(1 << i for i in order[:n_opp])
+        deck = order[n_opp:]
+        rollout_seed = rng.getrandbits(32)
+        for k, (card, target) in enumerate(plays):
+            # 候補どうしで同じ配り（相手手札・山）と同じ乱数を使い、差の分散を小さくする
+            pos = Position((hand, opp), field, (cap_self, cap_opp), deck, variant=variant,
+                           rng=random.Random(rollout_seed))
+            pos.points = list(root.points)
+            play_turn(pos, card, target)
+            totals[k] += playout(pos, 0)
+    res = [(c, t, tot / samples) for (c, t), tot in zip(plays, totals)]
+    res.sort(key=lambda r: r[2], reverse=True)
+    return res
+
+
+# ───────────────────────────────────────────────────────────
+# ハッシュ表
+# ───────────────────────────────────────────────────────────
+
+@dataclass
+class BookMove:
+    play: Card
+    capture_with: Card | None   # 場に2枚あるときの取り先（それ以外は None）
+    value: float
+    samples: int
+
+
+class OpeningBook:
+    def __init__(self, table: np.ndarray):
+        self.table = table
+        self._cap_mask = len(table) - 1
+
+    def __len__(self) -> int:
+        return int(self.table["used"].sum())
+
+    @staticmethod
+    def load(path: str | Path) -> "OpeningBook":
+        path = Path(path)
+        with open(path, "rb") as f:
+            head = f.read(HEADER_SIZE)
+        if len(head) < HEADER_SIZE or head[:8] != MAGIC:
+            raise ValueError(f"Not an opening book: {path}")
+        cap = int(np.frombuffer(head[8:12], dtype="<u4")[0])
+        table = np.memmap(path, dtype=BOOK_DTYPE, mode="r", offset=HEADER_SIZE, shape=(cap,))
+        return OpeningBook(table)
+
+    @staticmethod
+    def build(entries: Iterable[Tuple[Tuple[int, int, int, int, int], int, int, float, int]],
+              *, load: float = 0.5) -> "OpeningBook":
+        """entries: (正規化キー (手札, 場札, 自分, 相手, variant 番号), 出す札, 取り先, 平均得点, サンプル数)"""
+        entries = list(entries)
+        cap = 16
+        while cap * load < len(entries):
+            cap *= 2
+        book = OpeningBook(np.zeros(cap, dtype=BOOK_DTYPE))
+        for key, play, target, value, samples in entries:
+            i = book._find(key)
+            book.table[i] = key[:4] + (key[4], 1, play, target, value, samples)
+        return book
+
+    def save(self, path: str | Path) -> None:
+        with open(path, "wb") as f:
+            f.write(MAGIC + np.array([len(self.table), len(self)], dtype="<u4").tobytes())
+            f.write(np.ascontiguousarray(self.table).tobytes())
+
+    def _find(self, key: Tuple[int, int, int, int, int]) -> int:
+        """key の入っている（または入るべき空きの）番地"""
+        t = self.table
+        i = _hash(key) & self._cap_mask
+        while t["used"][i]:
+            r = t[i]
+            if (int(r["hand"]), int(r["field"]), int(r["captured_self"]), int(r["captured_opp"]),
+                    int(r["variant"])) == key:
+                return i
+            i = (i + 1) & self._cap_mask
+        return i
+
+    def lookup_masks(self, masks: Sequence[int], variant: str = "holo") -> Tuple[int, int, float, int] | None:
+        """(出す札, 取り先, 平均得点, サンプル数) を元の局面のビット位置で返す（無ければ None）"""
+        if variant not in VARIANTS:
+            return None
+        canon, perm = canonicalize(masks, variant)
+        i = self._find(canon + (VARIANTS.index(variant),))
+        r = self.table[i]
+        if not r["used"]:
+            return None
+        inv = invert(perm)
+        play, target = int(r["play"]), int(r["target"])
+        return inv[play], (inv[target] if target >= 0 else -1), float(r["value"]), int(r["samples"])
+
+    def lookup(self, gs: GameState) -> BookMove | None:
+        masks = zone_masks((gs.hand, gs.field, gs.captured_self, gs.captured_opp))
+        hit = self.lookup_masks(masks, gs.config.get("variant", "holo"))
+        if hit is None:
+            return None
+        play, target, value, samples = hit
+        return BookMove(play=ALL_CARDS[play], capture_with=ALL_CARDS[target] if target >= 0 else None,
+                        value=value, samples=samples)
+
+
+# ───────────────────────────────────────────────────────────
+# 作成（オフライン）
+# ───────────────────────────────────────────────────────────
+
+def _search_entry(args):
+    canon, variant, samples, seed = args
+    (play, target, value), *_ = search_position(canon[:4], variant, samples=samples, seed=seed)
+    return canon, play, target, value, samples
+
+
+def opening_positions(log_paths: Iterable[str | Path], *, plies: int = 1) -> Iterator[tuple]:
+    """ログの各局の最初の plies 手番の局面（正規化キー）を重複なしで列挙"""
+    seen = set()
+    for path in log_paths:
+        rows = read_log(path)
+        rows = rows[rows["ply"] < plies]
+        for r in rows:
+            p = int(r["turn"])
+            masks = (int(r[f"hand{p}"]), int(r["field"]), int(r[f"captured{p}"]), int(r[f"captured{1 - p}"]))
+            variant = int(r["variant"])
+            key = canonicalize(masks, VARIANTS[variant])[0] + (variant,)
+            if key not in seen:
+                seen.add(key)
+                yield key
+
+
+def build_book(keys: Iterable[tuple], *, samples: int = 64, jobs: int = 1, seed: int = 0) -> OpeningBook:
+    """正規化キーの列を読んで記録局面の表を作る（jobs > 1 ならプロセスプールで並列）"""
+    tasks = [(k, VARIANTS[k[4]], samples, seed + i) for i, k in enumerate(keys)]
+    if jobs <= 1:
+        entries = [_search_entry(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            entries = list(ex.map(_search_entry, tasks, chunksize=8))
+    return OpeningBook.build(entries)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, TypeVar
+
+"""
+軽量な計測フック（既定では無効）
+
+- timed("名前") で包んだ関数は、enable() 後に 呼び出し回数・合計/最大時間 を集計する
+- 無効時のコストはラッパー1段とフラグ参照1回のみ（時計も辞書も触らない）
+- stage("名前") は任意の区間用（CLI/GUI の段階別タイミング）
+- 集計はスレッドセーフ（GUI のライブ検出スレッドからも呼ばれる）
+"""
+
+F = TypeVar("F", bound=Callable)
+
+_enabled = False
+_lock = threading.Lock()
+_stats: Dict[str, List[float]] = {}  # 名前 -> [回数, 合計秒, 最大秒]
+
+
+def enable(on: bool = True) -> None:
+    global _enabled
+    _enabled = on
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+
+
+def record(name: str, seconds: float) -> None:
+    with _lock:
+        s = _stats.get(name)
+        if s is None:
+            _stats[name] = [1, seconds, seconds]
+        else:
+            s[0] += 1
+            s[1] += seconds
+            if seconds > s[2]:
+                s[2] = seconds
+
+
+def timed(name: str) -> Callable[[F], F]:
+    def deco(fn: F) -> F:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - t0)
+        return wrapper  # type: ignore[return-value]
+    return deco
+
+
+@contextmanager
+def stage(name: str):
+    if not _enabled:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - t0)
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    """名前 -> {"count", "total_ms", "mean_ms", "max_ms"}"""
+    with _lock:
+        items = [(k, list(v)) for k, v in _stats.items()]
+    return {
+        k: {"count": int(n), "total_ms": tot * 1e3, "mean_ms": tot / n * 1e3, "max_ms": mx * 1e3}
+        for k, (n, tot, mx) in items
+    }
+
+
+def format_stats() -> str:
+    snap = snapshot()
+    if not snap:
+        return "(計測データなし)"
+    width = max(len(k) for k in snap)
+    lines = [f"{'name':<{width}}  {'count':>7}  {'total ms':>10}  {'mean ms':>9}  {'max ms':>9}"]
+    for k, v in sorted(snap.items(), key=lambda kv: kv[1]["total_ms"], reverse=True):
+        lines.append(f"{k:<{width}}  {v['count']:>7}  {v['total_ms']:>10.2f}  {v['mean_ms']:>9.3f}  {v['max_ms']:>9.3f}")
+    return "\n".join(lines)
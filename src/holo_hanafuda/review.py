@@ -0,0 +1,261 @@
+from __future__ import annotations
+import sqlite3
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from .analysis import cache_version
+from .cards import ALL_CARDS
+from .gamelog import read_log, row_to_state
+from .koikoi_strategy import suggest_best_moves
+
+"""
+対局の振り返り: 記録した対局（.hhlog）の手番ごとに、指した手とエンジンの最善手を比べる
+
+- 損失 = 最善手の評価値 - 指した手の評価値（Move.value: 手番全体の期待値 + 着手後の局面評価, 点単位）
+  指した手が候補に無い（ログと解析のルールが食い違う）手番は損失なしで「不明」として数える
+- 仕事の単位は局面（手番）。ログの行を CHUNK 行ずつプロセスプールに渡し、終わったチャンクから
+  sqlite のチェックポイントに書き込む。中断しても、次回は未処理の行だけを解析する
+- チェックポイントのキーは (ログの絶対パス, 行番号)。解析ロジックか評価器の重みが
+  変わったら（analysis.cache_version）作り直す
+"""
+
+CHUNK = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviewed (
+    log TEXT, idx INTEGER,
+    game INTEGER, ply INTEGER, turn INTEGER,
+    play INTEGER, target INTEGER, best_play INTEGER, best_target INTEGER,
+    played_value REAL, best_value REAL, rank INTEGER,
+    PRIMARY KEY (log, idx)
+)"""
+
+
+# ───────────────────────────────────────────────────────────
+# 1局面の解析（ワーカー側）
+# ───────────────────────────────────────────────────────────
+
+def _card_index(card) -> int:
+    return ALL_CARDS.index(card) if card is not None else -1
+
+
+def review_row(row) -> Tuple[int, int, int, int, float, float, int] | None:
+    """
+    1レコード → (出した札, 取り先, 最善手の札, その取り先, 指した手の値, 最善手の値, 指した手の順位)。
+    札は ALL_CARDS の番号（スロットを区別しない代表）。着手の無い行は None。順位は 1 始まり（0 = 候補に無い）
+    """
+    play, target = int(row["play"]), int(row["target"])
+    if play < 0:
+        return None
+    gs = row_to_state(row)
+    moves = suggest_best_moves(gs.hand, gs.field, gs.captured_self, gs.captured_opp,
+                               variant=gs.config["variant"], limit=None)
+    if not moves:
+        return None
+    card = ALL_CARDS[play]
+    taken = ALL_CARDS[target] if target >= 0 else None
+    same = [k for k, m in enumerate(moves) if m.play.key() == card.key()]
+    # 取り先まで一致する候補（総取り・取り先が1枚のときはログに取り先が残らないので札だけで照合）
+    exact = [k for k in same if taken is None
+             or (moves[k].capture_with is not None and moves[k].capture_with.key() == taken.key())]
+    k = (exact or same or [-1])[0]
+    best = moves[0]
+    played_value = moves[k].value if k >= 0 else best.value
+    return (_card_index(moves[k].play) if k >= 0 else play,
+            _card_index(moves[k].capture_with) if k >= 0 else target,
+            _card_index(best.play), _card_index(best.capture_with),
+            float(played_value), float(best.value), k + 1)
+
+
+def _review_chunk(args) -> Tuple[str, List[tuple]]:
+    path, indices = args
+    rows = read_log(path)
+    out = []
+    for i in indices:
+        r = rows[int(i)]
+        res = review_row(r) or (-1, -1, -1, -1, 0.0, 0.0, -1)  # 着手の無い行も処理済みとして残す
+        out.append((path, int(i), int(r["game"]), int(r["ply"]), int(r["turn"])) + res)
+    return path, out
+
+
+# ───────────────────────────────────────────────────────────
+# チェックポイント
+# ───────────────────────────────────────────────────────────
+
+class ReviewCheckpoint:
+    """(ログ, 行番号) ごとの解析結果を溜める sqlite。チャンク単位でコミットする"""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        self._db.execute(_SCHEMA)
+        version = cache_version()
+        row = self._db.execute("SELECT v FROM meta WHERE k = 'version'").fetchone()
+        if row is None or row[0] != version:
+            self._db.execute("DELETE FROM reviewed")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        self._db.commit()
+
+    def done(self, log: str) -> np.ndarray:
+        """log の処理済みの行番号"""
+        rows = self._db.execute("SELECT idx FROM reviewed WHERE log = ?", (log,)).fetchall()
+        return np.array([r[0] for r in rows], dtype=np.int64)
+
+    def add(self, results: Iterable[tuple]) -> None:
+        self._db.executemany("INSERT OR REPLACE INTO reviewed VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", results)
+        self._db.commit()
+
+    def rows(self, logs: Sequence[str]) -> List[tuple]:
+        """logs の結果（ログ, 行番号順）"""
+        out = []
+        for log in logs:
+            out += self._db.execute("SELECT * FROM reviewed WHERE log = ? ORDER BY idx", (log,)).fetchall()
+        return out
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ───────────────────────────────────────────────────────────
+# 実行と集計
+# ───────────────────────────────────────────────────────────
+
+def find_logs(paths: Iterable[str | Path]) -> List[str]:
+    """ファイル・ディレクトリ（*.hhlog を再帰的に）→ ログの絶対パス（重複なし, 順序固定）"""
+    out: List[str] = []
+    for p in map(Path, paths):
+        found = sorted(p.rglob("*.hhlog")) if p.is_dir() else [p]
+        out += [str(f.resolve()) for f in found]
+    return list(dict.fromkeys(out))
+
+
+def pending_tasks(logs: Sequence[str], ckpt: ReviewCheckpoint, chunk: int = CHUNK) -> List[Tuple[str, np.ndarray]]:
+    """未処理の行を (ログ, 行番号の配列) のチャンクに分ける"""
+    tasks = []
+    for log in logs:
+        todo = np.setdiff1d(np.arange(len(read_log(log))), ckpt.done(log))
+        tasks += [(log, todo[s:s + chunk]) for s in range(0, len(todo), chunk)]
+    return tasks
+
+
+def run_review(logs: Sequence[str], ckpt: ReviewCheckpoint, *, jobs: int = 1, chunk: int = CHUNK,
+               progress: Callable[[int, int], None] | None = None) -> int:
+    """
+    未処理の局面を解析してチェックポイントに書き込む。解析した局面数を返す。
+    progress(済み, 全体) はチャンクが終わるたびに呼ばれる（全体は今回の実行分）
+    """
+    tasks = pending_tasks(logs, ckpt, chunk)
+    total = sum(len(t[1]) for t in tasks)
+    done = 0
+    if jobs <= 1:
+        for t in tasks:
+            _, res = _review_chunk(t)
+            ckpt.add(res)
+            done += len(res)
+            if progress:
+                progress(done, total)
+        return done
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        # 投入は jobs * 2 件まで（中断したときに捨てる仕事を少なくする）
+        it = iter(tasks)
+        running = set()
+        for t in it:
+            running.add(ex.submit(_review_chunk, t))
+            if len(running) >= jobs * 2:
+                break
+        while running:
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for f in finished:
+                _, res = f.result()
+                ckpt.add(res)
+                done += len(res)
+                if progress:
+                    progress(done, total)
+                nxt = next(it, None)
+                if nxt is not None:
+                    running.add(ex.submit(_review_chunk, nxt))
+    return done
+
+
+@dataclass
+class MoveReview:
+    ply: int
+    turn: int
+    play: str
+    target: str | None
+    best_play: str
+    best_target: str | None
+    loss: float
+    rank: int    # 指した手の順位（1 = 最善, 0 = 候補に無い）
+
+
+@dataclass
+class GameReport:
+    log: str
+    game: int
+    decisions: int = 0
+    unknown: int = 0
+    best: int = 0                                              # 最善手を指した数
+    loss: List[float] = field(default_factory=lambda: [0.0, 0.0])  # 席ごとの損失の合計
+    moves: List[MoveReview] = field(default_factory=list)
+
+    @property
+    def total_loss(self) -> float:
+        return self.loss[0] + self.loss[1]
+
+    def worst(self, n: int = 3) -> List[MoveReview]:
+        return sorted((m for m in self.moves if m.loss > 1e-9), key=lambda m: m.loss, reverse=True)[:n]
+
+    def to_json(self, top: int = 3) -> dict:
+        return {
+            "log": self.log, "game": self.game, "decisions": self.decisions, "unknown": self.unknown,
+            "best": self.best, "loss": [round(x, 3) for x in self.loss],
+            "worst": [m.__dict__ for m in self.worst(top)],
+        }
+
+
+def _key(i: int) -> str | None:
+    return ALL_CARDS[i].key() if i >= 0 else None
+
+
+def game_reports(ckpt: ReviewCheckpoint, logs: Sequence[str]) -> List[GameReport]:
+    """チェックポイントの結果を局ごとにまとめる（ログ・局番号順）"""
+    reports: Dict[Tuple[str, int], GameReport] = {}
+    for (log, _, game, ply, turn, play, target, best_play, best_target,
+         played_value, best_value, rank) in ckpt.rows(logs):
+        rep = reports.setdefault((log, game), GameReport(log=log, game=game))
+        if rank < 0:
+            continue  # 着手の無い行
+        rep.decisions += 1
+        if rank == 0:
+            rep.unknown += 1
+            continue
+        loss = max(best_value - played_value, 0.0)
+        rep.best += rank == 1
+        rep.loss[turn] += loss
+        rep.moves.append(MoveReview(ply=ply, turn=turn, play=_key(play), target=_key(target),
+                                    best_play=_key(best_play), best_target=_key(best_target),
+                                    loss=round(loss, 4), rank=rank))
+    return [reports[k] for k in sorted(reports)]
+
+
+def iter_report_lines(reports: Sequence[GameReport], top: int = 3) -> Iterator[str]:
+    for r in reports:
+        yield (f"{Path(r.log).name} 局{r.game}: {r.decisions} 手番, 最善 {r.best}, "
+               f"損失 席0 {r.loss[0]:.2f} / 席1 {r.loss[1]:.2f}" + (f"（照合できず {r.unknown}）" if r.unknown else ""))
+        for m in r.worst(top):
+            played = m.play + (f" +{m.target}" if m.target else "")
+            best = m.best_play + (f" +{m.best_target}" if m.best_target else "")
+            yield f"   {m.ply:>3}手目 席{m.turn}: {played} → 最善 {best}（-{m.loss:.2f}, {m.rank}位）"
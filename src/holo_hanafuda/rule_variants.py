@@ -0,0 +1,265 @@
+from __future__ import annotations
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Tuple
+
+import numpy as np
+
+from .cards import ALL_CARDS, CARD_SLOTS, MASK_DTYPE, MONTH_MASK, popcount
+
+"""
+ルールの違い（variant）をデータで定義し、マスク・しきい値の表にコンパイルして1つの評価器で役点を出す
+
+- 役は YakuRule 1つで書く: cards の札が min_count〜max_count 枚そろうと points 点、
+  min_count を超えた1枚ごとに step 点。requires の札は全部必要、forbids の札が1枚でもあれば不成立、
+  成立すると replaces の役を無効にする（赤短・青短の重複を二重に数えない 等）
+  min_count を省略すると cards の全部（そろい役）
+- 札の指定（セレクタ）: 札のキー（"1:ribbon-poetry-red"）/ "kind=bright" / "tag=rain"
+- 初期手役は HandRule: 同月 group 枚を1組として groups 組以上で成立
+- compile_variant(name) が VariantSpec → CompiledVariant（NumPy の表）に変換してキャッシュする。
+  評価は 1マスク（Python の int 演算）・マスク配列（NumPy でまとめて）とも同じ表を使い、variant ごとの分岐は無い
+- 未知の variant 名は standard として扱う（従来どおり holo 以外は標準ルール）
+"""
+
+
+@dataclass(frozen=True)
+class YakuRule:
+    id: str
+    cards: Tuple[str, ...]            # 数える札（セレクタ）
+    points: int                       # 成立時の点
+    min_count: int | None = None      # None = cards の全部
+    max_count: int | None = None      # None = 上限なし
+    step: int = 0                     # min_count を超えた1枚ごとの加点
+    requires: Tuple[str, ...] = ()
+    forbids: Tuple[str, ...] = ()
+    replaces: Tuple[str, ...] = ()
+    label: str = ""                   # 表示名
+
+
+@dataclass(frozen=True)
+class HandRule:
+    id: str
+    points: int
+    group: int     # 同月の何枚を1組とするか
+    groups: int    # 何組以上で成立するか
+
+
+@dataclass(frozen=True)
+class VariantSpec:
+    name: str
+    yaku: Tuple[YakuRule, ...]
+    hand: Tuple[HandRule, ...] = ()
+    label: str = ""
+
+    def derive(self, name: str, *, label: str = "", remove: Tuple[str, ...] = (),
+               override: Tuple[YakuRule, ...] = (), hand: Tuple[HandRule, ...] | None = None) -> "VariantSpec":
+        """このルールを元にした変種（remove の役を除き、override の役を同じ id のものと置き換える / 追加する）"""
+        new = {r.id: r for r in override}
+        yaku = tuple(new.pop(r.id, r) for r in self.yaku if r.id not in remove) + tuple(new.values())
+        return replace(self, name=name, yaku=yaku, hand=self.hand if hand is None else hand, label=label)
+
+
+# ───────────────────────────────────────────────────────────
+# ルールの定義
+# ───────────────────────────────────────────────────────────
+
+STANDARD = VariantSpec(
+    name="standard",
+    label="標準こいこい",
+    yaku=(
+        YakuRule("gokou", ("kind=bright",), 10, min_count=5, label="五光"),
+        YakuRule("shiko", ("kind=bright",), 8, min_count=4, max_count=4, forbids=("tag=rain",), label="四光"),
+        YakuRule("ame-shiko", ("kind=bright",), 7, min_count=4, max_count=4, requires=("tag=rain",),
+                 label="雨四光"),
+        YakuRule("sanko", ("kind=bright",), 5, min_count=3, max_count=3, forbids=("tag=rain",), label="三光"),
+        YakuRule("inoshikacho", ("7:animal-boar", "10:animal-deer", "6:animal-butterfly"), 5, label="猪鹿蝶"),
+        YakuRule("hanami-zake", ("3:bright-cherry", "9:animal-sake"), 5, label="花見で一杯"),
+        YakuRule("tsukimi-zake", ("8:bright-moon", "9:animal-sake"), 5, label="月見で一杯"),
+        YakuRule("akatan", ("1:ribbon-poetry-red", "2:ribbon-poetry-red", "3:ribbon-poetry-red"), 5, label="赤短"),
+        YakuRule("aotan", ("6:ribbon-blue", "9:ribbon-blue", "10:ribbon-blue"), 5, label="青短"),
+        YakuRule("akatan-aotan", ("1:ribbon-poetry-red", "2:ribbon-poetry-red", "3:ribbon-poetry-red",
+                                  "6:ribbon-blue", "9:ribbon-blue", "10:ribbon-blue"), 10,
+                 replaces=("akatan", "aotan"), label="赤短・青短"),
+        YakuRule("tane", ("kind=animal",), 1, min_count=5, step=1, label="タネ"),
+        YakuRule("tan", ("kind=ribbon",), 1, min_count=5, step=1, label="タン"),
+        YakuRule("kasu", ("kind=kasu",), 1, min_count=10, step=1, label="カス"),
+    ),
+    hand=(
+        HandRule("te-yon", 6, group=4, groups=1),     # 手四: 同月4枚
+        HandRule("kuttsuki", 6, group=2, groups=4),   # くっつき: 同月ペア4組
+    ),
+)
+
+# 並びは対局ログの variant 番号（gamelog.VARIANTS）になるので、追加は末尾に
+VARIANT_RULES: Dict[str, VariantSpec] = {
+    # ホロ版: 9月のタネ札（盃）をカスとしても数える（ホロ役は holo_roles）
+    "holo": STANDARD.derive("holo", label="ホロライブ版",
+                            override=(YakuRule("kasu", ("kind=kasu", "9:animal-sake"), 1, min_count=10, step=1, label="カス"),)),
+    "standard": STANDARD,
+    # よくあるローカルルール
+    "no-sake": STANDARD.derive("no-sake", label="花見・月見なし", remove=("hanami-zake", "tsukimi-zake")),
+    "sake-kasu": STANDARD.derive("sake-kasu", label="盃をカスにも数える",
+                                 override=(YakuRule("kasu", ("kind=kasu", "9:animal-sake"), 1,
+                                                    min_count=10, step=1, label="カス"),)),
+    "no-teyaku": STANDARD.derive("no-teyaku", label="手役なし", hand=()),
+}
+
+
+# ───────────────────────────────────────────────────────────
+# コンパイル
+# ───────────────────────────────────────────────────────────
+
+def selector_mask(sel: str) -> int:
+    """セレクタ → 札マスク（同じ札の全スロット）"""
+    if sel.startswith("kind="):
+        pred = lambda c: c.kind == sel[5:]
+    elif sel.startswith("tag="):
+        pred = lambda c: c.tag == sel[4:]
+    elif sel in CARD_SLOTS:
+        return sum(1 << i for i in CARD_SLOTS[sel])
+    else:
+        raise ValueError(f"Unknown card selector: {sel}")
+    mask = sum(1 << i for i, c in enumerate(ALL_CARDS) if pred(c))
+    if not mask:
+        raise ValueError(f"Card selector matches no card: {sel}")
+    return mask
+
+
+def _union(sels: Tuple[str, ...]) -> int:
+    m = 0
+    for s in sels:
+        m |= selector_mask(s)
+    return m
+
+
+class CompiledVariant:
+    """
+    VariantSpec を表にしたもの（役 R 個）。
+    役ごとに (数える札, 枚数の下限・上限, 必要な札, あれば不成立の札, 点, 1枚ごとの加点) のマスク・しきい値と、
+    成立したら無効にする役のビット（kills）を持つ
+    """
+
+    def __init__(self, spec: VariantSpec):
+        self.spec = spec
+        self.name = spec.name
+        rules = spec.yaku
+        self.ids: Tuple[str, ...] = tuple(r.id for r in rules)
+        index = {k: i for i, k in enumerate(self.ids)}
+        count = [_union(r.cards) for r in rules]
+        lo = [r.min_count if r.min_count is not None else c.bit_count() for r, c in zip(rules, count)]
+        hi = [r.max_count if r.max_count is not None else len(ALL_CARDS) for r in rules]
+        require = [_union(r.requires) for r in rules]
+        forbid = [_union(r.forbids) for r in rules]
+        kills = [sum(1 << index[k] for k in r.replaces if k in index) for r in rules]
+        # 1マスク用（Python の int のまま）
+        self._rows = tuple(zip(self.ids, count, lo, hi, require, forbid,
+                               (r.points for r in rules), (r.step for r in rules)))
+        self._kills = tuple(kills)
+        self.labels: Tuple[str, ...] = tuple(r.label or r.id for r in rules)
+        # 役ごとの表（配列。yaku_planner がまとめて使う）
+        self.count = np.array(count, dtype=MASK_DTYPE)
+        self.require = np.array(require, dtype=MASK_DTYPE)
+        self.forbid = np.array(forbid, dtype=MASK_DTYPE)
+        self.lo = np.array(lo, dtype=np.int64)
+        self.hi = np.array(hi, dtype=np.int64)
+        self.base = np.array([r.points for r in rules], dtype=np.int64)
+        self.step = np.array([r.step for r in rules], dtype=np.int64)
+        self.is_set = np.array([r.step == 0 and l == c.bit_count() for r, l, c in zip(rules, lo, count)])
+        # 配列用の手順: そろい役は (m & 札) == 札 だけ、枚数の役は同じ札マスクの popcount を使い回す
+        self._plan = []
+        for r, (yid, c, l, h, req, forb, base, step) in enumerate(self._rows):
+            is_set = step == 0 and l == c.bit_count() and h >= l
+            self._plan.append((
+                MASK_DTYPE(c),
+                is_set,
+                l if not is_set and l > 0 else None,                   # 下限（不要なら None）
+                h if not is_set and h < c.bit_count() else None,        # 上限（不要なら None）
+                MASK_DTYPE(req) if req else None,
+                MASK_DTYPE(forb) if forb else None,
+                base, step, l,
+            ))
+        # 役 j を無効にする役の番号
+        self._killers = tuple((j, tuple(r for r, k in enumerate(kills) if k >> j & 1))
+                              for j in range(len(rules)) if any(k >> j & 1 for k in kills))
+        self.hand = tuple((h.id, h.points, h.group, h.groups) for h in spec.hand)
+        # 役の判定に効くタグ（symmetry で月の入れ替えを判定するのに使う）
+        used = 0
+        for r in rules:
+            used |= _union(tuple(s for s in r.cards + r.requires + r.forbids if not s.startswith("kind=")))
+        self.tags: FrozenSet[str] = frozenset(c.tag for i, c in enumerate(ALL_CARDS) if used >> i & 1 and c.tag)
+
+    def evaluate_mask(self, mask: int) -> Dict[str, int]:
+        """取り札マスク → 成立した役と点（定義の順）"""
+        pts: Dict[str, int] = {}
+        fired = 0
+        for r, (yid, count, lo, hi, req, forb, base, step) in enumerate(self._rows):
+            n = (mask & count).bit_count()
+            if lo <= n <= hi and mask & req == req and not mask & forb:
+                pts[yid] = base + step * (n - lo)
+                fired |= self._kills[r]
+        if fired:
+            for r, yid in enumerate(self.ids):
+                if fired >> r & 1:
+                    pts.pop(yid, None)
+        return pts
+
+    def points_mask(self, mask: int) -> int:
+        return sum(self.evaluate_mask(mask).values())
+
+    def points_batch(self, masks) -> np.ndarray:
+        """取り札マスク配列（任意の形）→ 役点の配列（同じ形）"""
+        m = np.asarray(masks, dtype=MASK_DTYPE)
+        total = np.zeros(m.shape, dtype=np.int64)
+        counts: Dict[int, np.ndarray] = {}
+        oks: List[np.ndarray] = []
+        pts: Dict[int, np.ndarray] = {}
+        need_pts = {j for j, _ in self._killers}
+        for r, (c, is_set, lo, hi, req, forb, base, step, lo0) in enumerate(self._plan):
+            if is_set:
+                ok = (m & c) == c
+            else:
+                n = counts.get(int(c))
+                if n is None:
+                    n = counts[int(c)] = popcount(m & c)
+                ok = n >= lo if lo is not None else np.ones(m.shape, dtype=bool)
+                if hi is not None:
+                    ok &= n <= hi
+            if req is not None:
+                ok &= (m & req) == req
+            if forb is not None:
+                ok &= (m & forb) == 0
+            p = np.where(ok, base + step * (n - lo0), 0) if step else ok * base
+            total += p
+            oks.append(ok)
+            if r in need_pts:
+                pts[r] = p
+        for j, killers in self._killers:
+            killed = np.logical_or.reduce([oks[k] for k in killers])
+            total -= np.where(killed, pts[j], 0)
+        return total
+
+    def count_of(self, mask: int, yaku_id: str) -> int:
+        """役 yaku_id で数える札の枚数（進捗の表示用）"""
+        return (mask & self._rows[self.ids.index(yaku_id)][1]).bit_count()
+
+    def evaluate_hand(self, mask: int) -> Dict[str, int]:
+        """配られた手札（マスク）だけで成立する初期手役"""
+        if not mask or not self.hand:
+            return {}
+        per_month = [(mask & MONTH_MASK[m]).bit_count() for m in range(1, 13)]
+        return {hid: pts for hid, pts, group, groups in self.hand
+                if sum(n // group for n in per_month) >= groups}
+
+
+@lru_cache(maxsize=None)
+def compile_variant(name: str = "holo") -> CompiledVariant:
+    return CompiledVariant(VARIANT_RULES.get(name, VARIANT_RULES["standard"]))
+
+
+def variant_names() -> List[str]:
+    return list(VARIANT_RULES)
+
+
+# 組み込みのルールは読み込み時にコンパイルしておく（定義の誤りもここで分かる）
+for _name in VARIANT_RULES:
+    compile_variant(_name)
@@ -1,6 +1,7 @@
 from dataclasses import dataclass, field
 from typing import List, Dict
 from .cards import Card, parse_card
+from .profiling import timed
 
 @dataclass
 class GameState:
@@ -11,6 +12,7 @@ class GameState:
     config: Dict = field(default_factory=dict)
 
     @staticmethod
+    @timed("GameState.from_json")
     def from_json(data: dict) -> "GameState":
         def conv(lst): return [parse_card(x) if not isinstance(x, Card) else x for x in lst]
         return GameState(
@@ -20,3 +22,22 @@ class GameState:
             captured_opp=conv(data.get("captured_opp",[])),
             config=data.get("config",{})
         )
+
+    def to_json(self) -> dict:
+        """from_json の逆変換（トークン表記）"""
+        return {
+            "hand": [c.key() for c in self.hand],
+            "field": [c.key() for c in self.field],
+            "captured_self": [c.key() for c in self.captured_self],
+            "captured_opp": [c.key() for c in self.captured_opp],
+            "config": dict(self.config),
+        }
+
+    def key(self) -> tuple:
+        """局面の同一性判定用キー（各ゾーンの札をソートしたトークン列 + variant）"""
+        def zone(lst): return tuple(sorted(c.key() for c in lst))
+        return (
+            zone(self.hand), zone(self.field),
+            zone(self.captured_self), zone(self.captured_opp),
+            self.config.get("variant", "holo"),
+        )
@@ -0,0 +1,110 @@
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+from .cards import ALL_CARDS, CARD_SLOTS, Card, MONTH_MASK
+from .holo_roles import HOLO_ROLES
+from .rule_variants import compile_variant
+
+"""
+局面の対称性による正規化（解析キャッシュ・記録局面の表のキーを共有するため）
+
+- 同月のカス（同じ札の複数スロット）は区別しない → ゾーンの並び順に前のスロットから詰め直す
+- 役に関わらない月どうしは入れ替えても同じ局面 → 月の並べ替えで代表元を1つ選ぶ
+  * 月の札の構成（種類と「役に効くタグ」）が同じで、その月の札を名指しするホロ役が無いこと
+  * 役に効くタグは variant の役の定義（rule_variants）から取る
+  * 例: standard では 4月・5月、花見・月見なし（no-sake）ではさらに 1月・3月
+  * holo では全ての月にホロ役の札があり、月の入れ替えは無い（正規化はカスのスロットだけ）。
+    取り合わせは月で決まるので、役の札だけを固定して残りの札を別の月へ動かすこともできない
+- 配札は毎回違うので、別々の対局の局面が正規化で一致することはまず無い
+  （greedy どうしの自己対局 2598 局・24940 局面で、正規化で増えた一致は holo・standard とも 0 件）。
+  効くのは、同じ局面をカスのスロットの割り当てだけ変えて読み直すとき（画面の読み取り順など）
+
+canonicalize(masks) は 正規化後のマスク列 と 置換 perm（perm[i] = 元のビット i の移動先）を返す。
+置換は全ゾーン共通なので、同じ perm で他のマスク（ロック札など）や着手も写せる。
+"""
+
+
+Perm = Tuple[int, ...]
+IDENTITY: Perm = tuple(range(len(ALL_CARDS)))
+
+# 2スロット以上ある札（同月のカス）のスロット列
+_DUP_SLOTS: List[List[int]] = [s for s in CARD_SLOTS.values() if len(s) > 1]
+_MONTH_BASE = [0] + [(MONTH_MASK[m] & -MONTH_MASK[m]).bit_length() - 1 for m in range(1, 13)]
+
+
+def _month_signature(month: int, tags: frozenset) -> tuple:
+    """月の札の構成。役の判定に効くタグ（tags）以外は種類だけで区別する"""
+    return tuple((c.kind, c.tag if c.tag in tags else "") for c in ALL_CARDS if c.month == month)
+
+
+@lru_cache(maxsize=None)
+def symmetric_months(variant: str = "holo") -> Tuple[Tuple[int, ...], ...]:
+    """入れ替え可能な月の組（2か月以上の組だけ）。holo は全ての月をホロ役が名指しするので空"""
+    fixed = set()
+    if variant == "holo":
+        for r in HOLO_ROLES:
+            fixed.update(int(t.split(":", 1)[0]) for t in r.requires)
+    tags = compile_variant(variant).tags
+    groups: Dict[tuple, List[int]] = {}
+    for m in range(1, 13):
+        if m not in fixed:
+            groups.setdefault(_month_signature(m, tags), []).append(m)
+    return tuple(tuple(g) for g in groups.values() if len(g) > 1)
+
+
+def permute_mask(mask: int, perm: Perm) -> int:
+    out = 0
+    while mask:
+        low = mask & -mask
+        out |= 1 << perm[low.bit_length() - 1]
+        mask ^= low
+    return out
+
+
+def invert(perm: Perm) -> Perm:
+    inv = [0] * len(perm)
+    for i, j in enumerate(perm):
+        inv[j] = i
+    return tuple(inv)
+
+
+def permute_card(card: Card, perm: Perm) -> Card:
+    """札（スロットを区別しない Card）を perm で写す"""
+    return ALL_CARDS[perm[CARD_SLOTS[card.key()][0]]]
+
+
+def canonicalize(masks: Sequence[int], variant: str = "holo") -> Tuple[Tuple[int, ...], Perm]:
+    """
+    ゾーンのマスク列（互いに素）を正規化する。どのゾーンにも無い札は「残り」（山など）扱い。
+    同値な局面（カスのスロット違い・対称な月の入れ替え）は同じマスク列になる。
+    """
+    n = len(masks)
+
+    def zone(i: int) -> int:
+        for z in range(n):
+            if masks[z] >> i & 1:
+                return z
+        return n
+
+    perm = list(IDENTITY)
+    # 1) カスのスロット: ゾーン番号の小さい順に前のスロットへ
+    for slots in _DUP_SLOTS:
+        for new, old in zip(slots, sorted(slots, key=zone)):
+            perm[old] = new
+    masks = [permute_mask(m, tuple(perm)) for m in masks]
+
+    # 2) 対称な月: 月ごとの配置（月内の相対ビット）で並べ、小さい月から割り当てる
+    groups = symmetric_months(variant)
+    if groups:
+        mperm = list(IDENTITY)
+        for months in groups:
+            sig = {m: tuple(z >> _MONTH_BASE[m] & 0xF for z in masks) for m in months}
+            for dst, src in zip(months, sorted(months, key=lambda m: sig[m])):
+                off = _MONTH_BASE[dst] - _MONTH_BASE[src]
+                for i in range(_MONTH_BASE[src], _MONTH_BASE[src] + 4):
+                    mperm[i] = i + off
+        masks = [permute_mask(m, tuple(mperm)) for m in masks]
+        perm = [mperm[j] for j in perm]
+    return tuple(masks), tuple(perm)
+
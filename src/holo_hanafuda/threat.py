@@ -0,0 +1,73 @@
+from __future__ import annotations
+from math import comb
+from typing import List, Tuple
+
+import numpy as np
+
+from .cards import ALL_CARDS, CARD_SLOTS, FULL_MASK, MASK_DTYPE, Card, zone_masks
+from .holo_roles import HOLO_ROLE_VALUE, HOLO_ROLES, detect_holo_roles_batch
+from .koikoi_rules import yaku_points_batch
+
+"""
+相手の取りの危険度（札ごと, 48枚をまとめて計算）
+
+危険度[札] = P(相手がその月の札を持つ or 次にめくる) × 相手がその札を取ったときの役点の増加
+- 相手は見えていない札（相手手札 + 山）の中の同月札で取るとみなし、増加は相方の札の選び方で最大のもの
+- P は見えていない札から 相手手札の枚数 + 1（めくり）枚を引いて同月札が1枚以上ある確率（超幾何分布）
+- ホロ役は成立で HOLO_ROLE_VALUE を加算（koikoi_strategy と同じ換算）
+場札は今まさに狙われている札、手札は捨てた（場に出した）ときの危険度として使う。
+"""
+
+# 札 i と同じ月の4枚のビット位置
+_MONTH_SLOTS = np.array([[j for j, c in enumerate(ALL_CARDS) if c.month == a.month] for a in ALL_CARDS])
+_BITS = np.array([1 << i for i in range(len(ALL_CARDS))], dtype=MASK_DTYPE)
+_ROLE_VALUES = np.array([HOLO_ROLE_VALUE.get(r.id, 0) for r in HOLO_ROLES], dtype=np.float64)
+
+
+def capture_probability(unseen_in_month: np.ndarray, unseen: int, opp_hand: int) -> np.ndarray:
+    """見えていない unseen 枚から opp_hand + 1 枚引いて、同月札（unseen_in_month 枚）が1枚以上ある確率"""
+    k = min(unseen, opp_hand + 1)
+    if unseen <= 0 or k <= 0:
+        return np.zeros(np.shape(unseen_in_month))
+    table = np.array([1.0 - comb(unseen - u, k) / comb(unseen, k) if u <= unseen else 1.0 for u in range(5)])
+    return table[np.asarray(unseen_in_month)]
+
+
+def threat_map_masks(cap_opp: int, unseen: int, opp_hand: int, variant: str = "holo") -> np.ndarray:
+    """
+    全48枚の危険度 (48,)。cap_opp/unseen は札マスク。
+    （札が場にあるとして計算するので、場札以外は「場に出したら」の値）
+    """
+    partners = _BITS[_MONTH_SLOTS]                                   # (48, 4)
+    valid = ((np.uint64(unseen) & partners) != 0) & (_MONTH_SLOTS != np.arange(48)[:, None])
+    caps = np.uint64(cap_opp) | _BITS[:, None] | partners             # (48, 4)
+    base_pts = yaku_points_batch(np.array([cap_opp], dtype=MASK_DTYPE), variant)[0]
+    gain = (yaku_points_batch(caps, variant) - base_pts).astype(np.float64)
+    if variant == "holo":
+        before = detect_holo_roles_batch(np.array([cap_opp], dtype=MASK_DTYPE))[0]
+        gain += (detect_holo_roles_batch(caps) & ~before) @ _ROLE_VALUES
+    best = np.where(valid, gain, -np.inf).max(axis=1)
+    n_unseen = valid.sum(axis=1)
+    prob = capture_probability(n_unseen, int(unseen).bit_count(), opp_hand)
+    return np.where(n_unseen > 0, np.maximum(best, 0.0) * prob, 0.0)
+
+
+def threat_map(hand: List[Card], field: List[Card], captured_self: List[Card], captured_opp: List[Card],
+               *, variant: str = "holo", opp_hand: int | None = None) -> np.ndarray:
+    """GameState のゾーンから危険度 (48,)。opp_hand は相手の手札枚数（既定: 自分と同じ）"""
+    masks = zone_masks((hand, field, captured_self, captured_opp))
+    seen = masks[0] | masks[1] | masks[2] | masks[3]
+    return threat_map_masks(masks[3], FULL_MASK & ~seen, len(hand) if opp_hand is None else opp_hand, variant)
+
+
+def card_danger(danger: np.ndarray, card: Card) -> float:
+    """札（スロットを区別しない）の危険度"""
+    return float(danger[CARD_SLOTS[card.key()][0]])
+
+
+def top_threats(danger: np.ndarray, cards: List[Card], n: int = 5) -> List[Tuple[Card, float]]:
+    """cards のうち危険度が正のものを高い順に"""
+    res = [(c, card_danger(danger, c)) for c in dict.fromkeys(cards)]
+    res = [r for r in res if r[1] > 0]
+    res.sort(key=lambda r: r[1], reverse=True)
+    return res[:n]
@@ -1,19 +1,33 @@
 # src/holo_hanafuda/vision.py
 from __future__ import annotations
-from dataclasses import dataclass
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Tuple, Iterable
+from typing import Callable, Dict, List, Tuple, Iterable
+import threading
+import time
 import numpy as np
 import cv2
 import mss
 
-TEMPLATE_DIR = Path(__file__).resolve().parents[2] / "assets" / "templates"
+from .frame_ring import CaptureProcess, FrameRing, RingSpec
+from .profiling import timed
+
+try:
+    from scipy import fft as _fft
+    _FFT_KW = {"workers": -1}
+except ImportError:  # SciPy が無ければ NumPy の FFT（並列なし）
+    _fft = np.fft
+    _FFT_KW = {}
+
+TEMPLATE_DIR = Path(__file__).parent / "assets" / "templates"
 
 @dataclass
 class Detection:
     token: str
     score: float
     bbox: Tuple[int, int, int, int]  # x,y,w,h（scene内座標）
+    alternatives: Dict[str, float] = field(default_factory=dict)  # NMS で抑えた同じ位置の他テンプレ -> 最高スコア
 
 def _filename_to_token(p: Path) -> str:
     stem = p.stem  # e.g., "11_animal_swallow"
@@ -38,32 +52,227 @@ def load_templates(dirpath: Path | str = TEMPLATE_DIR) -> Dict[str, np.ndarray]:
         tmps[_filename_to_token(p)] = img
     return tmps
 
+@timed("grab_screen")
+def _grab(sct, region: Tuple[int,int,int,int] | None) -> np.ndarray:
+    mon = region if region else sct.monitors[1]
+    raw = sct.grab(mon)
+    img = np.array(raw)  # BGRA
+    return img[..., :3]  # BGR
+
+def union_region(regions: Iterable[Tuple[int,int,int,int]]) -> Tuple[int,int,int,int]:
+    """(left, top, w, h) の列を囲む最小の領域"""
+    regions = list(regions)
+    left = min(r[0] for r in regions)
+    top = min(r[1] for r in regions)
+    right = max(r[0] + r[2] for r in regions)
+    bottom = max(r[1] + r[3] for r in regions)
+    return left, top, right - left, bottom - top
+
 def grab_screen(region: Tuple[int,int,int,int] | None = None) -> np.ndarray:
     """region=(left, top, width, height) / None=プライマリ全体。返り値はBGR"""
     with mss.mss() as sct:
-        mon = region if region else sct.monitors[1]
-        raw = sct.grab(mon)
-        img = np.array(raw)  # BGRA
-        return img[..., :3]  # BGR
+        return _grab(sct, region)
+
+# ───────────────────────────────────────────────────────────
+# 色による前段の絞り込み（カスケード）
+# ───────────────────────────────────────────────────────────
+
+# 札は月ごとに色がはっきり違う（梅の赤・藤の紫・紅葉の橙…）。縮小した札の HSV ヒストグラムを
+# 「色の署名」として比べ、候補を上位 PREFILTER_TOP_K 枚に絞ってから相関をとる。
+# 白地・黒枠など彩度の低い画素の色相はノイズで大きく揺れるので、色相は有彩色の画素だけで数え、
+# 無彩色の画素は割合だけを1ビンにする。
+SIGNATURE_SIZE = (8, 12)    # 署名を取る前の縮小サイズ (w, h)。小さいほどノイズに強い
+SIGNATURE_BINS = (16, 2)    # 有彩色の画素の H × S のビン数
+SIGNATURE_CHROMA = (60, 50) # 有彩色とみなす (S, V) の下限
+PREFILTER_TOP_K = 4
+ROI_MARGIN = 0.15           # 札の枠の周りに足す余白（札の大きさ比。スケール違いのテンプレが収まるように）
+
+def color_signature(img_bgr: np.ndarray) -> np.ndarray:
+    """札画像の色の署名（有彩色の H×S ヒストグラム + 無彩色の割合, 和が1）。大きさに依存しない"""
+    small = cv2.resize(img_bgr, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    s_min, v_min = SIGNATURE_CHROMA
+    chroma = ((hsv[..., 1] >= s_min) & (hsv[..., 2] >= v_min)).astype(np.uint8)
+    hist = cv2.calcHist([hsv], [0, 1], chroma, list(SIGNATURE_BINS), [0, 180, s_min, 256]).ravel()
+    n = float(small.shape[0] * small.shape[1])
+    return np.append(hist, n - hist.sum()) / n
+
+def load_signatures(dirpath: Path | str = TEMPLATE_DIR) -> Dict[str, np.ndarray]:
+    """テンプレ画像（カラー）から色の署名を作る。キーは load_templates と同じ"""
+    dirpath = Path(dirpath)
+    sigs: Dict[str, np.ndarray] = {}
+    if not dirpath.exists():
+        return sigs
+    for p in sorted(dirpath.glob("*.png")):
+        img = cv2.imread(str(p), cv2.IMREAD_COLOR)
+        if img is None:
+            continue
+        sigs[_filename_to_token(p)] = color_signature(img)
+    return sigs
+
+def rank_by_color(region_bgr: np.ndarray, signatures: Dict[str, np.ndarray]) -> List[str]:
+    """領域の色に近い順のテンプレ名（ヒストグラムの共通部分が大きい順）"""
+    if not signatures:
+        return []
+    tokens = list(signatures)
+    sim = np.minimum(np.stack([signatures[t] for t in tokens]), color_signature(region_bgr)).sum(axis=1)
+    return [tokens[i] for i in np.argsort(-sim, kind="stable")]
+
+# ───────────────────────────────────────────────────────────
+# テンプレ照合
+# ───────────────────────────────────────────────────────────
+
+def _correlate(
+    scene_gray: np.ndarray,
+    scaled: Iterable[Tuple[str, np.ndarray]],
+    threshold: float,
+    offset: Tuple[int, int] = (0, 0),
+) -> List[Detection]:
+    """(テンプレ名, スケール済みテンプレ) の列を scene_gray と照合する。offset は scene_gray の位置"""
+    ox, oy = offset
+    dets: List[Detection] = []
+    for token, tpl in scaled:
+        h, w = tpl.shape[:2]
+        if h >= scene_gray.shape[0] or w >= scene_gray.shape[1]:
+            continue
+        res = cv2.matchTemplate(scene_gray, tpl, cv2.TM_CCOEFF_NORMED)
+        ys, xs = np.where(res >= threshold)
+        for (x, y) in zip(xs, ys):
+            dets.append(Detection(token=token, score=float(res[y, x]), bbox=(int(x) + ox, int(y) + oy, int(w), int(h))))
+    return dets
+
+# ── FFT バックエンド ──
+# 画面を1回だけ FFT し、テンプレのスペクトル（画面と同じパディング後の大きさ, 共役・平均0）を掛けて
+# FFT_BATCH 枚ずつまとめて逆変換する。分母（窓内の分散）は積分画像から求めるので結果は
+# TM_CCOEFF_NORMED と同じ値（浮動小数の誤差を除く）。スペクトルはテンプレとパディング後の大きさごとに
+# FFT_CACHE_BYTES まで保持し、同じ大きさの領域を繰り返し照合するとき（ライブ検出など）に使い回す。
+BACKENDS = ("opencv", "fft")
+FFT_BATCH = 8
+FFT_CACHE_BYTES = 256 << 20
+
+_spectra: "OrderedDict[Tuple[int, Tuple[int, int]], Tuple[np.ndarray, np.ndarray, float]]" = OrderedDict()
+_spectra_bytes = 0
+_spectra_lock = threading.Lock()
 
+def _fast_len(n: int) -> int:
+    """n 以上で素因数が 2,3,5 だけの最小の長さ"""
+    if _fft is not np.fft:
+        return _fft.next_fast_len(n, real=True)
+    m = n
+    while True:
+        k = m
+        for p in (2, 3, 5):
+            while k % p == 0:
+                k //= p
+        if k == 1:
+            return m
+        m += 1
+
+def _template_spectrum(tpl: np.ndarray, shape: Tuple[int, int]) -> Tuple[np.ndarray, float]:
+    """(平均0にしたテンプレの共役スペクトル, そのノルム)"""
+    global _spectra_bytes
+    key = (id(tpl), shape)
+    with _spectra_lock:
+        hit = _spectra.get(key)
+        if hit is not None and hit[0] is tpl:
+            _spectra.move_to_end(key)
+            return hit[1], hit[2]
+    t = tpl.astype(np.float32)
+    t -= t.mean()
+    spec = np.conj(_fft.rfft2(t, s=shape, **_FFT_KW))
+    norm = float(np.sqrt(np.sum(t.astype(np.float64) ** 2)))
+    with _spectra_lock:
+        old = _spectra.pop(key, None)
+        if old is not None:
+            _spectra_bytes -= old[1].nbytes
+        _spectra[key] = (tpl, spec, norm)
+        _spectra_bytes += spec.nbytes
+        while _spectra_bytes > FFT_CACHE_BYTES and len(_spectra) > 1:
+            _, (_, old_spec, _) = _spectra.popitem(last=False)
+            _spectra_bytes -= old_spec.nbytes
+    return spec, norm
+
+def _correlate_fft(
+    scene_gray: np.ndarray,
+    scaled: Iterable[Tuple[str, np.ndarray]],
+    threshold: float,
+    offset: Tuple[int, int] = (0, 0),
+) -> List[Detection]:
+    """_correlate と同じ結果を FFT でまとめて求める"""
+    ox, oy = offset
+    H, W = scene_gray.shape[:2]
+    pairs = [(token, tpl) for token, tpl in scaled if tpl.shape[0] < H and tpl.shape[1] < W]
+    if not pairs:
+        return []
+    shape = (_fast_len(H), _fast_len(W))
+    scene_spec = _fft.rfft2(scene_gray.astype(np.float32), s=shape, **_FFT_KW)
+    s1, s2 = cv2.integral2(scene_gray, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)  # 窓内の和・二乗和
+    window: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]] = {}
+
+    def window_std(h: int, w: int) -> Tuple[np.ndarray, np.ndarray]:
+        """テンプレの大きさごとの (窓内の画素値の標準偏差 × √画素数, それ × threshold)。平坦な窓は閾値を無限大に"""
+        if (h, w) not in window:
+            def box(ii):
+                return ii[h:, w:] - ii[:-h, w:] - ii[h:, :-w] + ii[:-h, :-w]
+            a, b = box(s1), box(s2)
+            std = np.sqrt(np.maximum(b - a * a / (h * w), 0.0)).astype(np.float32)
+            window[(h, w)] = std, np.where(std > 1e-3, std * np.float32(threshold), np.float32(np.inf))
+        return window[(h, w)]
+
+    dets: List[Detection] = []
+    for i in range(0, len(pairs), FFT_BATCH):
+        batch = pairs[i:i + FFT_BATCH]
+        specs = [_template_spectrum(tpl, shape) for _, tpl in batch]
+        corr = _fft.irfft2(np.stack([sp for sp, _ in specs]) * scene_spec, s=shape, axes=(-2, -1), **_FFT_KW)
+        for (token, tpl), (_, norm), c in zip(batch, specs, corr):
+            h, w = tpl.shape[:2]
+            std, thr = window_std(h, w)
+            num = c[:H - h + 1, :W - w + 1]
+            # 相関マップ全体を割らず、閾値を超えた位置だけスコアにする
+            ys, xs = np.nonzero(num >= thr * np.float32(norm))
+            for (x, y) in zip(xs, ys):
+                score = float(num[y, x]) / (float(std[y, x]) * norm)
+                dets.append(Detection(token=token, score=score, bbox=(int(x) + ox, int(y) + oy, int(w), int(h))))
+    return dets
+
+@timed("match_templates")
 def match_templates(
     scene_bgr: np.ndarray,
     templates: Dict[str, np.ndarray],
     threshold: float = 0.88,
-    scales: Iterable[float] = (1.0, 0.9, 1.1)
+    scales: Iterable[float] = (1.0, 0.9, 1.1),
+    *,
+    signatures: Dict[str, np.ndarray] | None = None,
+    top_k: int = PREFILTER_TOP_K,
+    backend: str = "opencv",
 ) -> List[Detection]:
+    """
+    テンプレ照合（TM_CCOEFF_NORMED）。
+    backend: "opencv"（テンプレごとに cv2.matchTemplate）/ "fft"（画面の FFT を全テンプレで共有）。
+    広い領域を多数のテンプレで走査するときは "fft" が速い。
+    signatures（load_signatures）を渡すとカスケードになる: 黒枠から札の矩形を見つけ、
+    矩形ごとに色の署名が近い上位 top_k 枚だけを、矩形の周りの小領域で照合する。
+    札の矩形が見つからないときは全テンプレ×画面全体の照合にフォールバックする。
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend} (choose from {', '.join(BACKENDS)})")
+    correlate = _correlate_fft if backend == "fft" else _correlate
     scene_gray = cv2.cvtColor(scene_bgr, cv2.COLOR_BGR2GRAY)
+    scaled = {s: rescale_templates(templates, s) for s in scales}
+    boxes = find_card_boxes(scene_gray) if signatures else []
     dets: List[Detection] = []
-    for token, tpl0 in templates.items():
-        for s in scales:
-            tpl = cv2.resize(tpl0, None, fx=s, fy=s, interpolation=cv2.INTER_AREA if s < 1.0 else cv2.INTER_CUBIC)
-            h, w = tpl.shape[:2]
-            if h >= scene_gray.shape[0] or w >= scene_gray.shape[1]:
-                continue
-            res = cv2.matchTemplate(scene_gray, tpl, cv2.TM_CCOEFF_NORMED)
-            ys, xs = np.where(res >= threshold)
-            for (x, y) in zip(xs, ys):
-                dets.append(Detection(token=token, score=float(res[y, x]), bbox=(int(x), int(y), int(w), int(h))))
+    if boxes:
+        unsigned = [t for t in templates if t not in signatures]
+        H, W = scene_gray.shape[:2]
+        for (x, y, w, h) in boxes:
+            cand = [t for t in rank_by_color(scene_bgr[y:y+h, x:x+w], signatures) if t in templates][:top_k]
+            mx, my = int(w * ROI_MARGIN) + 1, int(h * ROI_MARGIN) + 1
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(W, x + w + mx), min(H, y + h + my)
+            pairs = [(t, scaled[s][t]) for t in cand + unsigned for s in scaled]
+            dets += correlate(scene_gray[y0:y1, x0:x1], pairs, threshold, (x0, y0))
+    else:
+        dets = correlate(scene_gray, [(t, scaled[s][t]) for t in templates for s in scaled], threshold)
     # 簡易NMSで重複除去
     dets.sort(key=lambda d: d.score, reverse=True)
     kept: List[Detection] = []
@@ -76,6 +285,486 @@ def match_templates(
         union = aw*ah + bw*bh - inter + 1e-6
         return inter / union
     for d in dets:
-        if all(iou(d, k) < 0.3 for k in kept):
+        k = next((k for k in kept if iou(d, k) >= 0.3), None)
+        if k is None:
             kept.append(d)
+        elif d.token != k.token and d.score > k.alternatives.get(d.token, -1.0):
+            k.alternatives[d.token] = d.score  # 札の割り当て（card_assignment）で候補として使う
     return kept
+
+# ───────────────────────────────────────────────────────────
+# 札の枠検出・スケール推定（テンプレのキャリブレーション）
+# ───────────────────────────────────────────────────────────
+
+# 札の縦横比（幅/高さ）の許容範囲と、黒枠とみなす輝度
+CARD_ASPECT_RANGE = (0.45, 0.75)
+CARD_BORDER_DARK = 70
+
+def find_card_boxes(
+    img_bgr: np.ndarray,
+    *,
+    dark_thresh: int = CARD_BORDER_DARK,
+    min_height: int = 24,
+    aspect_range: Tuple[float, float] = CARD_ASPECT_RANGE,
+) -> List[Tuple[int, int, int, int]]:
+    """札の黒枠の外接矩形 (x, y, w, h) を輪郭から検出する。上→下、左→右の順で返す"""
+    gray = img_bgr if img_bgr.ndim == 2 else cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+    _, mask = cv2.threshold(gray, dark_thresh, 255, cv2.THRESH_BINARY_INV)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    lo, hi = aspect_range
+    boxes = []
+    for c in contours:
+        x, y, w, h = cv2.boundingRect(c)
+        if h >= min_height and lo <= w / h <= hi:
+            boxes.append((x, y, w, h))
+    if not boxes:
+        return boxes
+    # 行ごとにまとめてから左→右（同じ行の y は札高さの半分以内で揃う）
+    boxes.sort(key=lambda b: b[1])
+    rows: List[List[Tuple[int, int, int, int]]] = [[boxes[0]]]
+    for b in boxes[1:]:
+        if b[1] - rows[-1][0][1] < rows[-1][0][3] // 2:
+            rows[-1].append(b)
+        else:
+            rows.append([b])
+    return [b for row in rows for b in sorted(row)]
+
+def rescale_templates(templates: Dict[str, np.ndarray], scale: float) -> Dict[str, np.ndarray]:
+    if abs(scale - 1.0) < 1e-3:
+        return dict(templates)
+    interp = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+    return {k: cv2.resize(t, None, fx=scale, fy=scale, interpolation=interp) for k, t in templates.items()}
+
+CALIBRATE_MIN_SCORE = 0.7  # スケール推定を採用する一致度の下限（札の無い・隠れた領域の推定を捨てる）
+CALIBRATE_BOXES = 4        # 一致度を確かめる黒枠の数
+
+def estimate_scale_scored(
+    scene_bgr: np.ndarray,
+    templates: Dict[str, np.ndarray],
+    *,
+    search: Iterable[float] = tuple(np.round(np.arange(0.5, 1.55, 0.05), 2)),
+) -> Tuple[float | None, float]:
+    """
+    画面上の札の大きさ / テンプレの大きさ と、その一致度（TM_CCOEFF_NORMED, -1〜1）を推定する。
+    まず黒枠の矩形から札高さを測り（一致度 = 枠の中身といちばん似たテンプレのスコアの中央値）、
+    見つからなければ数枚のテンプレで粗いスケール探索を行う（一致度 = 最良のスコア）。
+    札の無い領域では一致度が低くなるので、呼び出し側で CALIBRATE_MIN_SCORE と比べて捨てる。
+    """
+    if not templates:
+        return None, -1.0
+    tpl_h = float(np.median([t.shape[0] for t in templates.values()]))
+    scene_gray = cv2.cvtColor(scene_bgr, cv2.COLOR_BGR2GRAY)
+    boxes = find_card_boxes(scene_gray)
+    if boxes:
+        scores = []
+        for x, y, w, h in sorted(boxes, key=lambda b: b[3], reverse=True)[:CALIBRATE_BOXES]:
+            crop = scene_gray[y:y + h, x:x + w]
+            scores.append(max(float(cv2.matchTemplate(crop, cv2.resize(t, (w, h)), cv2.TM_CCOEFF_NORMED)[0, 0])
+                              for t in templates.values()))
+        return float(np.median([b[3] for b in boxes])) / tpl_h, float(np.median(scores))
+
+    probe = list(templates.values())[:: max(1, len(templates) // 6)]
+    best_s, best_score = None, -1.0
+    for s in search:
+        score = -1.0
+        for t in probe:
+            tpl = cv2.resize(t, None, fx=s, fy=s, interpolation=cv2.INTER_AREA if s < 1.0 else cv2.INTER_CUBIC)
+            if tpl.shape[0] >= scene_gray.shape[0] or tpl.shape[1] >= scene_gray.shape[1]:
+                continue
+            score = max(score, float(cv2.matchTemplate(scene_gray, tpl, cv2.TM_CCOEFF_NORMED).max()))
+        if score > best_score:
+            best_s, best_score = float(s), score
+    return best_s, best_score
+
+def estimate_scale(scene_bgr: np.ndarray, templates: Dict[str, np.ndarray], **kw) -> float | None:
+    """画面上の札の大きさ / テンプレの大きさ（一致度を問わない。estimate_scale_scored を参照）"""
+    return estimate_scale_scored(scene_bgr, templates, **kw)[0]
+
+def calibrate_templates(
+    scene_bgr: np.ndarray,
+    templates: Dict[str, np.ndarray],
+) -> Tuple[float, Dict[str, np.ndarray]]:
+    """画面のスケールに合わせたテンプレを作る。以降は scales=(1.0,) の1スケール照合で済む"""
+    scale = estimate_scale(scene_bgr, templates) or 1.0
+    return scale, rescale_templates(templates, scale)
+
+# ───────────────────────────────────────────────────────────
+# ライブ検出の適応スケジューラ（CPU 予算・遅延の目標）
+# ───────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class QualityLevel:
+    scales: int    # LiveDetector.scales の先頭から使う数
+    pyramid: int   # 画面とテンプレを 1/2**pyramid に縮小して照合
+    top_k: int     # カスケードで照合する候補テンプレの数（有効なテンプレの部分集合）
+
+# 細かい順。処理が重ければ後ろへ、軽ければ前へ移る
+QUALITY_LEVELS = (
+    QualityLevel(scales=3, pyramid=0, top_k=PREFILTER_TOP_K),
+    QualityLevel(scales=1, pyramid=0, top_k=PREFILTER_TOP_K),
+    QualityLevel(scales=1, pyramid=0, top_k=2),
+    QualityLevel(scales=1, pyramid=1, top_k=2),
+    QualityLevel(scales=1, pyramid=1, top_k=1),
+)
+CHANGE_THUMB = (32, 18)   # 変化の判定に使う縮小サイズ (w, h)
+LEVEL_COOLDOWN = 3        # 段を切り替えた後、次に切り替えるまでに照合するフレーム数
+LEVEL_RETRY = 30.0        # 重すぎた段をもう一度試すまでの秒数
+RECALIBRATE_DROP = 0.08   # 較正後の検出スコアの基準からこれ以上下がった照合を「低い」とみなす
+RECALIBRATE_FRAMES = 5    # 低い照合がこの回数続いたらスケールを推定し直す
+
+@dataclass
+class ScheduleStats:
+    mode: str            # "burst"（変化の直後）/ "idle"
+    level: int           # QUALITY_LEVELS の番号
+    fps: float           # 実際のキャプチャ頻度
+    match_fps: float     # 照合した頻度（変化の無いフレームは照合しない）
+    cost_ms: float       # 照合したフレームの処理時間（EMA）
+    budget_use: float    # 使った CPU 時間 / 予算（1.0 = 予算どおり）
+    interval: float      # 次のキャプチャまでの間隔（秒）
+
+class FrameScheduler:
+    """
+    ライブ検出のキャプチャ間隔と照合の細かさを、処理時間と画面の変化から決める。
+    - 変化: ゾーンごとの縮小グレー画像の平均絶対差が change_threshold 以上。変化の無いゾーンは照合しない
+    - 間隔: 最後の変化から hold 秒は burst（max_fps）、以降は idle（idle_fps, 相手の演出中など）。
+      どちらも 処理時間 / cpu_budget より短くしない（cpu_budget = 1コアのうち使ってよい割合）
+    - 細かさ: 照合したフレームの処理時間（EMA）が latency_ms を超えたら QUALITY_LEVELS を1段粗く、
+      latency_ms * upgrade_ratio を下回れば1段細かくする（重すぎた段は LEVEL_RETRY 秒は戻さない）
+    検出スレッドから呼ぶ（stats() の結果は LiveFrame.schedule で GUI に渡る）
+    """
+    def __init__(
+        self,
+        *,
+        cpu_budget: float = 0.25,
+        latency_ms: float = 150.0,
+        max_fps: float = 10.0,
+        idle_fps: float = 1.0,
+        hold: float = 1.5,
+        change_threshold: float = 3.0,
+        upgrade_ratio: float = 0.4,
+        levels: Iterable[QualityLevel] = QUALITY_LEVELS,
+        window: float = 3.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.cpu_budget = cpu_budget
+        self.latency = latency_ms / 1000.0
+        self.max_fps = max_fps
+        self.idle_fps = idle_fps
+        self.hold = hold
+        self.change_threshold = change_threshold
+        self.upgrade_ratio = upgrade_ratio
+        self.levels = tuple(levels)
+        self.window = window
+        self._clock = clock
+        self.level_index = 0
+        self._thumbs: Dict[str, np.ndarray] = {}
+        self._last_change = -np.inf
+        self._cost: float | None = None          # 照合したフレームの処理秒（EMA, 段を切り替えたら測り直す）
+        self._pace_cost = 0.0                    # 間隔の計算に使う処理秒（切り替え直後は前の段の値）
+        self._since_switch = 0
+        self._warm = False
+        self._too_slow: Dict[int, float] = {}    # 段 -> 重すぎて離れた時刻
+        self._ticks: "deque[Tuple[float, float, bool]]" = deque()  # (時刻, 処理秒, 照合したか)
+
+    @property
+    def level(self) -> QualityLevel:
+        return self.levels[self.level_index]
+
+    @property
+    def mode(self) -> str:
+        return "burst" if self._clock() - self._last_change < self.hold else "idle"
+
+    def changed(self, zone: str, scene: np.ndarray) -> bool:
+        """ゾーンの画面が前回照合したときから変わったか（変わっていればその画面を覚える）"""
+        gray = scene if scene.ndim == 2 else cv2.cvtColor(scene, cv2.COLOR_BGR2GRAY)
+        thumb = cv2.resize(gray, CHANGE_THUMB, interpolation=cv2.INTER_AREA).astype(np.int16)
+        prev = self._thumbs.get(zone)
+        if prev is not None and float(np.abs(thumb - prev).mean()) < self.change_threshold:
+            return False
+        self._thumbs[zone] = thumb
+        self._last_change = self._clock()
+        return True
+
+    def forget(self) -> None:
+        """覚えている画面を捨てる（領域を変えたときなど。次のフレームは全ゾーンを照合する）"""
+        self._thumbs.clear()
+
+    def record(self, busy: float, matched: bool) -> None:
+        """1フレームの処理秒（キャプチャ込み）と、照合したかを記録して段を調整する"""
+        now = self._clock()
+        self._ticks.append((now, busy, matched))
+        while self._ticks and self._ticks[0][0] < now - self.window:
+            self._ticks.popleft()
+        if not matched:
+            return
+        if not self._warm:
+            self._warm = True  # 最初の照合はキャリブレーション込みなので数えない
+            return
+        self._cost = busy if self._cost is None else 0.7 * self._cost + 0.3 * busy
+        self._pace_cost = self._cost
+        self._since_switch += 1
+        if self._since_switch < LEVEL_COOLDOWN:
+            return
+        i = self.level_index
+        if self._cost > self.latency and i + 1 < len(self.levels):
+            self._too_slow[i] = now
+            self._switch(i + 1)
+        elif (self._cost < self.latency * self.upgrade_ratio and i > 0
+              and now - self._too_slow.get(i - 1, -np.inf) >= LEVEL_RETRY):
+            self._switch(i - 1)
+
+    def _switch(self, index: int) -> None:
+        self.level_index = index
+        self._cost = None
+        self._since_switch = 0
+
+    def next_interval(self) -> float:
+        base = 1.0 / (self.max_fps if self.mode == "burst" else self.idle_fps)
+        return max(base, self._pace_cost / self.cpu_budget)
+
+    def stats(self) -> ScheduleStats:
+        now = self._clock()
+        ticks = self._ticks
+        span = now - ticks[0][0] if len(ticks) > 1 else 0.0
+        busy = sum(t[1] for t in ticks)
+        # 区間 span に入るのは最初のフレームより後のもの
+        later = list(ticks)[1:]
+        return ScheduleStats(
+            mode=self.mode,
+            level=self.level_index,
+            fps=len(later) / span if span > 0 else 0.0,
+            match_fps=sum(1 for t in later if t[2]) / span if span > 0 else 0.0,
+            cost_ms=self._pace_cost * 1000.0,
+            budget_use=busy / (max(span, self.next_interval()) * self.cpu_budget),
+            interval=self.next_interval(),
+        )
+
+# ───────────────────────────────────────────────────────────
+# ライブ検出（バックグラウンドスレッド）
+# ───────────────────────────────────────────────────────────
+
+@dataclass
+class LiveFrame:
+    seq: int
+    zones: Dict[str, List[Detection]]  # zone名 -> 検出結果
+    timings: Dict[str, float]          # "capture" / "match"（ミリ秒）
+    schedule: ScheduleStats | None = None  # FrameScheduler を使っているときの状況
+
+    def tokens(self) -> Dict[str, List[str]]:
+        return {z: [d.token for d in dets] for z, dets in self.zones.items()}
+
+class LiveDetector:
+    """
+    ゾーンごとの画面領域を一定間隔でキャプチャ→テンプレ照合し、購読者へ LiveFrame を渡す。
+    regions: {"hand": (left, top, w, h), "field": ...}。全画面ではなく指定領域だけを照合する。
+    コールバックは検出スレッドから呼ばれるので、GUI 側はシグナル等でメインスレッドへ渡すこと。
+    calibrate=True のときは照合する全ゾーンで札のスケールを推定し、一致度がいちばん高い推定
+    （CALIBRATE_MIN_SCORE 以上のものだけ。札の無い・隠れたゾーンは使わない）でテンプレをリサンプルしてから
+    1 スケールのみで照合する。採用できる推定が無いうちは scales の複数スケールで照合し、次の照合で推定し直す。
+    検出のスコアが較正直後より RECALIBRATE_DROP 以上下がる（または何も検出しない）照合が RECALIBRATE_FRAMES 回
+    続いたら推定し直す（ウィンドウの大きさが変わったときなど。推定を採用できなければ今のテンプレのまま）。
+    signatures（色の署名）があれば match_templates のカスケードで候補を絞る（既定: TEMPLATE_DIR から作成）。
+    backend="fft" は領域の大きさが毎回同じなのでテンプレのスペクトルを使い回せる。
+    capture_process=True のときはキャプチャを子プロセス（frame_ring.CaptureProcess）で行い、
+    全ゾーンを囲む領域のフレームを共有メモリのリングから読む（フレームのコピー・pickle なし）。
+    実行中は ring_spec から他のプロセスも同じフレームを FrameRing.attach で読める。
+    scheduler（FrameScheduler）を渡すと interval の代わりにスケジューラが間隔と照合の細かさを決め、
+    画面が変わっていないゾーンは照合せずに前回の検出結果を返す。
+    """
+    def __init__(
+        self,
+        regions: Dict[str, Tuple[int,int,int,int]],
+        templates: Dict[str, np.ndarray] | None = None,
+        *,
+        interval: float = 0.5,
+        threshold: float = 0.88,
+        scales: Iterable[float] = (1.0, 0.9, 1.1),
+        calibrate: bool = True,
+        signatures: Dict[str, np.ndarray] | None = None,
+        backend: str = "opencv",
+        capture_process: bool = False,
+        scheduler: FrameScheduler | None = None,
+    ):
+        self.regions = dict(regions)
+        self.templates = templates if templates is not None else load_templates()
+        self.signatures = signatures if signatures is not None else load_signatures()
+        self.backend = backend
+        self.capture_process = capture_process
+        self.ring_spec: RingSpec | None = None  # capture_process のとき、実行中のリング
+        self.interval = interval
+        self.threshold = threshold
+        self.scales = tuple(scales)
+        self.calibrate = calibrate
+        self.scale: float | None = None  # キャリブレーション済みのスケール
+        self._base = (self.templates, self.scales)  # 較正前のテンプレとスケール（較正し直すときの元）
+        self._score_ref: float | None = None  # 較正後の検出スコアの基準（EMA）
+        self._low_frames = 0  # スコアが基準より下がった照合の連続回数
+        self.scheduler = scheduler
+        self._pyramid: Dict[int, Dict[str, np.ndarray]] = {}  # 縮小段 -> 縮小したテンプレ
+        self._last_zones: Dict[str, List[Detection]] = {}
+        self._matched = False  # 直前のフレームで照合したか（scheduler に渡す）
+        self._subscribers: List[Callable[[LiveFrame], None]] = []
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def subscribe(self, callback: Callable[[LiveFrame], None]) -> None:
+        self._subscribers.append(callback)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="LiveDetector", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _templates_at(self, pyramid: int) -> Dict[str, np.ndarray]:
+        if pyramid == 0:
+            return self.templates
+        if pyramid not in self._pyramid:
+            self._pyramid[pyramid] = rescale_templates(self.templates, 0.5 ** pyramid)
+        return self._pyramid[pyramid]
+
+    def _calibrate(self, scenes: Iterable[np.ndarray]) -> None:
+        """ゾーンごとにスケールを推定し、一致度のいちばん高いものを採用する（基準に届かなければ何もしない）"""
+        base, _ = self._base
+        scale, score = max((estimate_scale_scored(s, base) for s in scenes if s.size),
+                           key=lambda r: r[1], default=(None, -1.0))
+        self._low_frames = 0
+        if scale is None or score < CALIBRATE_MIN_SCORE:
+            return
+        if self.scale is None or abs(scale / self.scale - 1.0) > 0.02:
+            self.scale, self.templates = scale, rescale_templates(base, scale)
+            self.scales = (1.0,)
+            self._pyramid.clear()
+        self._score_ref = None
+
+    def _track_scores(self, zones: Iterable[List[Detection]]) -> None:
+        """照合したゾーンの検出スコアを基準と比べ、下がり続けたら次の照合で較正し直す"""
+        scores = [d.score for dets in zones for d in dets]
+        mean = float(np.mean(scores)) if scores else None
+        if mean is not None and (self._score_ref is None or mean >= self._score_ref - RECALIBRATE_DROP):
+            self._score_ref = mean if self._score_ref is None else 0.9 * self._score_ref + 0.1 * mean
+            self._low_frames = 0
+        else:
+            self._low_frames += 1
+
+    def _match_zone(self, scene: np.ndarray, level: QualityLevel | None = None) -> List[Detection]:
+        if level is None:
+            return match_templates(scene, self.templates, threshold=self.threshold, scales=self.scales,
+                                   signatures=self.signatures, backend=self.backend)
+        for _ in range(level.pyramid):
+            scene = cv2.pyrDown(scene)
+        dets = match_templates(scene, self._templates_at(level.pyramid), threshold=self.threshold,
+                               scales=self.scales[:level.scales], signatures=self.signatures,
+                               top_k=level.top_k, backend=self.backend)
+        f = 1 << level.pyramid
+        if f > 1:
+            for d in dets:
+                d.bbox = tuple(v * f for v in d.bbox)
+        return dets
+
+    def _detect_zones(self, scenes: Dict[str, np.ndarray]) -> Tuple[Dict[str, List[Detection]], bool]:
+        """ゾーンごとに照合する。scheduler があれば変わったゾーンだけ（返り値の2つ目 = 照合したか）"""
+        if self.scheduler is None:
+            todo = dict(scenes)
+        else:
+            todo = {zone: scene for zone, scene in scenes.items()
+                    if self.scheduler.changed(zone, scene) or zone not in self._last_zones}
+        if self.calibrate and todo and (self.scale is None or self._low_frames >= RECALIBRATE_FRAMES):
+            self._calibrate(todo.values())
+        level = None if self.scheduler is None else self.scheduler.level
+        matched = {zone: self._match_zone(scene, level) for zone, scene in todo.items()}
+        if self.calibrate and self.scale is not None and matched:
+            self._track_scores(matched.values())
+        if self.scheduler is None:
+            return matched, True
+        zones = {zone: matched[zone] if zone in matched else self._last_zones[zone] for zone in scenes}
+        self._last_zones = zones
+        return zones, bool(matched)
+
+    def detect_once(self, sct) -> LiveFrame:
+        t0 = time.perf_counter()
+        scenes = {zone: _grab(sct, region) for zone, region in self.regions.items()}
+        t1 = time.perf_counter()
+        zones, self._matched = self._detect_zones(scenes)
+        t2 = time.perf_counter()
+        return LiveFrame(seq=0, zones=zones, timings={"capture": (t1 - t0) * 1000.0, "match": (t2 - t1) * 1000.0})
+
+    def detect_ring(self, ring: FrameRing, origin: Tuple[int, int] = (0, 0)) -> LiveFrame | None:
+        """
+        リングの最新フレーム（画面上の位置 origin = (left, top)）から各ゾーンを切り出して照合する。
+        切り出しはビューなのでコピーしない。照合中に上書きされたら最新のフレームで1回だけやり直す。
+        """
+        ox, oy = origin
+        for _ in range(2):
+            hit = ring.latest()
+            if hit is None:
+                return None
+            seq, frame = hit
+            t0 = time.perf_counter()
+            zones, self._matched = self._detect_zones({zone: frame[top - oy:top - oy + h, left - ox:left - ox + w]
+                                           for zone, (left, top, w, h) in self.regions.items()})
+            if ring.valid(seq):
+                return LiveFrame(seq=seq, zones=zones,
+                                 timings={"capture": 0.0, "match": (time.perf_counter() - t0) * 1000.0})
+            if self.scheduler is not None:
+                self.scheduler.forget()  # 上書きされたフレームの画面は覚えない
+        return None
+
+    def _publish(self, frame: LiveFrame, busy: float) -> float:
+        """購読者へ渡し、次のフレームまでの間隔を返す"""
+        if self.scheduler is not None:
+            self.scheduler.record(busy, self._matched)
+            frame.schedule = self.scheduler.stats()
+        for cb in list(self._subscribers):
+            cb(frame)
+        return self.scheduler.next_interval() if self.scheduler is not None else self.interval
+
+    def _run(self) -> None:
+        if self.capture_process:
+            self._run_ring()
+            return
+        seq = 0
+        # mss のインスタンスはスレッドに紐づくため、検出スレッド内で1回だけ生成して使い回す
+        with mss.mss() as sct:
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                frame = self.detect_once(sct)
+                seq += 1
+                frame.seq = seq
+                interval = self._publish(frame, time.perf_counter() - started)
+                self._stop.wait(max(0.0, interval - (time.perf_counter() - started)))
+
+    def _run_ring(self) -> None:
+        """
+        キャプチャは子プロセスに任せ、共有メモリのリングから新しいフレームだけを照合する。
+        scheduler があればキャプチャ側の頻度もその間隔に合わせる
+        """
+        region = union_region(self.regions.values())
+        with CaptureProcess(region, fps=1.0 / self.interval) as cap:
+            self.ring_spec = cap.spec
+            last = 0
+            while not self._stop.is_set():
+                if cap.ring.wait(last, timeout=max(self.interval, 1.0 / cap.fps)) is None:
+                    if not cap.running:
+                        break  # キャプチャ側が落ちた
+                    continue
+                started = time.perf_counter()
+                frame = self.detect_ring(cap.ring, region[:2])
+                if frame is None:
+                    continue
+                last = frame.seq
+                interval = self._publish(frame, time.perf_counter() - started)
+                if self.scheduler is not None:
+                    cap.set_fps(1.0 / interval)
+            self.ring_spec = None
@@ -0,0 +1,193 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .cards import ALL_CARDS, FULL_MASK, MASK_DTYPE, MONTH_MASK, Card, mask_to_cards, popcount, zone_masks
+from .rule_variants import compile_variant
+from .threat import capture_probability
+
+"""
+役の狙い筋（variant の全ての役について、足りない札・その場所・完成までの手番・確率・期待点）
+
+- 札の場所: 手札 / 場 / 見えていない（相手手札 + 山）/ 相手の取り札（= もう取れない, dead）
+- 取りやすさ: 今すぐ手札で取れる札（手札とその月の場札の組, play）と、めくりを待つ札（draw）に分ける
+  1手番 = 手札1枚 + めくり1枚 なので、完成までの最少手番 ≈ max(play の数, draw の数)（同月の組の相乗りは無視）
+- 札ごとの取れる確率 q: play は 1、見えていない札は 残り手番 / 見えていない枚数（自分がめくる）、
+  場・手札で同月札を待つ札は 残り手番分のめくりで同月札が出る確率（threat.capture_probability）
+  そろい役は q の積、枚数の役は候補の札から必要枚数以上取れる確率（ポアソン二項分布）
+- 期待点 = 確率 × （完成したときの役点 - 今の役点）。成立済みの枚数の役は「あと1枚で +step」を狙い筋にする
+- 役の表（rule_variants のコンパイル結果）に沿って全ての役を NumPy でまとめて計算するので、毎フレーム呼べる
+  （ホロ役は対象外）
+"""
+
+_BITS = np.array([1 << i for i in range(len(ALL_CARDS))], dtype=MASK_DTYPE)
+_MONTHS = np.array([c.month for c in ALL_CARDS])
+LOCATIONS = ("hand", "field", "unseen", "dead")
+BIG_YAKU_POINTS = 5   # big_yaku_progress で「大役」とみなす基本点
+
+
+@dataclass
+class YakuPlan:
+    yaku: str
+    label: str
+    gain: int                   # 完成したときの役点の増加
+    need: int                   # あと何枚
+    turns: int                  # 完成までの最少手番（目安）
+    probability: float
+    expected: float             # probability × gain
+    feasible: bool              # この局のうちに完成しうるか
+    missing: Dict[str, List[Card]] = field(default_factory=dict)  # 場所 -> 足りない札（枚数の役は候補の札）
+
+    def to_json(self) -> dict:
+        return {
+            "yaku": self.yaku, "label": self.label, "gain": self.gain, "need": self.need, "turns": self.turns,
+            "probability": round(self.probability, 4), "expected": round(self.expected, 4),
+            "feasible": self.feasible, "missing": {k: [c.key() for c in v] for k, v in self.missing.items()},
+        }
+
+    @staticmethod
+    def from_json(data: dict) -> "YakuPlan":
+        from .cards import parse_card
+        return YakuPlan(**{**data, "missing": {k: [parse_card(t) for t in v] for k, v in data["missing"].items()}})
+
+    def format(self) -> str:
+        where = {"hand": "手札", "field": "場", "unseen": "山・相手手札", "dead": "相手の取り札"}
+        locs = " / ".join(f"{where[k]}: {' '.join(c.key() for c in v)}" for k, v in self.missing.items() if v)
+        if not self.feasible:
+            return f"{self.label} あと{self.need}枚（不可）  {locs}"
+        return (f"{self.label} あと{self.need}枚 +{self.gain}点  最短{self.turns}手  {self.probability:.0%}"
+                f"  期待 +{self.expected:.2f}  {locs}")
+
+
+def _months_of(mask: int) -> int:
+    """mask に札がある月の4枚ずつ"""
+    out = 0
+    for m in range(1, 13):
+        if mask & MONTH_MASK[m]:
+            out |= MONTH_MASK[m]
+    return out
+
+
+def _bit_matrix(masks: np.ndarray) -> np.ndarray:
+    """(R,) のマスク → (R, 48) の bool"""
+    return (masks[:, None] & _BITS[None, :]) != 0
+
+
+def card_odds(hand: int, field: int, own: int, dead: int, turns_left: int) -> Tuple[int, np.ndarray]:
+    """
+    (今の手番で取れる札のマスク, 札ごとの取れる確率 q (48,))。
+    own は自分の取り札（q=1）、dead は相手の取り札（q=0）
+    """
+    unseen = FULL_MASK & ~(hand | field | own | dead)
+    playable = (hand & _months_of(field)) | (field & _months_of(hand))
+    n_unseen = unseen.bit_count()
+    unseen_bits = _bit_matrix(np.array([unseen], dtype=MASK_DTYPE))[0]
+    unseen_in_month = np.bincount(_MONTHS[unseen_bits], minlength=13)[_MONTHS]
+    q = np.zeros(len(ALL_CARDS))
+    if turns_left > 0 and n_unseen:
+        q[unseen_bits] = min(1.0, turns_left / n_unseen)
+        waiting = _bit_matrix(np.array([(hand | field) & ~playable], dtype=MASK_DTYPE))[0]
+        q[waiting] = capture_probability(unseen_in_month[waiting], n_unseen, turns_left - 1)
+    q[_bit_matrix(np.array([playable | own], dtype=MASK_DTYPE))[0]] = 1.0
+    return playable, q
+
+
+def _at_least(probs: np.ndarray, members: np.ndarray, k: np.ndarray) -> np.ndarray:
+    """役ごとに members の札（q = probs）から k 枚以上取れる確率。members (R, 48), k (R,)"""
+    R = len(k)
+    dp = np.zeros((R, len(ALL_CARDS) + 1))
+    dp[:, 0] = 1.0
+    for j in np.nonzero(members.any(axis=0))[0]:
+        p = np.where(members[:, j], probs[j], 0.0)[:, None]
+        dp[:, 1:] = dp[:, 1:] * (1 - p) + dp[:, :-1] * p
+        dp[:, 0] *= 1 - p[:, 0]
+    tail = np.cumsum(dp[:, ::-1], axis=1)[:, ::-1]   # tail[:, i] = P(i 枚以上)
+    return tail[np.arange(R), np.clip(k, 0, len(ALL_CARDS))]
+
+
+def plan_masks(hand: int, field: int, own: int, dead: int, *, variant: str = "holo") -> List[YakuPlan]:
+    """札マスクから全ての役の狙い筋（期待点の高い順, 完成しえないものは最後）"""
+    rules = compile_variant(variant)
+    R = len(rules.ids)
+    turns_left = hand.bit_count()
+    playable, q = card_odds(hand, field, own, dead, turns_left)
+    own_u, dead_u, play_u = MASK_DTYPE(own), MASK_DTYPE(dead), MASK_DTYPE(playable)
+    unseen_u = MASK_DTYPE(FULL_MASK & ~(hand | field | own | dead))
+
+    n = popcount(own_u & rules.count)
+    done = (n >= rules.lo) & (n <= rules.hi)
+    # 狙う枚数: 未成立なら下限まで、成立済みの枚数の役は +1 枚
+    k = np.where(done, np.where(rules.is_set, 0, 1), np.maximum(rules.lo - n, 0))
+    forced = (rules.require & ~own_u) | np.where(rules.is_set, rules.count & ~own_u, MASK_DTYPE(0))
+    k_rest = np.maximum(k - popcount(forced & rules.count), 0)
+    pool = np.where(rules.is_set, MASK_DTYPE(0), rules.count & ~own_u & ~rules.forbid & ~forced)
+    live_pool = pool & ~dead_u
+
+    # 最少手番: 必須の札は play / draw に分かれ、残りは候補から手番が少なくなるように選ぶ
+    p = popcount(forced & play_u)
+    d = popcount(forced & ~play_u)
+    pp = popcount(live_pool & play_u)
+    dd = popcount(live_pool & ~play_u)
+    x = np.clip((k_rest + d - p + 1) // 2, np.maximum(k_rest - dd, 0), np.minimum(pp, k_rest))
+    turns = np.maximum(p + x, d + k_rest - x)
+
+    feasible = ((own_u & rules.forbid) == 0) & (n + k <= rules.hi) & ((forced & dead_u) == 0) \
+        & (pp + dd >= k_rest) & (turns <= turns_left) & (k > 0)
+
+    # 確率: 必須の札は q の積、候補からは k_rest 枚以上
+    forced_bits = _bit_matrix(forced)
+    prob = np.where(forced_bits, q[None, :], 1.0).prod(axis=1)
+    pool_bits = _bit_matrix(live_pool)
+    prob *= _at_least(q, pool_bits, k_rest)
+    prob = np.where(feasible, prob, 0.0)
+
+    # 完成したときの役点の増加（候補は取りやすい順に k_rest 枚）
+    order = np.argsort(-np.where(pool_bits, q[None, :], -1.0), axis=1, kind="stable")
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(len(ALL_CARDS))[None, :].repeat(R, axis=0), axis=1)
+    chosen = pool_bits & (rank < k_rest[:, None])
+    completed = own_u | forced | np.bitwise_or.reduce(np.where(chosen, _BITS[None, :], MASK_DTYPE(0)), axis=1)
+    gain = rules.points_batch(completed) - rules.points_mask(own)
+
+    loc_masks = {"hand": MASK_DTYPE(hand), "field": MASK_DTYPE(field), "unseen": unseen_u, "dead": dead_u}
+    plans: List[YakuPlan] = []
+    for r in range(R):
+        if k[r] == 0 or gain[r] <= 0:
+            continue  # 成立済みのそろい役 / 狙っても点が増えない（上位の役が成立済みなど）
+        wanted = int(forced[r] | pool[r])
+        plans.append(YakuPlan(
+            yaku=rules.ids[r], label=rules.labels[r], gain=int(gain[r]), need=int(k[r]),
+            turns=int(turns[r]), probability=float(prob[r]), expected=float(prob[r] * gain[r]),
+            feasible=bool(feasible[r]),
+            missing={loc: mask_to_cards(wanted & int(m)) for loc, m in loc_masks.items() if wanted & int(m)},
+        ))
+    plans.sort(key=lambda pl: (not pl.feasible, -pl.expected, pl.turns))
+    return plans
+
+
+def big_yaku_progress(caps: Sequence[int], dead: int, *, variant: str = "holo",
+                      min_points: int = BIG_YAKU_POINTS) -> np.ndarray:
+    """
+    取り札マスクごとの大役（基本点 min_points 以上）への近さ（点単位）:
+    役ごとの 基本点 × 取った割合 の最大。相手の取り札（dead）のせいで完成しえない役・不成立の札を取った役は除く
+    """
+    rules = compile_variant(variant)
+    dead_u = MASK_DTYPE(dead)
+    live = (rules.base >= min_points) & ((rules.require & dead_u) == 0) \
+        & (popcount(rules.count & ~dead_u) >= rules.lo)
+    caps = np.asarray(caps, dtype=MASK_DTYPE)
+    if not live.any():
+        return np.zeros(len(caps))
+    n = popcount(caps[:, None] & rules.count[live][None, :])
+    frac = np.minimum(n / np.maximum(rules.lo[live], 1), 1.0)
+    frac = np.where((caps[:, None] & rules.forbid[live][None, :]) != 0, 0.0, frac)
+    return (frac * rules.base[live]).max(axis=1)
+
+
+def plan_yaku(hand: List[Card], field: List[Card], captured_self: List[Card], captured_opp: List[Card],
+              *, variant: str = "holo") -> List[YakuPlan]:
+    """GameState のゾーンから狙い筋（plan_masks）"""
+    masks = zone_masks((hand, field, captured_self, captured_opp))
+    return plan_masks(*masks, variant=variant)
@@ -0,0 +1,41 @@
+"""評価器の学習データ（evaluator.log_examples）: 着手直後の局面がエンジンで札を出した結果と一致すること"""
+import random
+
+import numpy as np
+
+from holo_hanafuda.arena import RandomStrategy, play_game
+from holo_hanafuda.evaluator import _after_play, log_examples
+from holo_hanafuda.koikoi_engine import _take, deal, legal_plays, play_turn, snapshot, undo
+
+
+def test_after_play_matches_the_engine():
+    checked = 0
+    for seed in range(40):
+        pos = deal(seed)
+        rng = random.Random(seed)
+        while not pos.over:
+            p = pos.turn
+            card, target = rng.choice(legal_plays(pos, p))
+            got = [int(x[0]) for x in _after_play([pos.hands[p]], [pos.field], [pos.captured[p]], [card], [target])]
+            rec = snapshot(pos)
+            pos.hands[p] &= ~(1 << card)
+            _take(pos, p, card, target)
+            if pos.lock_mask == 0:   # ロックはログに無い
+                assert got == [pos.hands[p], pos.field, pos.captured[p]]
+                checked += 1
+            undo(pos, rec)
+            play_turn(pos, card, target)
+    assert checked > 300
+
+
+def test_log_examples_are_post_play_positions():
+    rows = np.concatenate([play_game(RandomStrategy(s), RandomStrategy(s + 1), s, record=True).rows
+                           for s in range(5)])
+    hand, field, cap_self, cap_opp, y = log_examples(rows)
+    played = rows[rows["play"] >= 0]
+    assert len(y) == len(played)
+    before = np.where(played["turn"] == 1, played["hand1"], played["hand0"])
+    # 出した札は手札から消え、場か自分の取り札に移る
+    bit = np.uint64(1) << played["play"].astype(np.uint64)
+    assert ((hand & bit) == 0).all() and (hand | bit == before).all()
+    assert (((field | cap_self) & bit) != 0).all()
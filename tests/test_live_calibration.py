@@ -0,0 +1,43 @@
+"""LiveDetector のスケール較正: 札の見えるゾーンで推定し、札の無いゾーンの推定は捨て、スコアが落ちたら較正し直す"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+vision = pytest.importorskip("holo_hanafuda.vision")
+
+GRID = Path(vision.__file__).parent / "assets" / "source" / "holo_cards_grid.png"
+
+
+def scenes(scale: float):
+    src = cv2.imread(str(GRID))[:, :420]   # 先頭の数列だけ（照合を軽くする）
+    cards = cv2.resize(src, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC)
+    # 空のゾーン（配る前・演出で隠れているなど）を先に渡す
+    return {"hand": np.full((200, 400, 3), 40, np.uint8), "field": cards}
+
+
+@pytest.fixture
+def detector():
+    if not GRID.exists():
+        pytest.skip("assets/source/holo_cards_grid.png がありません")
+    return vision.LiveDetector({"hand": (0, 0, 400, 200), "field": (0, 400, 400, 200)})
+
+
+def test_empty_zone_does_not_fix_the_scale(detector):
+    blank = scenes(1.0)["hand"]
+    assert vision.estimate_scale_scored(blank, detector.templates)[1] < vision.CALIBRATE_MIN_SCORE
+    detector._detect_zones({"hand": blank})
+    assert detector.scale is None and len(detector.scales) > 1
+
+
+def test_calibrates_on_the_zone_with_cards_and_recalibrates(detector):
+    zones, _ = detector._detect_zones(scenes(1.25))
+    assert detector.scale == pytest.approx(1.25, rel=0.03)
+    assert zones["field"]
+    # ウィンドウが小さくなった: 検出が落ち続けたら推定し直す
+    for _ in range(vision.RECALIBRATE_FRAMES):
+        detector._detect_zones(scenes(0.8))
+    zones, _ = detector._detect_zones(scenes(0.8))
+    assert detector.scale == pytest.approx(0.8, rel=0.03)
+    assert zones["field"]
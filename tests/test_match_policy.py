@@ -0,0 +1,42 @@
+"""試合の方針: 推定の誤差の範囲では既定の方針から切り替えないこと、役ができない手番では こいこい を助言しないこと"""
+import numpy as np
+
+from holo_hanafuda.analysis import analyze
+from holo_hanafuda.cards import parse_card
+from holo_hanafuda.match_policy import MAX_ROUND_POINTS, PROFILES, MatchPolicy
+from holo_hanafuda.state import GameState
+
+
+def cards(text: str):
+    return [parse_card(t) for t in text.split()]
+
+
+def sampled_counts(games: int, seed: int = 0) -> np.ndarray:
+    # 全ての方針が同じ分布（±1〜6点と流局）から games 局ずつ: 差はサンプルの揺らぎだけ
+    rng = np.random.default_rng(seed)
+    pts = np.array([-6, -3, -1, 0, 1, 3, 6])
+    p = np.array([0.08, 0.12, 0.2, 0.2, 0.2, 0.12, 0.08])
+    counts = np.zeros((len(PROFILES), 2, 2 * MAX_ROUND_POINTS + 1), dtype=np.int64)
+    for i in range(len(PROFILES)):
+        for seat in (0, 1):
+            np.add.at(counts[i, seat], rng.choice(pts, size=games, p=p) + MAX_ROUND_POINTS, 1)
+    return counts
+
+
+def test_noise_does_not_switch_profile():
+    counts = sampled_counts(1500)
+    assert (MatchPolicy.build(counts, z=0.0).best[1:] != 0).any()   # 差だけで選ぶと揺らぎで切り替わる
+    policy = MatchPolicy.build(counts)
+    assert (policy.best[1:] != 0).mean() < 0.01
+    assert (policy.games() == 1500).all()
+
+
+def test_koikoi_advice_only_when_a_yaku_can_form():
+    config = {"variant": "holo", "risk": "normal"}
+    none = analyze(GameState(hand=cards("1:kasu 2:kasu"), field=cards("5:kasu 6:kasu"), config=config))
+    assert none.koikoi is None
+    # 9枚のカスを取っていて、3月のカスを合わせればカスが成立する
+    kasu = cards("1:kasu 1:kasu 2:kasu 2:kasu 4:kasu 4:kasu 5:kasu 6:kasu 7:kasu")
+    formed = analyze(GameState(hand=cards("3:kasu 8:ribbon-plain"), field=cards("3:kasu 10:kasu"),
+                               captured_self=kasu, config=config))
+    assert formed.koikoi is not None
@@ -0,0 +1,41 @@
+"""ホロ役の効果の価値（koikoi_strategy.role_effect_value）: 明らかに得な効果が負にならないこと"""
+import random
+
+import pytest
+
+from holo_hanafuda.cards import FULL_MASK, cards_to_mask, parse_card
+from holo_hanafuda.holo_roles import HOLO_ROLES
+from holo_hanafuda.koikoi_engine import bits
+from holo_hanafuda.koikoi_strategy import ROLE_TOLERANCE, role_effect_value
+
+ROLE_BY_ID = {r.id: r for r in HOLO_ROLES}
+
+
+def positions(role_id: str, n: int = 12):
+    """役の札を取った直後の局面 (手札5, 場札6, 取り札 = 役の札 + 2, 相手の取り札4)"""
+    need = cards_to_mask([parse_card(t) for t in ROLE_BY_ID[role_id].requires])
+    for seed in range(n):
+        rest = list(bits(FULL_MASK & ~need))
+        random.Random(seed).shuffle(rest)
+        m = lambda xs: sum(1 << i for i in xs)
+        yield m(rest[:5]), m(rest[5:11]), need | m(rest[11:13]), m(rest[13:17])
+
+
+# 札を増やす・相手の札を減らす効果: 局面ごとに（標準誤差の 2 倍まで）負にならない
+@pytest.mark.parametrize("role_id", ["gen0", "gen4", "gen5", "regloss"])
+def test_gaining_effects_are_not_negative(role_id):
+    for pos in positions(role_id):
+        assert role_effect_value(*pos, role_id) >= -2 * ROLE_TOLERANCE
+
+
+# 3期生は手番の順を入れ替えるだけ（手札の枚数 = 手番の数は変わらない）なので、局面によっては僅かに損もある。
+# 平均では得になること
+@pytest.mark.parametrize("role_id", ["gen0", "gen3", "gen4", "gen5", "regloss"])
+def test_beneficial_effects_gain_on_average(role_id):
+    values = [role_effect_value(*pos, role_id) for pos in positions(role_id)]
+    assert sum(values) / len(values) >= 0
+
+
+def test_reveal_does_not_change_playouts():
+    # 1期生（相手手札の公開）は打ち切り対局の方策に影響しない
+    assert all(role_effect_value(*pos, "gen1") == 0 for pos in positions("gen1"))
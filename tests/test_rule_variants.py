@@ -0,0 +1,117 @@
+"""rule_variants の表（holo / standard）が、データ化する前の役判定と同じ結果を返すこと"""
+import hashlib
+import json
+import random
+
+import numpy as np
+import pytest
+
+from holo_hanafuda.cards import ALL_CARDS, cards_to_mask, parse_card
+from holo_hanafuda.gamelog import VARIANTS, variant_id
+from holo_hanafuda.koikoi_rules import (evaluate_initial_hand_yaku, evaluate_yaku, yaku_points,
+                                        yaku_points_batch, yaku_points_mask)
+from holo_hanafuda.koikoi_strategy import suggest_best_moves
+from holo_hanafuda.rule_variants import compile_variant, variant_names
+
+
+def cards(text: str):
+    return [parse_card(t) for t in text.split()]
+
+
+def digest(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode()).hexdigest()[:16]
+
+
+# ───────────────────────────────────────────────────────────
+# 手で確かめた局面
+# ───────────────────────────────────────────────────────────
+
+SAKE_AND_NINE_KASU = "9:animal-sake 1:kasu 1:kasu 2:kasu 2:kasu 3:kasu 3:kasu 4:kasu 4:kasu 5:kasu"
+
+CASES = [
+    # (取り札, holo の役, standard の役)
+    ("1:bright-crane 3:bright-cherry 8:bright-moon 11:bright-rain",
+     {"ame-shiko": 7}, {"ame-shiko": 7}),
+    ("1:ribbon-poetry-red 2:ribbon-poetry-red 3:ribbon-poetry-red 6:ribbon-blue 9:ribbon-blue 10:ribbon-blue",
+     {"akatan-aotan": 10, "tan": 2}, {"akatan-aotan": 10, "tan": 2}),
+    (SAKE_AND_NINE_KASU, {"kasu": 1}, {}),   # ホロ特例: 盃はカスにも数える
+    ("3:bright-cherry 8:bright-moon 9:animal-sake 12:bright-phoenix",
+     {"sanko": 5, "hanami-zake": 5, "tsukimi-zake": 5}, {"sanko": 5, "hanami-zake": 5, "tsukimi-zake": 5}),
+    ("2:animal-nightingale 4:animal-cuckoo 5:animal-bridge 6:animal-butterfly 7:animal-boar 10:animal-deer",
+     {"inoshikacho": 5, "tane": 2}, {"inoshikacho": 5, "tane": 2}),
+    ("", {}, {}),
+]
+
+
+@pytest.mark.parametrize("captured, holo, standard", CASES)
+def test_known_captures(captured, holo, standard):
+    for variant, expected in (("holo", holo), ("standard", standard)):
+        assert evaluate_yaku(cards(captured), variant=variant) == expected
+        assert yaku_points(cards(captured), variant=variant) == sum(expected.values())
+
+
+@pytest.mark.parametrize("hand, expected", [
+    ("1:bright-crane 1:kasu 1:kasu 1:ribbon-poetry-red 2:kasu 3:kasu 4:kasu 5:kasu", {"te-yon": 6}),
+    ("1:kasu 1:kasu 2:kasu 2:kasu 3:kasu 3:kasu 4:kasu 4:kasu", {"kuttsuki": 6}),
+    ("1:kasu 1:kasu 2:kasu 2:kasu 3:kasu 3:kasu 4:kasu 5:kasu", {}),
+])
+def test_initial_hand(hand, expected):
+    for variant in ("holo", "standard"):
+        assert evaluate_initial_hand_yaku(cards(hand), variant=variant) == expected
+
+
+# ───────────────────────────────────────────────────────────
+# 乱数の取り札（期待値はデータ化する前の koikoi_rules で求めたもの）
+# ───────────────────────────────────────────────────────────
+
+EXPECTED = {
+    # variant: (evaluate_yaku の digest, yaku_points の digest, 点の合計)
+    "holo": ("ac1d6e42983c6a2e", "a55107d1933f1631", 17176),
+    "standard": ("a0aa9f021806978c", "ea924655ffe7a8d4", 16644),
+}
+EXPECTED_HANDS = ("69e62429b620250f", 12)   # 初期手役（手札 8 枚）の digest, 成立した手札の数
+
+
+@pytest.fixture(scope="module")
+def samples():
+    rng = random.Random(2024)
+    captures = [rng.sample(ALL_CARDS, rng.randint(0, 30)) for _ in range(3000)]
+    hands = [rng.sample(ALL_CARDS, 8) for _ in range(3000)]
+    return captures, hands
+
+
+@pytest.mark.parametrize("variant", ["holo", "standard"])
+def test_random_captures_match_reference(samples, variant):
+    captures, hands = samples
+    ys = [evaluate_yaku(c, variant=variant) for c in captures]
+    ps = [yaku_points(c, variant=variant) for c in captures]
+    assert (digest(ys), digest(ps), sum(ps)) == EXPECTED[variant]
+    hs = [evaluate_initial_hand_yaku(h, variant=variant) for h in hands]
+    assert (digest(hs), sum(1 for h in hs if h)) == EXPECTED_HANDS
+
+
+@pytest.mark.parametrize("variant", variant_names())
+def test_points_batch_matches_points_mask(samples, variant):
+    captures, _ = samples
+    masks = [cards_to_mask(c, strict=False) for c in captures]
+    batch = yaku_points_batch(np.array(masks, dtype=np.uint64), variant=variant)
+    assert batch.tolist() == [yaku_points_mask(m, variant=variant) for m in masks]
+    rules = compile_variant(variant)
+    assert [rules.points_mask(m) for m in masks] == [sum(rules.evaluate_mask(m).values()) for m in masks]
+
+
+@pytest.mark.parametrize("variant, delta", [("holo", 2), ("standard", 1)])
+def test_suggest_scores_captures_with_the_variant(variant, delta):
+    # 9枚のカス + 9:kasu で 盃 を取る: holo は盃もカス（11枚 → 2点）, standard は 10枚 → 1点
+    moves = suggest_best_moves(cards("9:kasu 12:kasu"), cards("9:animal-sake 4:ribbon-plain"),
+                               cards(SAKE_AND_NINE_KASU)[1:], [], variant=variant, limit=None)
+    move = next(m for m in moves if m.capture_with is not None)
+    assert move.score_delta == delta
+
+
+def test_log_variant_ids():
+    # ログの variant 番号は rule_variants の並び。既存のログを読めるよう、番号は変えない
+    assert VARIANTS[:5] == ["holo", "standard", "no-sake", "sake-kasu", "no-teyaku"]
+    assert VARIANTS == variant_names()
+    with pytest.raises(KeyError):
+        variant_id("unknown-house-rule")
@@ -0,0 +1,42 @@
+"""同じ札（カス）がゾーンに分かれているとき、マスクが互いに素で、見えている札を「未見」に数えないこと"""
+from holo_hanafuda.analysis import analyze, position_key
+from holo_hanafuda.cards import parse_card, popcount, zone_masks
+from holo_hanafuda.state import GameState
+from holo_hanafuda.yaku_planner import plan_yaku
+
+
+def cards(text: str):
+    return [parse_card(t) for t in text.split()]
+
+
+SPLIT = dict(hand=cards("1:kasu 2:kasu"), field=cards("1:kasu 2:kasu"))
+
+
+def unseen_keys(plans, yaku: str = "kasu"):
+    plan = next(p for p in plans if p.yaku == yaku)
+    return {c.key() for c in plan.missing.get("unseen", [])}
+
+
+def test_zone_masks_are_disjoint():
+    zones = (SPLIT["hand"], SPLIT["field"], cards("1:kasu"), cards("2:kasu 2:kasu"))
+    masks = zone_masks(zones)
+    for i in range(len(masks)):
+        for j in range(i + 1, len(masks)):
+            assert masks[i] & masks[j] == 0
+    # 実在枚数（各月カス 2 枚）を超える分は無視する
+    assert [popcount(m) for m in masks] == [2, 2, 0, 0]
+
+
+def test_plan_yaku_does_not_count_split_kasu_as_unseen():
+    plans = plan_yaku(SPLIT["hand"], SPLIT["field"], [], [])
+    unseen = unseen_keys(plans)
+    assert "1:kasu" not in unseen and "2:kasu" not in unseen
+    assert "3:kasu" in unseen
+
+
+def test_analysis_does_not_count_split_kasu_as_unseen():
+    gs = GameState(hand=SPLIT["hand"], field=SPLIT["field"], config={"variant": "holo"})
+    key, _ = position_key(gs)
+    assert sum(popcount(m) for m in key[:4]) == 4
+    unseen = unseen_keys(analyze(gs).plans)
+    assert "1:kasu" not in unseen and "2:kasu" not in unseen
@@ -1,9 +1,13 @@
 # tools/slice_hanafuda_grid.py
 import argparse
+from collections import defaultdict
 from pathlib import Path
+from typing import List, Tuple
 import cv2
 import numpy as np
 
+from holo_hanafuda.vision import find_card_boxes, estimate_scale, load_templates, rescale_templates
+
 """
 12か月×4枚の一覧画像を 48 枚のテンプレートに切り出して保存します。
 レイアウト前提：
@@ -11,11 +15,14 @@ import numpy as np
   列：各行 4つの「月ブロック」
   各「月ブロック」の中に 左→右 に 4枚のカード
 
-縦横マージンや隙間は画像解像度に対する比率で指定でき、
-ズレがあれば CONST を微調整してください（調整ポイントは下）。
+札の位置は黒枠の輪郭から自動検出します（48枚そろわない場合のみ、
+下の比率 CONST によるレイアウト計算にフォールバック）。
+
+--scene にゲーム画面のスクリーンショットを渡すと、画面上の札の大きさを推定し、
+そのスケールにリサンプルしたテンプレを出力します（照合は1スケールで済む）。
 """
 
-# ======= 調整ポイント（必要に応じて微調整） =======
+# ======= 調整ポイント（自動検出に失敗したときのフォールバック用） =======
 # 一覧画像の外枠マージン（比率）
 TOP_MARGIN   = 0.07
 BOTTOM_MARGIN= 0.06
@@ -56,22 +63,14 @@ ROWS_TO_MONTHS = [
     [3, 6, 9, 12],   # 下段
 ]
 
-def slice_grid(src_path: Path, out_dir: Path):
-    out_dir.mkdir(parents=True, exist_ok=True)
-    img = cv2.imread(str(src_path))
-    if img is None:
-        raise FileNotFoundError(f"cannot read image: {src_path}")
-
-    H, W = img.shape[:2]
-
+def _ratio_boxes(H: int, W: int) -> List[Tuple[int, int, int, int]]:
+    """比率 CONST から 48 枚分の (x, y, w, h) を計算する（上→下、左→右の順）"""
     # 外枠を除いた有効領域
     x0 = int(W * LEFT_MARGIN)
     x1 = W - int(W * RIGHT_MARGIN)
     y0 = int(H * TOP_MARGIN)
     y1 = H - int(H * BOTTOM_MARGIN)
-
-    roi = img[y0:y1, x0:x1].copy()
-    RH, RW = roi.shape[:2]
+    RH, RW = y1 - y0, x1 - x0
 
     # 行ブロック・列ブロックのサイズ算出
     row_gap = int(RH * ROW_GAP_RATIO)
@@ -82,52 +81,91 @@ def slice_grid(src_path: Path, out_dir: Path):
 
     # 月ブロック内でカード4枚の横配置
     padL = int(col_block_w * INBLOCK_LEFT_PAD)
-    padR = int(col_block_w * INBLOCK_RIGHT_PAD)
     in_gap = int(col_block_w * INBLOCK_GAP_RATIO)
+    padR = int(col_block_w * INBLOCK_RIGHT_PAD)
     usable_w = col_block_w - padL - padR - in_gap * 3
     card_w = usable_w // 4
 
-    # カード高は月ブロックの高さいっぱい（上下少し余裕みるなら係数を掛ける）
+    # カード高は月ブロックの高さいっぱい
     card_h = row_block_h
 
-    # 切り取りと保存
-    for r, months in enumerate(ROWS_TO_MONTHS):
-        for c, month in enumerate(months):
-            # 月ブロックの左上
-            bx = c * (col_block_w + col_gap)
-            by = r * (row_block_h + row_gap)
-
+    boxes = []
+    for r in range(3):
+        for c in range(4):
+            bx = x0 + c * (col_block_w + col_gap)
+            by = y0 + r * (row_block_h + row_gap)
             for k in range(4):  # 左→右 4枚
-                cx = padL + k * (card_w + in_gap)
-                cy = 0
-                x = bx + cx
-                y = by + cy
-                card = roi[y:y+card_h, x:x+card_w]
-
-                # ファイル名
-                kind_tag = MONTH_CARDS[month][k]
+                boxes.append((bx + padL + k * (card_w + in_gap), by, card_w, card_h))
+    return boxes
+
+def detect_boxes(img: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """黒枠から 48 枚を検出。数が合わなければ比率レイアウトを使う"""
+    boxes = find_card_boxes(img)
+    if len(boxes) == 48:
+        return boxes
+    print(f"[warn] detected {len(boxes)} cards (expected 48); falling back to ratio layout")
+    return _ratio_boxes(*img.shape[:2])
+
+def _template_names() -> List[str]:
+    """detect_boxes の並び順（行ごとに 月ブロック×4枚）に対応するファイル名"""
+    names = []
+    kasu_seen = defaultdict(int)
+    for months in ROWS_TO_MONTHS:
+        for month in months:
+            for kind_tag in MONTH_CARDS[month]:
                 if ":" in kind_tag:
                     kind, tag = kind_tag.split(":")
-                    fname = f"{month}_{kind}_{tag}.png"
+                    names.append(f"{month}_{kind}_{tag}.png")
                 else:
                     # kasu のとき、同月内の重複を区別（_2, _3 を付ける）
-                    existing = list(out_dir.glob(f"{month}_kasu*.png"))
-                    if len(existing) == 0:
-                        fname = f"{month}_kasu.png"
-                    else:
-                        fname = f"{month}_kasu_{len(existing)+1}.png"
+                    kasu_seen[month] += 1
+                    n = kasu_seen[month]
+                    names.append(f"{month}_kasu.png" if n == 1 else f"{month}_kasu_{n}.png")
+    return names
+
+def slice_grid(src_path: Path, out_dir: Path):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    img = cv2.imread(str(src_path))
+    if img is None:
+        raise FileNotFoundError(f"cannot read image: {src_path}")
 
-                cv2.imwrite(str(out_dir / fname), card)
+    # 上段の月ブロックが 1/4/7/10 月の順に並ぶので、各行 16 枚をそのまま名前に対応付ける
+    for (x, y, w, h), fname in zip(detect_boxes(img), _template_names()):
+        cv2.imwrite(str(out_dir / fname), img[y:y+h, x:x+w])
 
     print(f"[done] saved 48 templates into: {out_dir}")
 
+def calibrate_from_scene(tpl_dir: Path, scene_path: Path, out_dir: Path) -> float:
+    """スクリーンショット上の札サイズに合わせてテンプレをリサンプルし out_dir に保存する"""
+    scene = cv2.imread(str(scene_path))
+    if scene is None:
+        raise FileNotFoundError(f"cannot read image: {scene_path}")
+    tmps = load_templates(tpl_dir)
+    scale = estimate_scale(scene, tmps)
+    if scale is None:
+        raise RuntimeError(f"no templates in: {tpl_dir}")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for p in sorted(tpl_dir.glob("*.png")):
+        img = cv2.imread(str(p))
+        if img is None:
+            continue
+        scaled = rescale_templates({p.name: img}, scale)[p.name]
+        cv2.imwrite(str(out_dir / p.name), scaled)
+    print(f"[done] scale={scale:.3f}; saved calibrated templates into: {out_dir}")
+    return scale
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--src", required=True, help="一覧画像のパス（例: assets/source/holo_cards_grid.png）")
     ap.add_argument("--out", default="assets/templates", help="出力先フォルダ（既定: assets/templates）")
+    ap.add_argument("--scene", help="ゲーム画面のスクリーンショット。指定すると札のスケールに合わせたテンプレも出力")
+    ap.add_argument("--calibrated-out", default="assets/templates_calibrated",
+                    help="--scene 指定時の出力先（既定: assets/templates_calibrated）")
     args = ap.parse_args()
 
     slice_grid(Path(args.src), Path(args.out))
+    if args.scene:
+        calibrate_from_scene(Path(args.out), Path(args.scene), Path(args.calibrated_out))
 
 if __name__ == "__main__":
     main()